@@ -0,0 +1,8 @@
+# app/__main__.py
+import uvicorn
+
+# Spawned OCR worker processes re-import the main module of the parent. Launching with
+# "python -m app" keeps that module this small launcher, so workers only load the OCR
+# models instead of the whole application (RAG retrievers, LLM client, job store).
+if __name__ == "__main__":
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
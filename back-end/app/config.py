@@ -0,0 +1,168 @@
+# app/config.py
+import os
+from dotenv import load_dotenv
+
+# Load settings from a local .env file if one exists
+load_dotenv()
+
+
+def _env_bool(name, default):
+    """Read a boolean flag from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_list(name, default):
+    """Read a comma separated list from the environment"""
+    value = os.getenv(name)
+    if not value:
+        return list(default)
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+# OCR reader pool
+OCR_LANGUAGES = _env_list("OCR_LANGUAGES", ["en"])
+OCR_GPU = _env_bool("OCR_GPU", False)
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", "2"))
+OCR_POOL_TIMEOUT = float(os.getenv("OCR_POOL_TIMEOUT", "120"))
+OCR_WARMUP = _env_bool("OCR_WARMUP", True)
+
+# OCR worker processes, 0 runs OCR in a thread of the API process instead
+OCR_PROCESS_WORKERS = int(os.getenv("OCR_PROCESS_WORKERS", "2"))
+
+# Local state (job queue, caches)
+DATA_DIR = os.getenv("DATA_DIR", "data")
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(DATA_DIR, "jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Content-hash cache of upload results
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", os.path.join(DATA_DIR, "results.db"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Image preprocessing in front of OCR
+OCR_PREPROCESS = _env_bool("OCR_PREPROCESS", True)
+OCR_PREPROCESS_STAGES = _env_list("OCR_PREPROCESS_STAGES", ["resize", "crop", "deskew"])
+OCR_TARGET_TEXT_HEIGHT = int(os.getenv("OCR_TARGET_TEXT_HEIGHT", "32"))
+OCR_MAX_IMAGE_SIDE = int(os.getenv("OCR_MAX_IMAGE_SIDE", "2560"))
+
+# OCR output layout: "table" rebuilds rows from boxes, "paragraph" joins paragraphs
+OCR_LAYOUT = os.getenv("OCR_LAYOUT", "table").strip().lower()
+
+# Multi-page uploads
+PDF_RENDER_DPI = int(os.getenv("PDF_RENDER_DPI", "200"))
+MAX_UPLOAD_PAGES = int(os.getenv("MAX_UPLOAD_PAGES", "50"))
+
+# Upload limits
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR", os.path.join(DATA_DIR, "tmp"))
+
+# Cross-request OCR micro-batching
+OCR_BATCHING = _env_bool("OCR_BATCHING", False)
+OCR_BATCH_WINDOW_MS = float(os.getenv("OCR_BATCH_WINDOW_MS", "30"))
+OCR_BATCH_MAX_SIZE = int(os.getenv("OCR_BATCH_MAX_SIZE", "4"))
+OCR_BATCH_MAX_PADDING = float(os.getenv("OCR_BATCH_MAX_PADDING", "0.25"))
+
+# CPU inference tuning for the OCR models
+OCR_QUANTIZE = _env_bool("OCR_QUANTIZE", True)
+OCR_TORCH_THREADS = int(os.getenv("OCR_TORCH_THREADS", "0"))
+
+# OpenAI-compatible LLM endpoint (LM Studio, llama.cpp server, ...)
+LLM_API_URL = os.getenv("LLM_API_URL", "http://localhost:1234/v1/chat/completions")
+LLM_MODEL = os.getenv("LLM_MODEL", "local-model")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "300"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "16"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "8"))
+
+# Pool of LLM endpoints, requests go to the one with the fewest outstanding requests
+LLM_API_URLS = _env_list("LLM_API_URLS", [LLM_API_URL])
+if not LLM_API_URLS:
+    raise ValueError("LLM_API_URLS lists no endpoint, set it to at least one chat completions URL")
+LLM_EJECT_FAILURES = int(os.getenv("LLM_EJECT_FAILURES", "3"))
+LLM_EJECT_SECONDS = float(os.getenv("LLM_EJECT_SECONDS", "30"))
+LLM_HEALTH_INTERVAL = float(os.getenv("LLM_HEALTH_INTERVAL", "10"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+
+# Hedged requests: a request slower than the pool's p95 latency is also sent to a second endpoint
+LLM_HEDGING = _env_bool("LLM_HEDGING", False)
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# Report pipeline
+REPORT_STAGE_TIMEOUT = float(os.getenv("REPORT_STAGE_TIMEOUT", "180"))
+
+# LLM response cache
+LLM_CACHE_ENABLED = _env_bool("LLM_CACHE_ENABLED", True)
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(DATA_DIR, "llm_cache.db"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Coalesce identical concurrent LLM requests into one upstream generation
+LLM_COALESCE = _env_bool("LLM_COALESCE", True)
+
+# LLM admission control: requests sent to the backend at once (its parallel
+# slots) and how long each priority class may queue before being shed
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "3"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_SLO_INTERACTIVE = float(os.getenv("LLM_QUEUE_SLO_INTERACTIVE", "15"))
+LLM_QUEUE_SLO_DEFAULT = float(os.getenv("LLM_QUEUE_SLO_DEFAULT", "60"))
+LLM_QUEUE_SLO_BULK = float(os.getenv("LLM_QUEUE_SLO_BULK", "120"))
+
+# Prompt token budgets: context window per model ("name=tokens,..."), the
+# tokenizer used to count and the share of the window kept free as a margin
+# for tokenizer differences between tiktoken and the local model
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "4096"))
+LLM_MODEL_CONTEXT = {
+    name.strip(): int(tokens)
+    for name, tokens in (item.split("=", 1) for item in _env_list("LLM_MODEL_CONTEXT", []))
+}
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+PROMPT_TOKEN_MARGIN = float(os.getenv("PROMPT_TOKEN_MARGIN", "0.1"))
+
+# Map-reduce condensing of reports that do not fit the budget
+REPORT_CHUNK_TOKENS = int(os.getenv("REPORT_CHUNK_TOKENS", "1500"))
+CHUNK_SUMMARY_TOKENS = int(os.getenv("CHUNK_SUMMARY_TOKENS", "500"))
+CHUNK_SUMMARY_CACHE_ENTRIES = int(os.getenv("CHUNK_SUMMARY_CACHE_ENTRIES", "512"))
+RAG_REPORT_TOKENS = int(os.getenv("RAG_REPORT_TOKENS", "1024"))
+
+# Per-task model routing: models as "task=model,...", and an optional JSON
+# file overriding model, max_tokens, temperature and stop per task
+LLM_TASK_MODELS = {
+    task.strip(): model.strip()
+    for task, model in (item.split("=", 1) for item in _env_list("LLM_TASK_MODELS", []))
+}
+LLM_TASKS_FILE = os.getenv("LLM_TASKS_FILE", "")
+
+# Parse lab lines with known indicator names locally, only the rest goes to the LLM
+INDICATOR_FAST_PATH = _env_bool("INDICATOR_FAST_PATH", True)
+
+# Constrain JSON answers (indicators, RAG answers) with a response_format schema
+LLM_STRUCTURED_OUTPUT = _env_bool("LLM_STRUCTURED_OUTPUT", True)
+LLM_STRUCTURED_OUTPUT_RETRY = float(os.getenv("LLM_STRUCTURED_OUTPUT_RETRY", "300"))
+
+# Translation memory: translated segments stored by segment hash and target
+# language, only new segments are sent to the LLM (at most this many source
+# tokens per batched prompt)
+TRANSLATION_MEMORY_ENABLED = _env_bool("TRANSLATION_MEMORY_ENABLED", True)
+TRANSLATION_MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH", os.path.join(DATA_DIR, "translation_memory.db"))
+TRANSLATION_MEMORY_MAX_ENTRIES = int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "50000"))
+TRANSLATION_BATCH_TOKENS = int(os.getenv("TRANSLATION_BATCH_TOKENS", "800"))
+
+# Report chat sessions: idle seconds before a session expires, sessions kept,
+# and conversation tokens kept verbatim before older turns are summarized
+SESSION_TTL = float(os.getenv("SESSION_TTL", "3600"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "200"))
+SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", "1024"))
+
+# Reports evaluated per vectorized block by /indicators/evaluate
+BULK_EVALUATION_BLOCK_SIZE = int(os.getenv("BULK_EVALUATION_BLOCK_SIZE", "1000"))
+
+# Report history: processed reports and indicator time series kept for trends
+HISTORY_ENABLED = _env_bool("HISTORY_ENABLED", True)
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", os.path.join(DATA_DIR, "history.db"))
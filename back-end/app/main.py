@@ -1,15 +1,15 @@
 # app/main.py
-from fastapi import FastAPI, File, UploadFile, Request, Body
+from fastapi import FastAPI, File, UploadFile, Request, Body, Query
 from fastapi.responses import JSONResponse, HTMLResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-import os
+import asyncio
 from pathlib import Path
-import uuid
-import aiofiles
-from typing import Dict, Any
+from typing import Dict, Any, List
+import json
+import hashlib
 import csv
 import io
 from fastapi.responses import StreamingResponse
@@ -18,9 +18,26 @@ from fastapi.responses import StreamingResponse
 
 
 # Import services
-from app.services.report_service import process_report
+from app.services.report_service import (
+   process_report, analyze_report_text, merge_page_texts, format_report_result, is_complete
+)
 from app.models.lm_handler import LMStudioHandler
 from app.services.rag_service import rag_service
+from app.services.ocr_service import ocr_service
+from app.services.job_service import job_service
+from app.services.cache_service import result_cache
+from app.services.session_service import session_store
+from app.services.history_service import history_store
+from app.services.file_service import save_upload_stream, iter_report_pages, UploadError
+from app.models.llm_client import llm_client
+from app.models.prompt_budget import report_condenser
+from app.models.translation_memory import translation_memory
+from app.models.bulk_evaluation import load_bulk_evaluator
+from app.models.reference_ranges import load_reference_ranges
+from app import config
+from app.models.llm_scheduler import (
+   PRIORITY_INTERACTIVE, PRIORITY_DEFAULT, PRIORITY_BULK, set_llm_priority, find_overload
+)
 
 
 
@@ -45,55 +62,99 @@ templates = Jinja2Templates(directory="templates")
 
 
 
-# Ensure upload directory exists
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+@app.on_event("startup")
+async def start_workers():
+   """Start the shared LLM client, the OCR worker processes and the background job queue"""
+   await llm_client.start()
+   loop = asyncio.get_running_loop()
+   await loop.run_in_executor(None, ocr_service.start)
+   await job_service.start()
 
 
 
 
-@app.get("/", response_class=HTMLResponse)
-async def home(request: Request):
-   """Render home page"""
-   return templates.TemplateResponse("index.html", {"request": request})
+@app.on_event("shutdown")
+async def stop_workers():
+   """Stop background workers, unfinished jobs are resumed on next start"""
+   await job_service.stop()
+   ocr_service.shutdown()
+   await llm_client.aclose()
 
 
 
 
-async def save_upload_file(file: UploadFile, directory: Path, filename: str) -> Path:
-   """Save uploaded file and return file path"""
-   file_path = directory / filename
+# Ensure upload directory exists
+UPLOAD_DIR = Path("uploads")
+UPLOAD_DIR.mkdir(exist_ok=True)
+
+# File types accepted as report images and pages, detected from the file content
+IMAGE_EXTENSIONS = {".jpg", ".png", ".bmp", ".tif"}
+PAGE_EXTENSIONS = IMAGE_EXTENSIONS | {".pdf"}
+
+
+
 
+def overload_response(error):
+   """429/503 with Retry-After when an error comes from LLM load shedding, else None"""
+   overload = find_overload(error)
+   if overload is None:
+       return None
+   return JSONResponse(
+       status_code=overload.status_code,
+       content={"success": False, "message": str(overload), "retry_after": overload.retry_after},
+       headers={"Retry-After": str(overload.retry_after)}
+   )
 
-   async with aiofiles.open(file_path, 'wb') as out_file:
-       content = await file.read()
-       await out_file.write(content)
 
 
-   return file_path
+
+@app.get("/", response_class=HTMLResponse)
+async def home(request: Request):
+   """Render home page"""
+   return templates.TemplateResponse("index.html", {"request": request})
 
 
 
 
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-   """Process uploaded medical report image"""
+async def upload_file(
+   file: UploadFile = File(...),
+   async_mode: bool = Query(False, alias="async"),
+   patient_id: str = Query(None)
+):
+   """Process uploaded medical report image, or queue it as a job with ?async=1"""
    # calculate processing time
    import time
    start_time = time.time()
+   set_llm_priority(PRIORITY_BULK)
    
    try:
-       # Generate unique filename
-       file_extension = os.path.splitext(file.filename)[1]
-       unique_filename = f"{uuid.uuid4()}{file_extension}"
-
-
-       # Save uploaded file
-       file_path = await save_upload_file(file, UPLOAD_DIR, unique_filename)
+       # Stream the upload to disk, stored under its content hash so duplicates are kept once
+       file_path, content_hash, _ = await save_upload_stream(file, UPLOAD_DIR, IMAGE_EXTENSIONS)
+
+       # Re-uploads of the same scan skip OCR and the LLM entirely
+       report = result_cache.get(content_hash)
+       if report is not None:
+           print(f"Result cache hit for {content_hash} in {time.time() - start_time:.3f} seconds")
+           if history_store is not None:
+               # Kept once per patient and scan, re-uploads only add it for a new patient
+               history_store.safe_record(report, content_hash, file_path.name, patient_id)
+           return {"success": True, "cached": True, **format_report_result(report, file_path.name)}
+
+       # In job mode return right away, the result is fetched from /jobs/{id}
+       if async_mode:
+           job_id = job_service.submit(file_path, file_path.name, content_hash, patient_id)
+           return JSONResponse(
+               status_code=202,
+               content={"success": True, "job_id": job_id, "status": "queued", "filename": file_path.name}
+           )
 
-      
        # Process report
-       original_content, explanation, indicators = await process_report(file_path)
+       report = await process_report(file_path)
+       if is_complete(report):
+           result_cache.put(content_hash, report)
+           if history_store is not None:
+               history_store.safe_record(report, content_hash, file_path.name, patient_id)
 
 
       
@@ -101,14 +162,16 @@ async def upload_file(file: UploadFile = File(...)):
        end_time = time.time()
        processing_time = end_time - start_time
        print(f"Processing time: {processing_time} seconds")
-       return {
-           "success": True,
-           "original_content": original_content,
-           "explanation": explanation,
-           "indicators": indicators,
-           "filename": unique_filename
-       }
+       return {"success": True, "cached": False, **format_report_result(report, file_path.name)}
+   except UploadError as e:
+       return JSONResponse(
+           status_code=e.status_code,
+           content={"success": False, "message": str(e)}
+       )
    except Exception as e:
+       shed = overload_response(e)
+       if shed is not None:
+           return shed
        import traceback
        error_details = traceback.format_exc()
        print(f"Error details: {error_details}")
@@ -120,9 +183,138 @@ async def upload_file(file: UploadFile = File(...)):
 
 
 
+@app.post("/upload-pages")
+async def upload_pages(files: List[UploadFile] = File(...), patient_id: str = Query(None)):
+   """
+   Process a multi-page report made of several images and/or PDFs
+
+   Pages are OCRed in parallel and streamed back as NDJSON lines as soon as
+   each one finishes, followed by a single report-level result.
+   """
+   try:
+       file_paths = []
+       content_hashes = []
+       for file in files:
+           # Save each file content-addressed, like single uploads
+           file_path, content_hash, _ = await save_upload_stream(file, UPLOAD_DIR, PAGE_EXTENSIONS)
+           file_paths.append(file_path)
+           content_hashes.append(content_hash)
+
+       # The report is identified by its pages in order
+       if len(content_hashes) == 1:
+           report_hash = content_hashes[0]
+       else:
+           report_hash = hashlib.sha256("".join(content_hashes).encode()).hexdigest()
+   except UploadError as e:
+       return JSONResponse(
+           status_code=e.status_code,
+           content={"success": False, "message": str(e)}
+       )
+   except Exception as e:
+       return JSONResponse(
+           status_code=500,
+           content={"success": False, "message": f"Upload failed: {str(e)}"}
+       )
+
+   filenames = [file_path.name for file_path in file_paths]
+
+   async def events():
+       set_llm_priority(PRIORITY_BULK)
+       try:
+           report = result_cache.get(report_hash)
+           cached = report is not None
+
+           if not cached:
+               # PDF page counts are read in a thread so parsing a large PDF does not block the event loop,
+               # the pages themselves are decoded one by one inside the OCR workers
+               pages = await asyncio.to_thread(list, iter_report_pages(file_paths))
+               page_texts = {}
+               async for number, text in ocr_service.iter_page_texts(pages):
+                   page_texts[number] = text
+                   yield json.dumps({"type": "page", "page": number + 1, "text": text}) + "\n"
+
+               # Merge once and run the LLM stages on the whole report
+               original_content = merge_page_texts([page_texts[number] for number in sorted(page_texts)])
+               report = await analyze_report_text(original_content)
+               if is_complete(report):
+                   result_cache.put(report_hash, report)
+
+           if history_store is not None and is_complete(report):
+               history_store.safe_record(report, report_hash, filenames[0], patient_id)
+
+           result = format_report_result(report, filenames[0])
+           yield json.dumps({
+               "type": "report",
+               "success": True,
+               "cached": cached,
+               "filenames": filenames,
+               **result
+           }) + "\n"
+       except Exception as e:
+           import traceback
+           print(f"Error details: {traceback.format_exc()}")
+           error = {"type": "error", "success": False, "message": f"Processing failed: {str(e)}"}
+           overload = find_overload(e)
+           if overload is not None:
+               error["retry_after"] = overload.retry_after
+           yield json.dumps(error) + "\n"
+
+   return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+
+
+@app.get("/ocr/stats")
+async def ocr_stats():
+   """OCR worker, reader pool and micro-batching figures for tuning"""
+   return {"success": True, **ocr_service.stats()}
+
+
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+   """LLM client, response cache, admission queue, report condensing, translation memory and session figures"""
+   stats = {"success": True, **llm_client.stats(), "condenser": report_condenser.stats()}
+   if translation_memory is not None:
+       stats["translation_memory"] = translation_memory.stats()
+   stats["sessions"] = session_store.stats()
+   return stats
+
+
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+   """Return stage status and, once finished, the result of a report processing job"""
+   job = job_service.get(job_id)
+   if job is None:
+       return JSONResponse(
+           status_code=404,
+           content={"success": False, "message": "Job not found"}
+       )
+
+   response = {
+       "success": job["status"] != "failed",
+       "job_id": job["id"],
+       "status": job["status"],
+       "stage": job["stage"],
+       "created_at": job["created_at"],
+       "updated_at": job["updated_at"]
+   }
+   if job["status"] == "completed":
+       response.update(job["result"])
+   elif job["status"] == "failed":
+       response["message"] = f"Processing failed: {job['error']}"
+   return response
+
+
+
+
 @app.post("/translate")
 async def translate_text(payload: Dict[str, Any] = Body(...)):
    """Translate text to the specified language"""
+   set_llm_priority(PRIORITY_INTERACTIVE)
    try:
        # Get text and target language from request
        text = payload.get("text")
@@ -146,6 +338,9 @@ async def translate_text(payload: Dict[str, Any] = Body(...)):
            "language": target_language
        }
    except Exception as e:
+       shed = overload_response(e)
+       if shed is not None:
+           return shed
        return JSONResponse(
            status_code=500,
            content={"success": False, "message": f"Translation failed: {str(e)}"}
@@ -154,25 +349,91 @@ async def translate_text(payload: Dict[str, Any] = Body(...)):
 
 
 
+def session_not_found():
+   return JSONResponse(
+       status_code=404,
+       content={"success": False, "message": "Session not found or expired"}
+   )
+
+
+
+
+@app.post("/sessions")
+async def create_session(payload: Dict[str, Any] = Body(...)):
+   """Register a report once, follow-up questions then only send the session id"""
+   set_llm_priority(PRIORITY_INTERACTIVE)
+   report_content = payload.get("report_content")
+   if not report_content:
+       return JSONResponse(
+           status_code=400,
+           content={"success": False, "message": "No report content provided"}
+       )
+
+   try:
+       lm_handler = LMStudioHandler()
+       report, digest = await lm_handler.prepare_session(report_content)
+       session = session_store.create(report, digest)
+       return {"success": True, **session_store.describe(session)}
+   except Exception as e:
+       shed = overload_response(e)
+       if shed is not None:
+           return shed
+       return JSONResponse(
+           status_code=500,
+           content={"success": False, "message": str(e)}
+       )
+
+
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+   """Digest, turn count and expiry of a report session"""
+   session = session_store.get(session_id)
+   if session is None:
+       return session_not_found()
+   return {"success": True, **session_store.describe(session)}
+
+
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+   """End a report session"""
+   if not session_store.delete(session_id):
+       return session_not_found()
+   return {"success": True, "session_id": session_id}
+
+
+
+
 @app.post("/ask")
 async def answer_question(payload: Dict[str, Any] = Body(...)):
-   """Answer medical questions based on report content"""
+   """Answer medical questions based on report content, or on the report of a session"""
+   set_llm_priority(PRIORITY_INTERACTIVE)
    try:
-       # Get report content and question from request
+       # Get report content or session id and question from request
        report_content = payload.get("report_content")
+       session_id = payload.get("session_id")
        question = payload.get("question")
   
-       if not report_content or not question:
+       if not (report_content or session_id) or not question:
            return JSONResponse(
                status_code=400,
-               content={"success": False, "message": "Both report content and question are required"}
+               content={"success": False, "message": "A question and either report content or a session id are required"}
            )
   
        # Initialize LMStudio handler
        lm_handler = LMStudioHandler()
   
-       # Answer the question based on report content
-       answer = await lm_handler.answer_medical_question(report_content, question)
+       if session_id:
+           session = session_store.get(session_id)
+           if session is None:
+               return session_not_found()
+           answer = await lm_handler.answer_session_question(session, question)
+       else:
+           # Answer the question based on report content
+           answer = await lm_handler.answer_medical_question(report_content, question)
   
        return {
            "success": True,
@@ -180,6 +441,9 @@ async def answer_question(payload: Dict[str, Any] = Body(...)):
            "answer": answer
        }
    except Exception as e:
+       shed = overload_response(e)
+       if shed is not None:
+           return shed
        return JSONResponse(
            status_code=500,
            content={"success": False, "message": f"Question answering failed: {str(e)}"}
@@ -188,10 +452,106 @@ async def answer_question(payload: Dict[str, Any] = Body(...)):
 
 
 
+async def sse_token_stream(request: Request, tokens):
+   """Forward LLM tokens as server-sent events, stop upstream generation when the client leaves"""
+   # Streams are read by a user waiting on the page
+   set_llm_priority(PRIORITY_INTERACTIVE)
+   try:
+       completed = True
+       async for token in tokens:
+           if await request.is_disconnected():
+               completed = False
+               break
+           yield f"data: {json.dumps({'token': token})}\n\n"
+       if completed:
+           yield "event: done\ndata: {}\n\n"
+   except Exception as e:
+       error = {"message": str(e)}
+       overload = find_overload(e)
+       if overload is not None:
+           error["retry_after"] = overload.retry_after
+       yield f"event: error\ndata: {json.dumps(error)}\n\n"
+   finally:
+       # Closing the generator closes the upstream connection
+       await tokens.aclose()
+
+
+
+
+def sse_response(request: Request, tokens):
+   return StreamingResponse(
+       sse_token_stream(request, tokens),
+       media_type="text/event-stream",
+       headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+   )
+
+
+
+
+@app.post("/translate/stream")
+async def translate_text_stream(request: Request, payload: Dict[str, Any] = Body(...)):
+   """Translate text, streaming the translation as server-sent events"""
+   text = payload.get("text")
+   target_language = payload.get("language", "Chinese")
+
+   if not text:
+       return JSONResponse(
+           status_code=400,
+           content={"success": False, "message": "No text provided for translation"}
+       )
+
+   lm_handler = LMStudioHandler()
+   return sse_response(request, lm_handler.stream_translation(text, target_language))
+
+
+
+
+@app.post("/ask/stream")
+async def answer_question_stream(request: Request, payload: Dict[str, Any] = Body(...)):
+   """Answer a question about the report or session, streaming the answer as server-sent events"""
+   report_content = payload.get("report_content")
+   session_id = payload.get("session_id")
+   question = payload.get("question")
+
+   if not (report_content or session_id) or not question:
+       return JSONResponse(
+           status_code=400,
+           content={"success": False, "message": "A question and either report content or a session id are required"}
+       )
+
+   lm_handler = LMStudioHandler()
+   if session_id:
+       session = session_store.get(session_id)
+       if session is None:
+           return session_not_found()
+       return sse_response(request, lm_handler.stream_session_answer(session, question))
+   return sse_response(request, lm_handler.stream_medical_answer(report_content, question))
+
+
+
+
+@app.post("/explain/stream")
+async def explain_report_stream(request: Request, payload: Dict[str, Any] = Body(...)):
+   """Generate the patient friendly report explanation, streamed as server-sent events"""
+   report_content = payload.get("report_content")
+
+   if not report_content:
+       return JSONResponse(
+           status_code=400,
+           content={"success": False, "message": "Medical report content is required"}
+       )
+
+   lm_handler = LMStudioHandler()
+   return sse_response(request, lm_handler.stream_interpretation(report_content))
+
+
+
+
 # Add RAG enhancement endpoint
 @app.post("/rag-enhance")
 async def enhance_with_rag(payload: Dict[str, Any] = Body(...)):
    """Enhance medical report explanation using RAG"""
+   set_llm_priority(PRIORITY_DEFAULT)
    try:
        # Get medical report content and optional question from request
        report_content = payload.get("report_content")
@@ -208,6 +568,9 @@ async def enhance_with_rag(payload: Dict[str, Any] = Body(...)):
     
        return result
    except Exception as e:
+       shed = overload_response(e)
+       if shed is not None:
+           return shed
        return JSONResponse(
            status_code=500,
            content={"success": False, "message": f"RAG enhancement failed: {str(e)}"}
@@ -256,5 +619,147 @@ async def export_indicators(payload: Dict[str, Any] = Body(...)):
 
 
 
+def history_disabled():
+   return JSONResponse(
+       status_code=404,
+       content={"success": False, "message": "Report history is disabled (HISTORY_ENABLED=false)"}
+   )
+
+
+
+
+@app.get("/history/reports")
+async def list_history_reports(
+   patient_id: str = Query(None),
+   limit: int = Query(20, ge=1, le=200),
+   cursor: str = Query(None)
+):
+   """Page through a patient's stored reports, newest first; pass next_cursor to get the next page"""
+   if history_store is None:
+       return history_disabled()
+   try:
+       page = await asyncio.to_thread(history_store.list_reports, patient_id, limit, cursor)
+   except ValueError:
+       return JSONResponse(
+           status_code=400,
+           content={"success": False, "message": "Invalid cursor"}
+       )
+   return {"success": True, **page}
+
+
+
+
+@app.get("/history/reports/{report_id}")
+async def get_history_report(report_id: str):
+   """A stored report with its OCR text, LLM outputs and indicators"""
+   if history_store is None:
+       return history_disabled()
+   report = await asyncio.to_thread(history_store.get_report, report_id)
+   if report is None:
+       return JSONResponse(
+           status_code=404,
+           content={"success": False, "message": "Report not found"}
+       )
+   return {"success": True, "report": report}
+
+
+
+
+@app.delete("/history/reports/{report_id}")
+async def delete_history_report(report_id: str):
+   """Delete a stored report and its indicator values"""
+   if history_store is None:
+       return history_disabled()
+   if not await asyncio.to_thread(history_store.delete_report, report_id):
+       return JSONResponse(
+           status_code=404,
+           content={"success": False, "message": "Report not found"}
+       )
+   return {"success": True, "report_id": report_id}
+
+
+
+
+@app.get("/history/metrics")
+async def list_history_metrics(patient_id: str = Query(None)):
+   """Metrics stored for a patient with their number of values and time span"""
+   if history_store is None:
+       return history_disabled()
+   return {"success": True, "metrics": await asyncio.to_thread(history_store.metrics, patient_id)}
+
+
+
+
+@app.get("/history/trends")
+async def get_history_trends(
+   metrics: str = Query(..., description="Comma separated metric names or aliases"),
+   patient_id: str = Query(None),
+   since: float = Query(None),
+   until: float = Query(None)
+):
+   """Time series of indicator values for a patient, read from the history without reprocessing any image"""
+   if history_store is None:
+       return history_disabled()
+
+   # Aliases such as "WBC" or "Hb" resolve to the stored metric names
+   engine = load_reference_ranges(LMStudioHandler().metrics_file)
+   requested = {}
+   for name in (item.strip() for item in metrics.split(",")):
+       if name:
+           requested[name] = engine.resolve(name)[0] or name
+   series = await asyncio.to_thread(
+       history_store.trends, list(dict.fromkeys(requested.values())), patient_id, since, until
+   )
+   return {"success": True, "trends": series, "resolved": requested}
+
+
+
+
+@app.post("/indicators/evaluate")
+async def evaluate_indicators(payload: Dict[str, Any] = Body(...)):
+   """
+   Re-score many reports' indicators against the current reference ranges
+
+   Reports are evaluated in vectorized blocks and streamed back as NDJSON
+   lines, one per report in input order, followed by per-metric aggregates.
+   """
+   reports = payload.get("reports")
+   if not isinstance(reports, list) or not reports:
+       return JSONResponse(
+           status_code=400,
+           content={"success": False, "message": "No reports provided for evaluation"}
+       )
+
+   evaluator = load_bulk_evaluator(LMStudioHandler().metrics_file)
+   block_size = max(config.BULK_EVALUATION_BLOCK_SIZE, 1)
+
+   def evaluate_block(start, aggregates):
+       # Evaluation and serialization both run in a worker thread, off the event loop
+       results = evaluator.evaluate_block(reports[start:start + block_size], aggregates)
+       return "".join(
+           json.dumps({"type": "report", "index": start + offset, **result}) + "\n"
+           for offset, result in enumerate(results)
+       )
+
+   async def events():
+       aggregates = evaluator.aggregates()
+       try:
+           for start in range(0, len(reports), block_size):
+               yield await asyncio.to_thread(evaluate_block, start, aggregates)
+           yield json.dumps({
+               "type": "aggregates",
+               "success": True,
+               "reports": aggregates.reports,
+               "metrics": aggregates.summary(evaluator.metrics)
+           }) + "\n"
+       except Exception as e:
+           yield json.dumps({"type": "error", "success": False, "message": f"Evaluation failed: {str(e)}"}) + "\n"
+
+   return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+
+
 if __name__ == "__main__":
+   # Prefer "python -m app", OCR worker processes re-import this module when it is the main module
    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,240 @@
+# app/models/bulk_evaluation.py
+from functools import lru_cache
+
+import numpy as np
+
+from app.models.indicator_parser import normalize_sex
+from app.models.reference_ranges import load_reference_ranges
+
+# Flag codes of the evaluated values
+FLAG_MISSING = -2
+FLAG_LOW = -1
+FLAG_NORMAL = 0
+FLAG_HIGH = 1
+FLAG_NAMES = {FLAG_LOW: "low", FLAG_NORMAL: "normal", FLAG_HIGH: "high"}
+
+
+class MetricAggregates:
+    def __init__(self, size):
+        """
+        Per-metric running totals over all evaluated blocks
+
+        Sums rather than means are kept so blocks can be added as they are
+        evaluated, and mean/std are derived once at the end.
+        """
+        self.reports = 0
+        self.count = np.zeros(size, dtype=np.int64)
+        self.total = np.zeros(size)
+        self.squares = np.zeros(size)
+        self.score_total = np.zeros(size)
+        self.low = np.zeros(size, dtype=np.int64)
+        self.high = np.zeros(size, dtype=np.int64)
+        self.minimum = np.full(size, np.inf)
+        self.maximum = np.full(size, -np.inf)
+
+    def add(self, values, flags, scores):
+        present = flags != FLAG_MISSING
+        filled = np.where(present, values, 0.0)
+        self.reports += values.shape[0]
+        self.count += present.sum(axis=0)
+        self.total += filled.sum(axis=0)
+        self.squares += (filled * filled).sum(axis=0)
+        self.score_total += np.where(present, scores, 0.0).sum(axis=0)
+        self.low += (flags == FLAG_LOW).sum(axis=0)
+        self.high += (flags == FLAG_HIGH).sum(axis=0)
+        self.minimum = np.minimum(self.minimum, np.where(present, values, np.inf).min(axis=0, initial=np.inf))
+        self.maximum = np.maximum(self.maximum, np.where(present, values, -np.inf).max(axis=0, initial=-np.inf))
+
+    def summary(self, metrics):
+        """Aggregates of the metrics that had at least one value"""
+        count = np.maximum(self.count, 1)
+        mean = self.total / count
+        std = np.sqrt(np.maximum(self.squares / count - mean * mean, 0.0))
+        result = {}
+        for column in np.flatnonzero(self.count):
+            result[metrics[column]] = {
+                "count": int(self.count[column]),
+                "mean": round(float(mean[column]), 4),
+                "std": round(float(std[column]), 4),
+                "min": float(self.minimum[column]),
+                "max": float(self.maximum[column]),
+                "low": int(self.low[column]),
+                "high": int(self.high[column]),
+                "abnormal_rate": round(float((self.low[column] + self.high[column]) / self.count[column]), 4),
+                "mean_score": round(float(self.score_total[column] / self.count[column]), 4),
+            }
+        return result
+
+
+class BulkEvaluator:
+    def __init__(self, engine):
+        """
+        Evaluate many reports' indicators at once against the reference ranges
+
+        Reports are loaded into a (reports x metrics) matrix aligned to the
+        metric order of medical_metrics.json, missing values as NaN, and
+        flags, scores and aggregates are computed with array operations
+        instead of per-indicator Python loops.
+
+        Args:
+            engine: ReferenceRangeEngine resolving names, units and ranges
+        """
+        self.engine = engine
+        self.metrics = list(engine.ranges)
+        self.columns = {metric: column for column, metric in enumerate(self.metrics)}
+        self.low = np.array([engine.ranges[metric]["range"][0] for metric in self.metrics], dtype=float)
+        self.high = np.array([engine.ranges[metric]["range"][1] for metric in self.metrics], dtype=float)
+        # Metrics with sex or age specific ranges, the only columns needing per-report bounds
+        self._specific = [
+            (self.columns[metric], spec) for metric, spec in engine.ranges.items() if spec["sex"] or spec["age"]
+        ]
+
+    def aggregates(self):
+        return MetricAggregates(len(self.metrics))
+
+    def load(self, reports):
+        """
+        Matrix of indicator values for a block of reports
+
+        Args:
+            reports: Indicator dicts ({name: value} or the /upload format
+                {name: [value, low, high]}), or objects with "indicators"
+                and optional "units", "sex" and "age"
+
+        Returns:
+            tuple: (values, sexes, ages, unmatched) where values is a float
+            matrix with NaN for missing indicators
+        """
+        sexes = np.full(len(reports), "", dtype=object)
+        ages = np.full(len(reports), np.nan)
+        unmatched = []
+        # Coordinates and values are collected first and written into the matrix in one assignment
+        rows, columns, entries = [], [], []
+        for row, report in enumerate(reports):
+            indicators, units = report if isinstance(report, dict) else {}, {}
+            if isinstance(indicators.get("indicators"), dict):
+                indicators, units = report["indicators"], report.get("units") or {}
+                # Same spellings as the scalar engine, an unknown sex gets the general range
+                sexes[row] = normalize_sex(report.get("sex")) or ""
+                if isinstance(report.get("age"), (int, float)):
+                    ages[row] = report["age"]
+            missed = []
+            seen = set()
+            for name, value in indicators.items():
+                if isinstance(value, (list, tuple)):
+                    value = value[0] if value else None
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metric, _ = self.engine.resolve(name)
+                if metric is None:
+                    missed.append(name)
+                    continue
+                if units.get(name):
+                    converted = self.engine.convert(metric, value, units[name])
+                    value = value if converted is None else converted
+                # The first value of a metric wins, like add_normal_ranges
+                if metric not in seen:
+                    seen.add(metric)
+                    rows.append(row)
+                    columns.append(self.columns[metric])
+                    entries.append(value)
+            unmatched.append(missed)
+
+        values = np.full((len(reports), len(self.metrics)), np.nan)
+        values[rows, columns] = entries
+        return values, sexes, ages, unmatched
+
+    def bounds(self, sexes, ages):
+        """Per-report (low, high) matrices, default ranges broadcast and specific ranges applied by mask"""
+        low = np.broadcast_to(self.low, (len(sexes), len(self.metrics))).copy()
+        high = np.broadcast_to(self.high, (len(sexes), len(self.metrics))).copy()
+        for column, spec in self._specific:
+            for sex, (sex_low, sex_high) in spec["sex"].items():
+                mask = sexes == sex
+                low[mask, column] = sex_low
+                high[mask, column] = sex_high
+            # Age rules take precedence, the first matching rule wins so they are applied in reverse
+            for rule in reversed(spec["age"]):
+                with np.errstate(invalid="ignore"):
+                    mask = (ages >= rule.get("min", 0)) & (ages < rule.get("max", np.inf))
+                if rule.get("sex") is not None:
+                    mask &= sexes == rule["sex"]
+                low[mask, column] = rule["range"][0]
+                high[mask, column] = rule["range"][1]
+        return low, high
+
+    def evaluate(self, values, low, high):
+        """
+        Flags and deviation scores of a value matrix
+
+        The score is the distance from the middle of the range in units of
+        half its width: within [-1, 1] is inside the range, 3 is one range
+        width above the upper limit.
+
+        Returns:
+            tuple: (flags, scores) matrices
+        """
+        present = ~np.isnan(values)
+        flags = np.full(values.shape, FLAG_MISSING, dtype=np.int8)
+        flags[present] = FLAG_NORMAL
+        with np.errstate(invalid="ignore"):
+            flags[present & (values < low)] = FLAG_LOW
+            flags[present & (values > high)] = FLAG_HIGH
+            half_width = (high - low) / 2
+            scores = (values - (high + low) / 2) / np.where(half_width > 0, half_width, 1.0)
+        return flags, scores
+
+    def evaluate_block(self, reports, aggregates=None):
+        """
+        Evaluate a block of reports in one vectorized pass
+
+        Args:
+            reports: See load()
+            aggregates: MetricAggregates the block is added to
+
+        Returns:
+            list: Per-report results in input order
+        """
+        values, sexes, ages, unmatched = self.load(reports)
+        low, high = self.bounds(sexes, ages)
+        flags, scores = self.evaluate(values, low, high)
+        if aggregates is not None:
+            aggregates.add(values, flags, scores)
+
+        results = []
+        rows, columns = np.nonzero(flags != FLAG_MISSING)
+        # Rows come out sorted, so each report's indicators are one contiguous slice
+        boundaries = np.searchsorted(rows, np.arange(len(reports) + 1)).tolist()
+        # Plain Python lists make building the per-report dicts much cheaper than indexing arrays
+        cell_values = values[rows, columns].tolist()
+        cell_lows = low[rows, columns].tolist()
+        cell_highs = high[rows, columns].tolist()
+        cell_flags = flags[rows, columns].tolist()
+        cell_scores = np.round(scores[rows, columns], 4).tolist()
+        columns = columns.tolist()
+        for row, report in enumerate(reports):
+            indicators = {}
+            abnormal = []
+            for cell in range(boundaries[row], boundaries[row + 1]):
+                metric = self.metrics[columns[cell]]
+                flag = FLAG_NAMES[cell_flags[cell]]
+                indicators[metric] = {
+                    "value": cell_values[cell],
+                    "low": cell_lows[cell],
+                    "high": cell_highs[cell],
+                    "flag": flag,
+                    "score": cell_scores[cell],
+                }
+                if flag != "normal":
+                    abnormal.append(metric)
+            result = {"indicators": indicators, "abnormal": abnormal, "unmatched": unmatched[row]}
+            if isinstance(report, dict) and isinstance(report.get("indicators"), dict) and "id" in report:
+                result["id"] = report["id"]
+            results.append(result)
+        return results
+
+
+@lru_cache(maxsize=None)
+def load_bulk_evaluator(metrics_file):
+    """BulkEvaluator for a metrics file, built once per process"""
+    return BulkEvaluator(load_reference_ranges(metrics_file))
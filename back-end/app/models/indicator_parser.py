@@ -0,0 +1,317 @@
+# app/models/indicator_parser.py
+import json
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+
+# Alternative names of the indicators in medical_metrics.json as they appear on lab reports
+INDICATOR_ALIASES = {
+    "Body Temperature": ["temperature", "temp", "body temp", "体温"],
+    "Systolic Blood Pressure": ["systolic", "systolic bp", "sbp", "收缩压"],
+    "Diastolic Blood Pressure": ["diastolic", "diastolic bp", "dbp", "舒张压"],
+    "Heart Rate": ["pulse", "pulse rate", "hr", "心率", "脉搏"],
+    "Respiratory Rate": ["respiration", "respiration rate", "rr", "resp rate", "呼吸"],
+    "Oxygen Saturation": ["spo2", "sao2", "o2 saturation", "o2 sat", "血氧饱和度"],
+    "Fasting Blood Glucose": ["glucose", "glucose fasting", "fasting glucose", "fasting plasma glucose", "fbg", "fbs",
+                              "fpg", "glu", "blood glucose", "空腹血糖", "葡萄糖"],
+    "Postprandial Blood Glucose": ["postprandial glucose", "2h postprandial glucose", "ppbg", "ppg", "2hpg",
+                                   "餐后血糖"],
+    "Total Cholesterol": ["cholesterol", "cholesterol total", "chol", "tc", "总胆固醇"],
+    "LDL Cholesterol": ["ldl", "ldl c", "ldl-c", "low density lipoprotein", "ldl cholesterol calculated",
+                        "低密度脂蛋白胆固醇"],
+    "HDL Cholesterol": ["hdl", "hdl c", "hdl-c", "high density lipoprotein", "高密度脂蛋白胆固醇"],
+    "Triglycerides": ["triglyceride", "tg", "trig", "甘油三酯"],
+    "Hemoglobin": ["haemoglobin", "hb", "hgb", "血红蛋白"],
+    "White Blood Cell Count": ["white blood cells", "white blood cell", "wbc", "wbc count", "leukocytes",
+                               "leukocyte count", "白细胞", "白细胞计数"],
+    "Red Blood Cell Count": ["red blood cells", "red blood cell", "rbc", "rbc count", "erythrocytes",
+                             "erythrocyte count", "红细胞", "红细胞计数"],
+    "Platelet Count": ["platelets", "platelet", "plt", "thrombocytes", "血小板", "血小板计数"],
+    "Hematocrit": ["haematocrit", "hct", "pcv", "packed cell volume", "红细胞压积"],
+    "Serum Creatinine": ["creatinine", "creat", "cr", "scr", "肌酐"],
+    "Blood Urea Nitrogen": ["bun", "urea nitrogen", "urea", "尿素氮"],
+    "Sodium": ["na", "serum sodium", "钠"],
+    "Potassium": ["k", "serum potassium", "钾"],
+    "Calcium": ["ca", "serum calcium", "total calcium", "钙"],
+    "Magnesium": ["mg", "serum magnesium", "镁"],
+    "Phosphorus": ["phosphate", "inorganic phosphorus", "phos", "磷"],
+    "C-Reactive Protein": ["crp", "c reactive protein", "hs crp", "hscrp", "c反应蛋白"],
+    "Erythrocyte Sedimentation Rate": ["esr", "sed rate", "sedimentation rate", "血沉", "红细胞沉降率"],
+    "Alkaline Phosphatase": ["alp", "alk phos", "alkp", "碱性磷酸酶"],
+    "Aspartate Aminotransferase": ["ast", "sgot", "ast sgot", "谷草转氨酶", "天门冬氨酸氨基转移酶"],
+    "Alanine Aminotransferase": ["alt", "sgpt", "alt sgpt", "谷丙转氨酶", "丙氨酸氨基转移酶"],
+    "Gamma-Glutamyl Transferase": ["ggt", "gamma gt", "ggtp", "gamma glutamyl transpeptidase", "γ-gt",
+                                   "谷氨酰转移酶"],
+    "Bilirubin": ["total bilirubin", "bilirubin total", "tbil", "t bil", "总胆红素"],
+    "Albumin": ["alb", "serum albumin", "白蛋白"],
+    "Total Protein": ["protein total", "tp", "serum protein", "总蛋白"],
+    "Ferritin": ["serum ferritin", "铁蛋白"],
+    "Vitamin D": ["25 oh vitamin d", "25 hydroxy vitamin d", "vit d", "25(oh)d", "维生素d"],
+    "Vitamin B12": ["b12", "vit b12", "cobalamin", "维生素b12"],
+    "Thyroid-Stimulating Hormone": ["tsh", "thyroid stimulating hormone", "thyrotropin", "促甲状腺激素"],
+    "Free T4": ["ft4", "free thyroxine", "游离甲状腺素"],
+    "Free T3": ["ft3", "free triiodothyronine", "游离三碘甲状腺原氨酸"],
+    "Parathyroid Hormone": ["pth", "intact pth", "甲状旁腺激素"],
+    "Cortisol": ["serum cortisol", "皮质醇"],
+    "Testosterone": ["total testosterone", "睾酮"],
+    "Progesterone": ["孕酮"],
+    "Estradiol": ["e2", "oestradiol", "雌二醇"],
+    "Prostate-Specific Antigen": ["psa", "total psa", "prostate specific antigen", "前列腺特异性抗原"],
+    "HbA1c": ["hba1c", "a1c", "glycated hemoglobin", "glycosylated hemoglobin", "hemoglobin a1c", "糖化血红蛋白"],
+    "Insulin": ["fasting insulin", "胰岛素"],
+    "Lactic Acid": ["lactate", "乳酸"],
+    "Ammonia": ["nh3", "blood ammonia", "血氨"],
+    "D-Dimer": ["d dimer", "ddimer", "d-二聚体"],
+}
+
+# Lines with a number that are not lab results
+SKIP_PATTERN = re.compile(
+    r"\b(date|age|id|no|number|tel|phone|page|dob|birth|bed|ward|sample|specimen|collected|received|"
+    r"reported|printed)\b",
+    re.IGNORECASE,
+)
+
+# Start of the value: a number, optionally after a comparison sign, not glued to a preceding letter or digit
+VALUE_START = re.compile(r"(?<![A-Za-z0-9.])[<>≤≥]?\s*\d")
+# A number with thousands separators ("1,250,000") or with a decimal point or comma
+NUMBER = r"\d{1,3}(?:,\d{3})+(?!\d)|\d+(?:[.,]\d+)?"
+VALUE_PATTERN = re.compile(
+    rf"^\s*(?P<sign>[<>≤≥]=?)?\s*(?P<low>{NUMBER})(?![.,]?\d)"
+    rf"(?:\s*(?:-|–|~|to)\s*(?P<high>{NUMBER})(?![.,]?\d))?"
+    # A number glued to letters ("25-OH", "3x10") is part of a name, not a value
+    r"(?![-–]?[A-Za-z])"
+)
+# Commas of a valid thousands grouping, any other comma is a decimal comma
+THOUSANDS = re.compile(r"^[1-9]\d{0,2}(?:,\d{3})+$")
+BLOOD_PRESSURE = re.compile(r"^(?:blood pressure|bp|血压)(?![a-z])\D*(\d{2,3})\s*/\s*(\d{2,3})", re.IGNORECASE)
+# Unit after a value: "%" or a token with a slash such as "mg/dL", "x10^9/L", "mmol/mol"
+UNIT_PATTERN = re.compile(r"^\s*(?P<unit>%|[^\s/()\[\]]*/[^\s()\[\],;|]+)")
+SEX_PATTERN = re.compile(r"(?:\bsex|\bgender|性别)\s*[:：]?\s*(male|female|m|f|男|女)(?![a-z])", re.IGNORECASE)
+AGE_PATTERN = re.compile(r"(?:\bage|年龄)\s*[:：]?\s*(\d{1,3})(?!\d)", re.IGNORECASE)
+DATE_PATTERN = re.compile(r"(?<!\d)((?:19|20)\d{2})[-/.年](\d{1,2})[-/.月](\d{1,2})(?!\d)")
+# Lines whose date is when the sample was taken, and lines whose date is not
+REPORT_DATE_LINE = re.compile(r"collect|sampl|report|test|exam|采样|采集|报告|检验|检查", re.IGNORECASE)
+BIRTH_DATE_LINE = re.compile(r"birth|dob|出生", re.IGNORECASE)
+LIST_MARKER = re.compile(r"^\s*(?:\d{1,2}[.)]|[-*•])\s+")
+PARENTHESES = re.compile(r"[(\[（](.*?)[)\]）]")
+# Specimens other than blood, "Glucose (urine)" is a different test than "Glucose"
+OTHER_SPECIMENS = {
+    "urine", "urinary", "ur", "u", "csf", "stool", "fecal", "faecal", "saliva", "salivary", "pleural",
+    "ascitic", "synovial", "sweat", "24h", "24hr", "尿",
+}
+
+
+def normalize_name(name):
+    """Lower case, punctuation removed, single spaces"""
+    name = name.lower().replace("_", " ")
+    name = re.sub(r"[^\w\sγ]", " ", name)
+    return " ".join(name.split())
+
+
+def name_candidates(name):
+    """
+    Normalized keys to look up for an indicator name, most specific first
+
+    "Hemoglobin (HGB)" is tried as a whole, without the parentheses and as
+    "hgb". A parenthesized specimen qualifier ("Glucose (urine)") is part
+    of the name, so such names are only tried as a whole.
+    """
+    key = normalize_name(name)
+    inner = PARENTHESES.findall(name)
+    if not inner or any(OTHER_SPECIMENS & set(normalize_name(part).split()) for part in inner):
+        return [key]
+    return [key, normalize_name(PARENTHESES.sub(" ", name))] + [normalize_name(part) for part in inner]
+
+
+@lru_cache(maxsize=None)
+def build_name_index(metrics_file):
+    """Map normalized names and aliases to the indicator names of medical_metrics.json, built once per file"""
+    with open(metrics_file, "r") as f:
+        reference_names = list(json.load(f))
+    index = {}
+    for name in reference_names:
+        index[normalize_name(name)] = name
+        for alias in INDICATOR_ALIASES.get(name, []):
+            index.setdefault(normalize_name(alias), name)
+    return index
+
+
+def parse_number(text):
+    """
+    Parse "14.2", "14,2" or "0,125" (decimal comma), "4,500" or "1,250,000" (thousands separators)
+
+    Raises:
+        ValueError: Commas that are neither a thousands grouping nor a single decimal comma
+    """
+    if "," in text:
+        text = text.replace(",", "") if THOUSANDS.match(text) else text.replace(",", ".")
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def parse_value(text):
+    """
+    Numeric value at the start of text, following the extraction prompt rules
+
+    Ranges give their midpoint and "<X" / ">X" give X.
+
+    Returns:
+        int or float, or None if text does not start with a value it can read
+    """
+    match = VALUE_PATTERN.match(text)
+    if match is None:
+        return None
+    try:
+        low = parse_number(match.group("low"))
+        if match.group("high") is not None and match.group("sign") is None:
+            midpoint = (low + parse_number(match.group("high"))) / 2
+            return int(midpoint) if float(midpoint).is_integer() else round(midpoint, 4)
+    except ValueError:
+        return None
+    return low
+
+
+def coerce_value(value):
+    """
+    Numeric indicator value from a model answer
+
+    Numbers are kept, strings such as "5.2 mmol/L" or "<0.5" are parsed
+    with parse_value, anything else gives None.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        return parse_value(value)
+    return None
+
+
+def parse_unit(text):
+    """Unit following the value at the start of text, or None"""
+    match = VALUE_PATTERN.match(text)
+    if match is None:
+        return None
+    unit = UNIT_PATTERN.match(text[match.end():])
+    return unit.group("unit") if unit is not None else None
+
+
+def normalize_sex(value):
+    """
+    "male" or "female" for a sex as written on reports or sent by clients ("F", "Male", "女")
+
+    Returns:
+        str or None if value is not a recognized sex
+    """
+    if not isinstance(value, str):
+        return None
+    value = value.strip().lower()
+    if value in ("female", "f", "女"):
+        return "female"
+    if value in ("male", "m", "男"):
+        return "male"
+    return None
+
+
+def parse_patient(text):
+    """
+    Sex and age stated in the report header
+
+    Returns:
+        dict: "sex" ("male" or "female") and "age" in years, for what was found
+    """
+    patient = {}
+    sex = SEX_PATTERN.search(text)
+    if sex is not None:
+        patient["sex"] = normalize_sex(sex.group(1))
+    age = AGE_PATTERN.search(text)
+    if age is not None:
+        patient["age"] = int(age.group(1))
+    return patient
+
+
+def parse_report_date(text):
+    """
+    Date of the report as a UTC timestamp, or None
+
+    Dates on collection or report lines are preferred, birth dates are
+    never used.
+    """
+    fallback = None
+    for line in (text or "").splitlines():
+        if BIRTH_DATE_LINE.search(line):
+            continue
+        for match in DATE_PATTERN.finditer(line):
+            try:
+                date = datetime(*map(int, match.groups()), tzinfo=timezone.utc).timestamp()
+            except ValueError:
+                continue
+            if REPORT_DATE_LINE.search(line):
+                return date
+            if fallback is None:
+                fallback = date
+    return fallback
+
+
+def _split_line(line):
+    """Split a lab line into its name and value parts, and the unit cell of table rows"""
+    if "|" in line:
+        # Table rows rebuilt by the OCR layout step: name | value | unit | range
+        cells = [cell.strip() for cell in line.split("|")]
+        return cells[0], cells[1] if len(cells) > 1 else "", cells[2] if len(cells) > 2 else None
+    match = VALUE_START.search(line)
+    if match is None:
+        return line, "", None
+    return line[:match.start()], line[match.start():], None
+
+
+def _lookup(name, index):
+    """Indicator name for the name part of a line, trying parenthesized abbreviations too"""
+    for key in name_candidates(name):
+        if key in index:
+            return index[key]
+    return None
+
+
+def parse_indicators(text, index, units=None):
+    """
+    Extract indicator values from OCR lines without the LLM
+
+    Args:
+        text: OCR text of the report
+        index: Name index from build_name_index
+        units: Optional dict filled with the unit of each indicator, where the line states one
+
+    Returns:
+        tuple: (indicators, unresolved) where indicators maps indicator
+        names to numbers and unresolved lists the lines that look like
+        results but could not be parsed
+    """
+    indicators = {}
+    unresolved = []
+    for raw_line in text.splitlines():
+        line = LIST_MARKER.sub("", raw_line).strip()
+        # A result needs a name and a number
+        if not re.search(r"\d", line) or not re.search(r"[^\W\d_]", line):
+            continue
+        if SKIP_PATTERN.search(line):
+            continue
+
+        # "Blood pressure 120/80 mmHg" holds two indicators
+        pressure = BLOOD_PRESSURE.match(line)
+        if pressure is not None:
+            indicators.setdefault("Systolic Blood Pressure", int(pressure.group(1)))
+            indicators.setdefault("Diastolic Blood Pressure", int(pressure.group(2)))
+            continue
+
+        name_part, value_part, unit_cell = _split_line(line)
+        name = _lookup(name_part, index)
+        value = parse_value(value_part) if name is not None else None
+        if value is None:
+            unresolved.append(line)
+        elif name not in indicators:
+            indicators[name] = value
+            unit = unit_cell or parse_unit(value_part)
+            if units is not None and unit:
+                units[name] = unit
+    return indicators, unresolved
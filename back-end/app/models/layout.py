@@ -0,0 +1,109 @@
+# app/models/layout.py
+import numpy as np
+
+# Separator placed between table cells in the compact representation
+CELL_SEPARATOR = " | "
+
+
+def _boxes(results):
+    """Turn EasyOCR detail=1 results into dicts with box geometry"""
+    items = []
+    for box, text, confidence in results:
+        text = text.strip()
+        if not text:
+            continue
+        xs = [point[0] for point in box]
+        ys = [point[1] for point in box]
+        items.append({
+            "text": text,
+            "left": float(min(xs)),
+            "right": float(max(xs)),
+            "top": float(min(ys)),
+            "bottom": float(max(ys)),
+            "center_y": (min(ys) + max(ys)) / 2.0,
+            "height": float(max(ys) - min(ys)),
+            "confidence": confidence,
+        })
+    return items
+
+
+def group_rows(items, line_height):
+    """Group boxes whose vertical centers are within half a line of each other"""
+    rows = []
+    for item in sorted(items, key=lambda i: i["center_y"]):
+        if rows and abs(item["center_y"] - rows[-1]["center_y"]) <= line_height * 0.5:
+            row = rows[-1]
+            row["items"].append(item)
+            row["center_y"] = sum(i["center_y"] for i in row["items"]) / len(row["items"])
+        else:
+            rows.append({"center_y": item["center_y"], "items": [item]})
+    return [sorted(row["items"], key=lambda i: i["left"]) for row in rows]
+
+
+def split_cells(row, line_height):
+    """Merge words of a row into cells, a wide horizontal gap starts a new cell"""
+    cells = []
+    for item in row:
+        if cells and item["left"] - cells[-1]["right"] <= line_height * 1.2:
+            cells[-1]["text"] += " " + item["text"]
+            cells[-1]["right"] = max(cells[-1]["right"], item["right"])
+        else:
+            cells.append({"text": item["text"], "left": item["left"], "right": item["right"]})
+    return cells
+
+
+def column_anchors(table_rows, line_height):
+    """Cluster the left edges of cells across rows into column positions"""
+    lefts = sorted(cell["left"] for cells in table_rows for cell in cells)
+    if not lefts:
+        return []
+
+    clusters = [[lefts[0]]]
+    for left in lefts[1:]:
+        if left - clusters[-1][-1] > line_height * 2:
+            clusters.append([left])
+        else:
+            clusters[-1].append(left)
+    return [float(np.mean(cluster)) for cluster in clusters]
+
+
+def reconstruct_layout(results):
+    """
+    Rebuild the row/column structure of a report from EasyOCR boxes
+
+    Rows with several cells are aligned to shared column positions and
+    written as "name | value | unit | range", other rows are kept as
+    plain text lines. This keeps the indicator-value pairs together in
+    a compact form that needs far fewer prompt tokens than paragraphs.
+
+    Args:
+        results: Output of reader.readtext(..., detail=1)
+
+    Returns:
+        str: Compact text with one line per row
+    """
+    items = _boxes(results)
+    if not items:
+        return ""
+
+    line_height = float(np.median([item["height"] for item in items])) or 1.0
+    rows = [split_cells(row, line_height) for row in group_rows(items, line_height)]
+    anchors = column_anchors([cells for cells in rows if len(cells) > 1], line_height)
+
+    lines = []
+    for cells in rows:
+        if len(cells) == 1 or not anchors:
+            lines.append(" ".join(cell["text"] for cell in cells))
+            continue
+
+        columns = [""] * len(anchors)
+        for cell in cells:
+            index = int(np.argmin([abs(cell["left"] - anchor) for anchor in anchors]))
+            columns[index] = f"{columns[index]} {cell['text']}".strip()
+
+        # Trailing empty columns carry no information
+        while columns and not columns[-1]:
+            columns.pop()
+        lines.append(CELL_SEPARATOR.join(columns))
+
+    return "\n".join(lines)
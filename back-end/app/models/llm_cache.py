@@ -0,0 +1,154 @@
+# app/models/llm_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app import config
+
+
+def request_fingerprint(payload):
+    """
+    Stable hash of everything that determines a completion
+
+    Args:
+        payload: Chat completion payload (model, messages, temperature, max_tokens, ...)
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    relevant = {key: value for key, value in payload.items() if key != "stream"}
+    encoded = json.dumps(relevant, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(self, db_path=None, memory_entries=None, max_bytes=None, max_temperature=None):
+        """
+        Two tier cache of LLM completions keyed by the request fingerprint
+
+        Recent entries are kept in an in-memory LRU, everything is persisted
+        in SQLite where the least recently used entries are evicted once the
+        total size exceeds max_bytes. Only low temperature requests are
+        cached, since high temperature answers are expected to vary.
+
+        Args:
+            db_path: Path of the SQLite database file
+            memory_entries: Size of the in-memory LRU tier
+            max_bytes: Size cap of the on-disk tier
+            max_temperature: Highest temperature that is still cached
+        """
+        db_path = db_path or config.LLM_CACHE_PATH
+        self.memory_entries = config.LLM_CACHE_MEMORY_ENTRIES if memory_entries is None else memory_entries
+        self.max_bytes = config.LLM_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_temperature = config.LLM_CACHE_MAX_TEMPERATURE if max_temperature is None else max_temperature
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "skipped": 0, "evictions": 0}
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                fingerprint TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_last_access ON completions (last_access)")
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+
+    def cacheable(self, payload):
+        """Whether a request is deterministic enough to cache"""
+        cacheable = payload.get("temperature", 1.0) <= self.max_temperature
+        if not cacheable:
+            with self._lock:
+                self.metrics["skipped"] += 1
+        return cacheable
+
+    def get(self, fingerprint):
+        """Return the cached completion, or None"""
+        with self._lock:
+            if fingerprint in self._memory:
+                self._memory.move_to_end(fingerprint)
+                self.metrics["memory_hits"] += 1
+                return self._memory[fingerprint]
+
+            row = self._conn.execute(
+                "SELECT content FROM completions WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            if row is None:
+                self.metrics["misses"] += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE completions SET last_access = ? WHERE fingerprint = ?", (time.time(), fingerprint)
+            )
+            self._conn.commit()
+            self.metrics["disk_hits"] += 1
+            self._remember(fingerprint, row[0])
+            return row[0]
+
+    def put(self, fingerprint, content):
+        """Store a completion in both tiers"""
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            self._remember(fingerprint, content)
+
+            previous = self._conn.execute(
+                "SELECT size FROM completions WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (fingerprint, content, size, last_access) VALUES (?, ?, ?, ?)",
+                (fingerprint, content, size, time.time()),
+            )
+            self._disk_bytes += size - (previous[0] if previous else 0)
+            self._evict()
+            self._conn.commit()
+            self.metrics["stores"] += 1
+
+    def _remember(self, fingerprint, content):
+        self._memory[fingerprint] = content
+        self._memory.move_to_end(fingerprint)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """Drop least recently used disk entries until under the size cap"""
+        if self._disk_bytes <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT fingerprint, size FROM completions ORDER BY last_access").fetchall()
+        stale = []
+        for fingerprint, size in rows:
+            if self._disk_bytes <= self.max_bytes:
+                break
+            stale.append((fingerprint,))
+            self._disk_bytes -= size
+            self._memory.pop(fingerprint, None)
+        self._conn.executemany("DELETE FROM completions WHERE fingerprint = ?", stale)
+        self.metrics["evictions"] += len(stale)
+
+    def stats(self):
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.metrics["memory_hits"] + self.metrics["disk_hits"] + self.metrics["misses"]
+            hits = self.metrics["memory_hits"] + self.metrics["disk_hits"]
+            return {
+                **self.metrics,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+                "max_bytes": self.max_bytes,
+                "max_temperature": self.max_temperature,
+            }
@@ -0,0 +1,321 @@
+# app/models/llm_client.py
+import asyncio
+import json
+import time
+
+import httpx
+
+from app import config
+from app.models.llm_cache import LLMResponseCache, request_fingerprint
+from app.models.llm_router import LLMRouter
+from app.models.llm_scheduler import LLMScheduler, current_llm_priority
+from app.models.llm_tasks import TaskRouter
+from app.models.tokenizer import count_tokens, count_message_tokens
+from app.models.single_flight import SingleFlight, StreamSingleFlight
+
+
+class LLMAPIError(Exception):
+    """The LLM endpoint answered with an error status"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMClient:
+    def __init__(self, api_url=None, timeout=None, connect_timeout=None, max_connections=None, max_keepalive=None,
+                 cache=None, coalesce=None, scheduler=None, tasks=None):
+        """
+        Shared async client for OpenAI-compatible chat completions endpoints
+
+        One httpx.AsyncClient is kept for the whole process so connections
+        are pooled and kept alive, and LLM calls never block the event loop.
+        Requests are spread over the LLM_API_URLS pool by an LLMRouter.
+
+        Args:
+            api_url: Chat completions URL, defaults to the LLM_API_URLS pool
+            timeout: Seconds to wait for a response (generation can be slow)
+            connect_timeout: Seconds to wait for a connection
+            max_connections: Maximum open connections to the endpoint
+            max_keepalive: Maximum idle connections kept alive
+            cache: LLMResponseCache consulted before calling the endpoint
+            coalesce: Share one upstream generation between identical concurrent requests
+            scheduler: LLMScheduler limiting and prioritizing requests sent to the endpoint
+            tasks: TaskRouter with the per-task model and generation settings
+        """
+        self.scheduler = scheduler or LLMScheduler()
+        self.router = LLMRouter([api_url] if api_url else config.LLM_API_URLS, scheduler=self.scheduler)
+        self.api_url = self.router.endpoints[0].url
+        self.timeout = httpx.Timeout(
+            config.LLM_TIMEOUT if timeout is None else timeout,
+            connect=config.LLM_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout,
+        )
+        self.limits = httpx.Limits(
+            max_connections=config.LLM_MAX_CONNECTIONS if max_connections is None else max_connections,
+            max_keepalive_connections=config.LLM_MAX_KEEPALIVE if max_keepalive is None else max_keepalive,
+        )
+        self.cache = cache
+        self.coalesce = config.LLM_COALESCE if coalesce is None else coalesce
+        self.tasks = tasks or TaskRouter()
+        self._flights = SingleFlight()
+        self._stream_flights = StreamSingleFlight()
+        self._client = None
+        self._loop = None
+
+    async def start(self):
+        """Create the HTTP client on the running event loop"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                headers={"Content-Type": "application/json"},
+            )
+            self._loop = asyncio.get_running_loop()
+            self.router.start(self._check_health)
+        return self._client
+
+    async def aclose(self):
+        """Close pooled connections"""
+        await self.router.stop()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+    def _payload(self, messages, task, model, temperature, max_tokens, extra):
+        """Request payload, explicit arguments take precedence over the task's settings"""
+        settings = self.tasks.settings(task) if task else {}
+        if settings.get("stop") and "stop" not in extra:
+            extra = {**extra, "stop": settings["stop"]}
+        return {
+            "model": model or settings.get("model") or config.LLM_MODEL,
+            "messages": messages,
+            "temperature": settings.get("temperature", 0.1) if temperature is None else temperature,
+            "max_tokens": settings.get("max_tokens", 1000) if max_tokens is None else max_tokens,
+            **extra,
+        }
+
+    def _record(self, task, payload, start_time, content, error=False, cached=False):
+        """Per-task latency and token figures"""
+        if task is None:
+            return
+        self.tasks.record(
+            task,
+            payload["model"],
+            time.perf_counter() - start_time,
+            count_message_tokens(payload["messages"]),
+            count_tokens(content) if content else 0,
+            error=error,
+            cached=cached,
+        )
+
+    async def chat(self, messages, model=None, temperature=None, max_tokens=None, cache=True, priority=None,
+                   task=None, **extra):
+        """
+        Send a chat completion request and return the message content
+
+        Args:
+            messages: Chat messages
+            model: Model name, defaults to the task's model or LLM_MODEL
+            temperature: Sampling temperature, defaults to the task's
+            max_tokens: Maximum generated tokens, defaults to the task's
+            cache: Whether the response cache may answer this request
+            priority: Scheduling priority class, defaults to the one set for the current request
+            task: Task name (summarize, extract, ...) selecting the generation settings and metrics
+            extra: Additional payload fields (stop, response_format, ...)
+
+        Returns:
+            str: Generated text
+        """
+        start_time = time.perf_counter()
+        payload = self._payload(messages, task, model, temperature, max_tokens, extra)
+        fingerprint = request_fingerprint(payload)
+
+        use_cache = cache and self.cache is not None and self.cache.cacheable(payload)
+        if use_cache:
+            content = self.cache.get(fingerprint)
+            if content is not None:
+                self._record(task, payload, start_time, content, cached=True)
+                return content
+
+        priority = priority or current_llm_priority()
+
+        async def generate():
+            async with self.scheduler.slot(priority):
+                content = await self._post(payload)
+            if use_cache:
+                self.cache.put(fingerprint, content)
+            return content
+
+        try:
+            if not self.coalesce:
+                content = await generate()
+            else:
+                # Identical requests already in flight share that generation
+                content = await self._flights.do(fingerprint, generate)
+        except Exception:
+            self._record(task, payload, start_time, None, error=True)
+            raise
+        self._record(task, payload, start_time, content)
+        return content
+
+    async def _post(self, payload):
+        return await self.router.request(lambda url: self._post_to(url, payload))
+
+    async def _post_to(self, url, payload):
+        client = await self.start()
+        try:
+            response = await client.post(url, json=payload)
+        except httpx.HTTPError as e:
+            raise LLMAPIError(f"LMStudio API request failed: {str(e) or type(e).__name__}")
+
+        if response.status_code != 200:
+            raise LLMAPIError(
+                f"API call failed, status code: {response.status_code}, response: {response.text}",
+                status_code=response.status_code,
+            )
+        return response.json()['choices'][0]['message']['content']
+
+    async def stream_chat(self, messages, model=None, temperature=None, max_tokens=None, cache=True, priority=None,
+                          task=None, stop_when=None, **extra):
+        """
+        Stream a chat completion, yielding content deltas as they arrive
+
+        Closing the generator (e.g. because the HTTP client went away)
+        closes the upstream connection, which stops the generation on the
+        LLM server instead of letting it run to max_tokens. Cached answers
+        are yielded in one piece, and only fully streamed answers are cached.
+
+        Args:
+            stop_when: Factory of an object whose feed(delta) returns True once
+                the answer is complete, generation then stops early and the
+                answer so far counts as complete (e.g. JSONObjectScanner)
+
+        Yields:
+            str: Generated text fragments
+        """
+        start_time = time.perf_counter()
+        payload = self._payload(messages, task, model, temperature, max_tokens, extra)
+        fingerprint = request_fingerprint(payload)
+
+        use_cache = cache and self.cache is not None and self.cache.cacheable(payload)
+        if use_cache:
+            content = self.cache.get(fingerprint)
+            if content is not None:
+                self._record(task, payload, start_time, content, cached=True)
+                yield content
+                return
+
+        priority = priority or current_llm_priority()
+
+        async def generate():
+            parts = []
+            detector = stop_when() if stop_when is not None else None
+            # The backend slot is held until the stream ends or is closed
+            async with self.scheduler.slot(priority):
+                upstream = self._stream(payload)
+                try:
+                    async for delta in upstream:
+                        parts.append(delta)
+                        yield delta
+                        if detector is not None and detector.feed(delta):
+                            break
+                finally:
+                    await upstream.aclose()
+            if use_cache:
+                self.cache.put(fingerprint, "".join(parts))
+
+        if not self.coalesce:
+            deltas = generate()
+        else:
+            # Identical streams already in flight are shared token by token
+            deltas = self._stream_flights.stream(fingerprint, generate)
+
+        received = []
+        failed = False
+        try:
+            async for delta in deltas:
+                received.append(delta)
+                yield delta
+        except Exception:
+            failed = True
+            raise
+        finally:
+            await deltas.aclose()
+            self._record(task, payload, start_time, "".join(received), error=failed)
+
+    async def _stream(self, payload):
+        payload = {**payload, "stream": True}
+        client = await self.start()
+        async with self.router.connection() as url:
+            try:
+                async with client.stream("POST", url, json=payload) as response:
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode(errors="replace")
+                        raise LLMAPIError(
+                            f"API call failed, status code: {response.status_code}, response: {body}",
+                            status_code=response.status_code,
+                        )
+
+                    async for line in response.aiter_lines():
+                        # Server-sent events: "data: {...}" lines, terminated by "data: [DONE]"
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        delta = json.loads(data)['choices'][0].get('delta', {}).get('content')
+                        if delta:
+                            yield delta
+            except httpx.HTTPError as e:
+                raise LLMAPIError(f"LMStudio API request failed: {str(e) or type(e).__name__}")
+
+    async def _check_health(self, url):
+        """Active health check of one endpoint"""
+        try:
+            response = await self._client.get(url, timeout=self.timeout.connect or 5)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    def stats(self):
+        """Client and cache figures"""
+        stats = {
+            "api_url": self.api_url,
+            "router": self.router.stats(),
+            "coalescing": {
+                "enabled": self.coalesce,
+                "coalesced_requests": self._flights.coalesced,
+                "coalesced_streams": self._stream_flights.coalesced,
+                "in_flight": self._flights.in_flight(),
+                "streams_in_flight": self._stream_flights.in_flight(),
+            },
+            "scheduler": self.scheduler.stats(),
+            "tasks": self.tasks.stats(),
+        }
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+    def chat_sync(self, messages, **kwargs):
+        """
+        Blocking chat() for code running in a worker thread
+
+        The request still goes through the shared client on the event loop,
+        the calling thread just waits for it, keeping the priority of the
+        request that started the thread.
+        """
+        kwargs.setdefault("priority", current_llm_priority())
+        return self.run_sync(self.chat(messages, **kwargs))
+
+    def run_sync(self, coro):
+        """Run a coroutine on the client's event loop from a worker thread and wait for it"""
+        if self._loop is None or not self._loop.is_running():
+            coro.close()
+            raise LLMAPIError("LLM client is not running on an event loop")
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return future.result()
+
+
+# Create a singleton instance so every handler shares the connection pool and cache
+llm_client = LLMClient(cache=LLMResponseCache() if config.LLM_CACHE_ENABLED else None)
@@ -0,0 +1,278 @@
+# app/models/llm_router.py
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from app import config
+
+
+def health_url(api_url):
+    """Model list URL of an OpenAI-compatible server, used as its health check"""
+    suffix = "/chat/completions"
+    if api_url.endswith(suffix):
+        return api_url[: -len(suffix)] + "/models"
+    return api_url
+
+
+def is_node_failure(error):
+    """Whether an error says something about the endpoint rather than the request"""
+    status_code = getattr(error, "status_code", None)
+    return status_code is None or status_code >= 500
+
+
+class LLMEndpoint:
+    def __init__(self, url, latency_window):
+        self.url = url
+        self.health_url = health_url(url)
+        self.outstanding = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.last_used = 0.0
+        self.latencies = deque(maxlen=latency_window)
+        self.metrics = {"requests": 0, "errors": 0, "ejections": 0}
+
+    def available(self, now):
+        return now >= self.ejected_until
+
+    def stats(self, now):
+        latencies = sorted(self.latencies)
+        return {
+            "url": self.url,
+            "healthy": self.available(now),
+            "ejected_for": round(max(0.0, self.ejected_until - now), 1),
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.failures,
+            "p50_latency": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            **self.metrics,
+        }
+
+
+class LLMRouter:
+    def __init__(self, urls, failure_threshold=None, ejection_time=None, health_interval=None, hedging=None,
+                 hedge_min_delay=None, hedge_min_samples=None, latency_window=None, scheduler=None):
+        """
+        Spread LLM requests over a pool of OpenAI-compatible endpoints
+
+        Each request goes to the healthy endpoint with the fewest outstanding
+        requests. Endpoints failing failure_threshold times in a row (passive
+        check) or failing the periodic model list probe (active check) are
+        ejected for ejection_time seconds, doubling on repeated ejections,
+        and reinstated once a probe succeeds. With hedging enabled a request
+        still running after the pool's p95 latency is also sent to a second
+        endpoint and the first answer wins, provided the scheduler has a
+        free backend slot for it.
+
+        Args:
+            urls: Chat completions URLs of the pool
+            failure_threshold: Consecutive failures before an endpoint is ejected
+            ejection_time: Base ejection time in seconds
+            health_interval: Seconds between active health checks, 0 disables them
+            hedging: Send slow requests to a second endpoint
+            hedge_min_delay: Minimum delay before hedging, in seconds
+            hedge_min_samples: Latency samples needed before hedging starts
+            latency_window: Latency samples kept per endpoint
+            scheduler: LLMScheduler a hedged request takes its own backend slot from
+        """
+        latency_window = latency_window or config.LLM_LATENCY_WINDOW
+        self.endpoints = [LLMEndpoint(url, latency_window) for url in dict.fromkeys(urls)]
+        if not self.endpoints:
+            raise ValueError("No LLM endpoint configured, set LLM_API_URLS to at least one chat completions URL")
+        self.failure_threshold = failure_threshold or config.LLM_EJECT_FAILURES
+        self.ejection_time = config.LLM_EJECT_SECONDS if ejection_time is None else ejection_time
+        self.health_interval = config.LLM_HEALTH_INTERVAL if health_interval is None else health_interval
+        self.hedging = config.LLM_HEDGING if hedging is None else hedging
+        self.hedge_min_delay = config.LLM_HEDGE_MIN_DELAY if hedge_min_delay is None else hedge_min_delay
+        self.hedge_min_samples = config.LLM_HEDGE_MIN_SAMPLES if hedge_min_samples is None else hedge_min_samples
+        self.scheduler = scheduler
+        self._health_task = None
+        self.metrics = {"failovers": 0, "hedged": 0, "hedge_wins": 0, "hedges_skipped": 0}
+
+    def start(self, check):
+        """
+        Start the active health checks
+
+        Args:
+            check: Coroutine function taking a health check URL, returning True when healthy
+        """
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop(check))
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    async def _health_loop(self, check):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            results = await asyncio.gather(
+                *(check(endpoint.health_url) for endpoint in self.endpoints), return_exceptions=True
+            )
+            for endpoint, healthy in zip(self.endpoints, results):
+                if healthy is True:
+                    if not endpoint.available(time.monotonic()):
+                        print(f"LLM endpoint {endpoint.url} reinstated")
+                    endpoint.failures = 0
+                    endpoint.ejections = 0
+                    endpoint.ejected_until = 0.0
+                else:
+                    self._record_failure(endpoint)
+
+    def _record_failure(self, endpoint):
+        endpoint.metrics["errors"] += 1
+        endpoint.failures += 1
+        now = time.monotonic()
+        if endpoint.failures >= self.failure_threshold and endpoint.available(now):
+            duration = self.ejection_time * 2 ** min(endpoint.ejections, 5)
+            endpoint.ejections += 1
+            endpoint.metrics["ejections"] += 1
+            endpoint.ejected_until = now + duration
+            print(f"LLM endpoint {endpoint.url} ejected for {duration:.0f}s after {endpoint.failures} failures")
+
+    def _pick(self, exclude=(), healthy_only=False):
+        """Least outstanding requests among healthy endpoints, oldest use breaking ties"""
+        now = time.monotonic()
+        candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+        healthy = [endpoint for endpoint in candidates if endpoint.available(now)]
+        if healthy:
+            return min(healthy, key=lambda endpoint: (endpoint.outstanding, endpoint.last_used))
+        if healthy_only or not candidates:
+            return None
+        # Every endpoint is ejected, try the one due back first rather than failing outright
+        return min(candidates, key=lambda endpoint: endpoint.ejected_until)
+
+    def hedge_delay(self):
+        """p95 latency of the pool, or None while hedging is off or there are too few samples"""
+        if not self.hedging or len(self.endpoints) < 2:
+            return None
+        latencies = sorted(latency for endpoint in self.endpoints for latency in endpoint.latencies)
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        p95 = latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)]
+        return max(self.hedge_min_delay, p95)
+
+    def _attempt(self, endpoint, call):
+        """Start call on endpoint as a task, counted as outstanding right away so concurrent picks see it"""
+        endpoint.outstanding += 1
+        endpoint.last_used = time.monotonic()
+        endpoint.metrics["requests"] += 1
+        task = asyncio.ensure_future(self._run(endpoint, call))
+
+        def finished(_):
+            endpoint.outstanding -= 1
+
+        task.add_done_callback(finished)
+        return task
+
+    async def _run(self, endpoint, call):
+        start_time = time.perf_counter()
+        try:
+            result = await call(endpoint.url)
+        except Exception as e:
+            if is_node_failure(e):
+                self._record_failure(endpoint)
+            raise
+        endpoint.latencies.append(time.perf_counter() - start_time)
+        endpoint.failures = 0
+        return result
+
+    async def _hedged(self, endpoint, call, tried):
+        """Run call on endpoint, adding a hedge on another endpoint when it is slow"""
+        tasks = [self._attempt(endpoint, call)]
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                backup = None if done else self._pick(exclude=tried, healthy_only=True)
+                if backup is not None and self.scheduler is not None and not self.scheduler.try_acquire():
+                    # The hedge would exceed the backend's parallel slots, keep waiting on the first request
+                    self.metrics["hedges_skipped"] += 1
+                    backup = None
+                if backup is not None:
+                    tried.append(backup)
+                    self.metrics["hedged"] += 1
+                    hedge = self._attempt(backup, call)
+                    if self.scheduler is not None:
+                        hedge.add_done_callback(lambda _: self.scheduler.release())
+                    tasks.append(hedge)
+
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self.metrics["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The losing request is cancelled, which closes its connection
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def request(self, call):
+        """
+        Run a request on the pool
+
+        Endpoint failures (connection errors, 5xx) are retried once on
+        another endpoint, request errors (4xx) are raised right away.
+
+        Args:
+            call: Coroutine function taking the endpoint URL
+
+        Returns:
+            The result of call
+        """
+        tried = []
+        error = None
+        for attempt in range(min(2, len(self.endpoints))):
+            endpoint = self._pick(exclude=tried)
+            if endpoint is None:
+                break
+            if attempt:
+                self.metrics["failovers"] += 1
+            tried.append(endpoint)
+            try:
+                return await self._hedged(endpoint, call, tried)
+            except Exception as e:
+                if not is_node_failure(e):
+                    raise
+                error = e
+        if error is None:
+            raise RuntimeError("No LLM endpoint available for the request")
+        raise error
+
+    @asynccontextmanager
+    async def connection(self):
+        """Pick an endpoint for a streamed request, yielding its URL and tracking the outcome"""
+        endpoint = self._pick()
+        endpoint.outstanding += 1
+        endpoint.last_used = time.monotonic()
+        endpoint.metrics["requests"] += 1
+        try:
+            yield endpoint.url
+        except Exception as e:
+            if is_node_failure(e):
+                self._record_failure(endpoint)
+            raise
+        else:
+            endpoint.failures = 0
+        finally:
+            endpoint.outstanding -= 1
+
+    def stats(self):
+        now = time.monotonic()
+        delay = self.hedge_delay()
+        return {
+            "hedging": self.hedging,
+            "hedge_delay": round(delay, 3) if delay is not None else None,
+            **self.metrics,
+            "endpoints": [endpoint.stats(now) for endpoint in self.endpoints],
+        }
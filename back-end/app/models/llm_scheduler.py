@@ -0,0 +1,192 @@
+# app/models/llm_scheduler.py
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+
+from app import config
+
+# Priority classes, lower value is served first
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_DEFAULT = "default"
+PRIORITY_BULK = "bulk"
+PRIORITIES = {PRIORITY_INTERACTIVE: 0, PRIORITY_DEFAULT: 1, PRIORITY_BULK: 2}
+
+# Priority of LLM calls made from the current request or task
+_current_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_DEFAULT)
+
+
+def set_llm_priority(priority):
+    """Set the priority class of LLM calls made from the current request or task"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {priority}")
+    _current_priority.set(priority)
+
+
+def current_llm_priority():
+    return _current_priority.get()
+
+
+class LLMOverloaded(Exception):
+    """The LLM queue is over budget, the request was shed"""
+
+    def __init__(self, message, retry_after, status_code=503):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+def find_overload(error):
+    """Return the LLMOverloaded an exception was raised from, if any"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, LLMOverloaded):
+            return error
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return None
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency=None, slos=None, max_queue=None):
+        """
+        Admission control and priority queueing in front of the LLM backend
+
+        At most max_concurrency requests are sent to the backend at once,
+        matching its parallel decoding slots. Waiting requests are served by
+        priority class, then arrival order. A request is shed right away if
+        its class queue is full (429) or its estimated queue time exceeds the
+        class SLO (503), and a queued request giving up at its SLO is shed
+        as well, all with a Retry-After hint.
+
+        Args:
+            max_concurrency: Requests sent to the backend in parallel
+            slos: Maximum queue time in seconds per priority class
+            max_queue: Maximum queued requests per priority class
+        """
+        self.max_concurrency = max(1, config.LLM_MAX_CONCURRENCY if max_concurrency is None else max_concurrency)
+        self.slos = slos or {
+            PRIORITY_INTERACTIVE: config.LLM_QUEUE_SLO_INTERACTIVE,
+            PRIORITY_DEFAULT: config.LLM_QUEUE_SLO_DEFAULT,
+            PRIORITY_BULK: config.LLM_QUEUE_SLO_BULK,
+        }
+        self.max_queue = config.LLM_MAX_QUEUE if max_queue is None else max_queue
+
+        self._active = 0
+        self._heap = []
+        self._counter = itertools.count()
+        self._queued = {name: 0 for name in PRIORITIES}
+
+        # Moving average of how long a request holds a slot
+        self._service_time = 5.0
+        self.metrics = {
+            "admitted": 0,
+            "shed_queue_full": 0,
+            "shed_slo": 0,
+            "expired": 0,
+            "total_queue_time": 0.0,
+            "max_queue_time": 0.0,
+        }
+
+    def _waiting_ahead(self, rank):
+        return sum(self._queued[name] for name, other in PRIORITIES.items() if other <= rank)
+
+    def _estimate_wait(self, ahead):
+        """Expected queue time for a request with `ahead` requests before it"""
+        return (ahead // self.max_concurrency + 1) * self._service_time
+
+    def _retry_after(self, ahead):
+        return max(1, math.ceil(self._estimate_wait(ahead)))
+
+    def try_acquire(self):
+        """Take a free backend slot without waiting, returns False when none is free or requests are queued"""
+        if self._active < self.max_concurrency and not any(self._queued.values()):
+            self._active += 1
+            self.metrics["admitted"] += 1
+            return True
+        return False
+
+    async def acquire(self, priority=None):
+        """Wait for a backend slot, or raise LLMOverloaded"""
+        priority = priority or current_llm_priority()
+        rank = PRIORITIES[priority]
+
+        if self.try_acquire():
+            return
+
+        ahead = self._waiting_ahead(rank)
+        if self._queued[priority] >= self.max_queue:
+            self.metrics["shed_queue_full"] += 1
+            raise LLMOverloaded(
+                f"LLM queue for {priority} requests is full", self._retry_after(ahead), status_code=429
+            )
+        slo = self.slos[priority]
+        if self._estimate_wait(ahead) > slo:
+            self.metrics["shed_slo"] += 1
+            raise LLMOverloaded(
+                f"LLM backend is busy, estimated wait exceeds the {slo}s {priority} budget", self._retry_after(ahead)
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (rank, next(self._counter), future, priority))
+        self._queued[priority] += 1
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), slo)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up, pass it on
+                self.release()
+            else:
+                # Left in the heap, release() skips cancelled entries
+                future.cancel()
+                self._queued[priority] -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                self.metrics["expired"] += 1
+                raise LLMOverloaded(
+                    f"LLM request waited longer than the {slo}s {priority} budget", self._retry_after(ahead)
+                )
+            raise
+        finally:
+            waited = time.perf_counter() - queued_at
+            self.metrics["total_queue_time"] += waited
+            self.metrics["max_queue_time"] = max(self.metrics["max_queue_time"], waited)
+
+        self.metrics["admitted"] += 1
+
+    def release(self):
+        """Hand the slot to the next waiting request"""
+        while self._heap:
+            _, _, future, priority = heapq.heappop(self._heap)
+            if not future.done():
+                self._queued[priority] -= 1
+                future.set_result(True)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority=None):
+        """Hold a backend slot for the duration of a with block"""
+        await self.acquire(priority)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.perf_counter() - start_time)
+            self.release()
+
+    def stats(self):
+        """Queue depth, shedding and queue time figures"""
+        admitted = self.metrics["admitted"]
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queued": dict(self._queued),
+            "slos": self.slos,
+            "avg_service_time": round(self._service_time, 3),
+            **self.metrics,
+            "avg_queue_time": self.metrics["total_queue_time"] / admitted if admitted else 0.0,
+        }
@@ -0,0 +1,130 @@
+# app/models/llm_tasks.py
+import json
+import threading
+from collections import deque
+
+from app import config
+
+# Generation settings per task, model None means LLM_MODEL
+DEFAULT_TASKS = {
+    "summarize": {"model": None, "max_tokens": 400, "temperature": 0.1, "stop": None},
+    "interpret": {"model": None, "max_tokens": 1200, "temperature": 0.1, "stop": None},
+    "extract": {"model": None, "max_tokens": 2000, "temperature": 0, "stop": None},
+    "translate": {"model": None, "max_tokens": 2000, "temperature": 0.1, "stop": None},
+    "answer": {"model": None, "max_tokens": 2000, "temperature": 0.3, "stop": None},
+    "condense": {"model": None, "max_tokens": config.CHUNK_SUMMARY_TOKENS, "temperature": 0, "stop": None},
+    "compact": {"model": None, "max_tokens": 300, "temperature": 0, "stop": None},
+    "rag": {"model": None, "max_tokens": 2000, "temperature": 0.7, "stop": None},
+}
+
+
+def load_task_table(models=None, path=None):
+    """
+    Build the task routing table
+
+    Args:
+        models: Task to model overrides, defaults to LLM_TASK_MODELS
+        path: JSON file of per-task setting overrides, defaults to LLM_TASKS_FILE
+
+    Returns:
+        dict: Task name to model, max_tokens, temperature and stop
+    """
+    tasks = {name: dict(settings) for name, settings in DEFAULT_TASKS.items()}
+    for name, model in (config.LLM_TASK_MODELS if models is None else models).items():
+        tasks.setdefault(name, dict(DEFAULT_TASKS["answer"]))["model"] = model
+
+    path = config.LLM_TASKS_FILE if path is None else path
+    if path:
+        with open(path, "r") as f:
+            overrides = json.load(f)
+        for name, settings in overrides.items():
+            tasks.setdefault(name, dict(DEFAULT_TASKS["answer"])).update(settings)
+    return tasks
+
+
+class TaskRouter:
+    def __init__(self, tasks=None, latency_window=None):
+        """
+        Per-task generation settings and metrics
+
+        Each task (summarize, interpret, extract, ...) can use its own model,
+        max_tokens, temperature and stop sequences, and latency and token
+        counts are kept per task so cheaper routes can be compared.
+
+        Args:
+            tasks: Task routing table, defaults to load_task_table()
+            latency_window: Latency samples kept per task for percentiles
+        """
+        self.tasks = load_task_table() if tasks is None else tasks
+        self.latency_window = latency_window or config.LLM_LATENCY_WINDOW
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def settings(self, task):
+        """Generation settings of a task"""
+        if task not in self.tasks:
+            raise ValueError(f"Unknown LLM task: {task}")
+        profile = self.tasks[task]
+        return {
+            "model": profile.get("model") or config.LLM_MODEL,
+            "max_tokens": profile["max_tokens"],
+            "temperature": profile["temperature"],
+            "stop": profile.get("stop"),
+        }
+
+    def record(self, task, model, seconds, prompt_tokens, completion_tokens, error=False, cached=False):
+        """Record one call of a task, cache hits only count as calls"""
+        with self._lock:
+            metrics = self._metrics.get(task)
+            if metrics is None:
+                metrics = self._metrics[task] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "cache_hits": 0,
+                    "models": {},
+                    "total_latency": 0.0,
+                    "latencies": deque(maxlen=self.latency_window),
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                }
+            metrics["calls"] += 1
+            metrics["models"][model] = metrics["models"].get(model, 0) + 1
+            if error:
+                metrics["errors"] += 1
+                return
+            if cached:
+                metrics["cache_hits"] += 1
+                return
+            metrics["total_latency"] += seconds
+            metrics["latencies"].append(seconds)
+            metrics["prompt_tokens"] += prompt_tokens
+            metrics["completion_tokens"] += completion_tokens
+
+    def stats(self):
+        """Settings, latency and token figures per task"""
+        with self._lock:
+            stats = {}
+            for task in self.tasks:
+                settings = self.settings(task)
+                metrics = self._metrics.get(task)
+                entry = {"settings": settings}
+                if metrics is not None:
+                    completed = metrics["calls"] - metrics["errors"] - metrics["cache_hits"]
+                    latencies = sorted(metrics["latencies"])
+                    entry.update({
+                        "calls": metrics["calls"],
+                        "errors": metrics["errors"],
+                        "cache_hits": metrics["cache_hits"],
+                        "models": dict(metrics["models"]),
+                        "avg_latency": round(metrics["total_latency"] / completed, 3) if completed else None,
+                        "p95_latency": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+                        "prompt_tokens": metrics["prompt_tokens"],
+                        "completion_tokens": metrics["completion_tokens"],
+                        "avg_completion_tokens": round(metrics["completion_tokens"] / completed, 1) if completed else None,
+                        "completion_tokens_per_second": (
+                            round(metrics["completion_tokens"] / metrics["total_latency"], 1)
+                            if metrics["total_latency"] else None
+                        ),
+                    })
+                stats[task] = entry
+            return stats
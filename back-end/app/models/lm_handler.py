@@ -1,300 +1,673 @@
 #app/models/lm_handler.py
-import requests
 import json
+import asyncio
 import base64
 import os
 from pathlib import Path
-import cv2
-import numpy as np
-import easyocr  
 import re
 
-from PIL import Image
+from app import config
+from app.models.ocr_pool import extract_text
+from app.models.indicator_parser import build_name_index, parse_indicators, parse_patient, coerce_value
+from app.models.reference_ranges import load_reference_ranges
+from app.models.structured_output import generate_json, StructuredOutputError
+from app.models.llm_client import llm_client
+from app.models.prompt_budget import report_condenser, prompt_budget
+from app.models.tokenizer import count_message_tokens
+from app.models.translation_memory import (
+    translation_memory, split_segments, needs_translation, segment_key, batch_segments, MarkerLineParser
+)
 
-if not hasattr(Image, 'ANTIALIAS'):
-    Image.ANTIALIAS = Image.LANCZOS
+# Tokens kept free for a follow-up question when a session's report is condensed
+SESSION_QUESTION_TOKENS = 256
+
+# Indicator name to numeric value
+INDICATORS_SCHEMA = {"type": "object", "additionalProperties": {"type": ["number", "null"]}}
 
 class LMStudioHandler:
-   def __init__(self, api_url="http://localhost:1234/v1/chat/completions"):
-       self.api_url = api_url
-       self.headers = {
-           "Content-Type": "application/json"
-       }
+   def __init__(self, api_url=None):
+       # A client of its own would never be started or closed by the app lifespan
+       if api_url:
+           raise Exception("LMStudioHandler(api_url=...) is no longer supported, list endpoints in LLM_API_URLS")
+       self.client = llm_client
+       self.api_url = self.client.api_url
+       self.condenser = report_condenser
+       self.memory = translation_memory
        
        # Path to the medical metrics reference file
        self.metrics_file = os.path.join(os.path.dirname(__file__), 'medical_metrics.json')
   
    async def process_medical_image(self, image_path: Path):
-        """Extract content from medical report image using EasyOCR"""
+        """Extract content from medical report image using the shared EasyOCR reader pool"""
         try:
-
-            reader = easyocr.Reader(['en'])
-            
-            image = cv2.imread(str(image_path))
-            
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            results = reader.readtext(gray, detail=0, paragraph=True)
-            
-            text = "\n".join(results)
-            
-            print(f"OCR extracted {len(text)} characters from the image")
-            return text
+            # OCR is CPU bound, keep it off the event loop
+            return await asyncio.to_thread(extract_text, image_path)
             
         except Exception as e:
             raise Exception(f"Image processing failed: {str(e)}")
 
+   async def _fit_report(self, build_messages, report_content, task):
+        """Condense the report if the prompt built around it would not fit the task model's context"""
+        settings = self.client.tasks.settings(task)
+        budget = prompt_budget(build_messages, settings["max_tokens"], settings["model"])
+        return await self.condenser.fit(report_content, budget)
+
+   async def _stream_fitted(self, build_messages, report_content, task):
+        """Fit the report into the prompt budget, then stream the completion"""
+        report_content = await self._fit_report(build_messages, report_content, task)
+        deltas = self.client.stream_chat(build_messages(report_content), task=task)
+        try:
+            async for delta in deltas:
+                yield delta
+        finally:
+            await deltas.aclose()
+
+   def _summary_messages(self, report_content):
+        """Chat messages asking for the key findings of the report"""
+        prompt = f"""
+        Extract key medical findings from the report clearly and concisely.
+
+        **Format:**
+        - **Key Findings:** Main medical observations.
+        - **Test Results:** Only critical values (highlight abnormal ones with `*`).
+        - **Clinical Observations:** Significant notes only.
+
+        **Report:**
+        {report_content}
+        """
+
+        return [
+            {"role": "system", "content": "Extract key medical findings clearly and concisely."},
+            {"role": "user", "content": prompt}
+        ]
+
    async def summarize_medical_report(self, report_content):
         """Summarize key findings, test results, and clinical observations concisely."""
         try:
-            prompt = f"""
-            Extract key medical findings from the report clearly and concisely.
-
-            **Format:**
-            - **Key Findings:** Main medical observations.
-            - **Test Results:** Only critical values (highlight abnormal ones with `*`).
-            - **Clinical Observations:** Significant notes only.
-
-            **Report:**
-            {report_content}
-            """
-
-            payload = {
-                "model": "local-model",
-                "messages": [
-                    {"role": "system", "content": "Extract key medical findings clearly and concisely."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.1,
-                "max_tokens": 400,
-            }
-
-            response = requests.post(self.api_url, headers=self.headers, data=json.dumps(payload))
-
-            if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content']
-            else:
-                raise Exception(f"API call failed, status code: {response.status_code}, response: {response.text}")
-
-        except requests.RequestException as e:
-            raise Exception(f"LMStudio API request failed: {str(e)}")
+            report_content = await self._fit_report(self._summary_messages, report_content, "summarize")
+            messages = self._summary_messages(report_content)
+
+            return await self.client.chat(messages, task="summarize")
+
         except Exception as e:
             raise Exception(f"Report summarization failed: {str(e)}")
 
 
+   def _interpret_messages(self, report_content):
+        """Chat messages asking for a patient friendly explanation of the report"""
+        prompt = f"""
+        Explain this medical report in simple terms.
+
+        **Guidelines:**
+        - Focus on key concerns.
+        - Explain only abnormal findings.
+        - Provide brief insights and lifestyle suggestions.
+        - Use a clear, reassuring tone.
+
+        **Report:**
+        {report_content}
+        """
+
+        return [
+            {"role": "system", "content": "Explain medical reports simply and reassuringly."},
+            {"role": "user", "content": prompt}
+        ]
+
    async def interpret_medical_report(self, report_content):
         """Provide a simple explanation of the medical report for patients."""
         try:
-            prompt = f"""
-            Explain this medical report in simple terms.
-
-            **Guidelines:**
-            - Focus on key concerns.
-            - Explain only abnormal findings.
-            - Provide brief insights and lifestyle suggestions.
-            - Use a clear, reassuring tone.
-
-            **Report:**
-            {report_content}
-            """
-
-            payload = {
-                "model": "local-model",
-                "messages": [
-                    {"role": "system", "content": "Explain medical reports simply and reassuringly."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.1,
-                "max_tokens": 1200,
-            }
-
-            response = requests.post(self.api_url, headers=self.headers, data=json.dumps(payload))
-
-            if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content']
-            else:
-                raise Exception(f"API call failed, status code: {response.status_code}")
-
-        except requests.RequestException as e:
-            raise Exception(f"LMStudio API request failed: {str(e)}")
+            report_content = await self._fit_report(self._interpret_messages, report_content, "interpret")
+            messages = self._interpret_messages(report_content)
+
+            return await self.client.chat(messages, task="interpret")
+
         except Exception as e:
             raise Exception(f"Report interpretation failed: {str(e)}")
+
+   def stream_interpretation(self, report_content):
+        """Stream the patient friendly explanation as it is generated"""
+        return self._stream_fitted(self._interpret_messages, report_content, "interpret")
           
+   def _extract_messages(self, report_content):
+       """Chat messages asking for the report's indicators as a JSON object"""
+       prompt = f"""
+       Analyze the following medical report content and extract all medical indicators and their numeric values.
+       Return ONLY a JSON object with indicator names as keys and numeric values as values.
+       
+       Important rules:
+       1. Extract ONLY the numeric part of values (remove units and any other text)
+       2. If a value has a range, take the middle value
+       3. If a value is presented as "less than X" or "greater than X", just use X
+       4. Return values as numbers (not strings) when possible
+       5. Use standardized indicator names where possible
+       6. Include ALL medical indicators found in the report
+       7. Table rows may be written as "name | value | unit | range", use the value column as the result
+       
+       Example return format:
+       {{
+           "Glucose": 95,
+           "Hemoglobin": 14.2,
+           "Cholesterol": 180
+       }}
+       
+       Medical report content:
+       {report_content}
+       """
+       
+       return [
+           {"role": "system", "content": "You are a medical data extraction assistant. Extract structured data from medical reports accurately."},
+           {"role": "user", "content": prompt}
+       ]
+
+   def _extract_lines_messages(self, lines):
+       """Short prompt for the lab lines the local parser could not resolve"""
+       prompt = f"""
+       Extract the medical indicators and their numeric values from these lab report lines.
+       Return ONLY a JSON object with indicator names as keys and numbers as values.
+       If a value has a range, take the middle value. For "less than X" or "greater than X", use X.
+       Skip lines that hold no test result.
+       
+       Lines:
+       {lines}
+       """
+       
+       return [
+           {"role": "system", "content": "You are a medical data extraction assistant. Extract lab results as JSON."},
+           {"role": "user", "content": prompt}
+       ]
+
+   def _reask_messages(self, invalid, report_content):
+       """Prompt asking again for only the indicators whose values were not numbers"""
+       prompt = f"""
+       These indicators were extracted from the lab report below, but their values are not numbers:
+       {json.dumps(invalid, ensure_ascii=False)}
+       
+       Return ONLY a JSON object with the same indicator names as keys and their numeric values from the report.
+       If a value has a range, take the middle value. For "less than X" or "greater than X", use X.
+       Use null if the report has no numeric value for an indicator.
+       
+       Medical report content:
+       {report_content}
+       """
+       
+       return [
+           {"role": "system", "content": "You are a medical data extraction assistant. Extract lab results as JSON."},
+           {"role": "user", "content": prompt}
+       ]
+
+   async def _extract_with_llm(self, build_messages, report_content, max_tokens=None):
+       """
+       Ask the LLM for indicators as a schema constrained JSON object
+
+       Values that are not numbers are parsed locally when possible
+       ("5.2 mmol/L"), the remaining invalid fields are asked for again in
+       one short follow-up instead of repeating the whole extraction.
+       """
+       report_content = await self._fit_report(build_messages, report_content, "extract")
+       answer = await generate_json(
+           self.client, build_messages(report_content), INDICATORS_SCHEMA, "indicators",
+           task="extract", max_tokens=max_tokens
+       )
+       
+       indicators = {}
+       invalid = {}
+       for indicator_name, raw_value in answer.items():
+           value = coerce_value(raw_value)
+           if value is not None:
+               indicators[indicator_name] = value
+           elif raw_value is not None:
+               invalid[indicator_name] = raw_value
+       if not invalid:
+           return indicators
+       
+       fields = {"type": ["number", "null"]}
+       schema = {
+           "type": "object",
+           "properties": {indicator_name: fields for indicator_name in invalid},
+           "required": list(invalid)
+       }
+       try:
+           retried = await generate_json(
+               self.client, self._reask_messages(invalid, report_content), schema, "indicator_values",
+               task="extract", max_tokens=16 * len(invalid) + 32
+           )
+       except Exception as e:
+           print(f"Re-asking {len(invalid)} invalid indicator values failed: {str(e)}")
+           return indicators
+       for indicator_name in invalid:
+           value = coerce_value(retried.get(indicator_name))
+           if value is not None:
+               indicators[indicator_name] = value
+       return indicators
+
    async def extract_medical_indicators(self, report_content):
        """Extract medical indicators and their numeric values from report content"""
        try:
-           prompt = f"""
-           Analyze the following medical report content and extract all medical indicators and their numeric values.
-           Return ONLY a JSON object with indicator names as keys and numeric values as values.
+           if not config.INDICATOR_FAST_PATH:
+               return await self._extract_with_llm(self._extract_messages, report_content)
            
-           Important rules:
-           1. Extract ONLY the numeric part of values (remove units and any other text)
-           2. If a value has a range, take the middle value
-           3. If a value is presented as "less than X" or "greater than X", just use X
-           4. Return values as numbers (not strings) when possible
-           5. Use standardized indicator names where possible
-           6. Include ALL medical indicators found in the report
+           # Lab lines with a known indicator name are parsed locally
+           indicators, unresolved = parse_indicators(report_content, build_name_index(self.metrics_file))
+           if not unresolved:
+               return indicators
            
-           Example return format:
-           {{
-               "Glucose": 95,
-               "Hemoglobin": 14.2,
-               "Cholesterol": 180
-           }}
+           # Only the remaining lines go to the LLM, with a short prompt and a matching token limit
+           max_tokens = min(self.client.tasks.settings("extract")["max_tokens"], 16 * len(unresolved) + 32)
+           try:
+               llm_indicators = await self._extract_with_llm(
+                   self._extract_lines_messages, "\n".join(unresolved), max_tokens
+               )
+           except Exception as e:
+               if not indicators:
+                   raise
+               print(f"Indicator fallback failed, keeping {len(indicators)} parsed indicators: {str(e)}")
+               return indicators
            
-           Medical report content:
-           {report_content}
-           """
-           
-           payload = {
-               "model": "local-model", # Model name used by LMStudio
-               "messages": [
-                   {"role": "system", "content": "You are a medical data extraction assistant. Extract structured data from medical reports accurately."},
-                   {"role": "user", "content": prompt}
-               ],
-               "temperature": 0,
-               "max_tokens": 2000
-           }
+           for indicator_name, value in llm_indicators.items():
+               indicators.setdefault(indicator_name, value)
+           return indicators
            
-           response = requests.post(self.api_url, headers=self.headers, data=json.dumps(payload))
-           
-           if response.status_code == 200:
-               result = response.json()
-               response_text = result['choices'][0]['message']['content']
-               
-               # Extract JSON from response (it might be embedded in other text)
-               import re
-               json_match = re.search(r'({.*})', response_text, re.DOTALL)
-               if json_match:
-                   indicators_json = json.loads(json_match.group(1))
-               else:
-                   # Try direct JSON parsing if no match found
-                   indicators_json = json.loads(response_text)
-                   
-            #    # Add normal ranges to indicators
-            #    indicators_with_ranges = self.add_normal_ranges(indicators_json)
-               
-               return indicators_json
-           else:
-               raise Exception(f"API call failed, status code: {response.status_code}")
-           
-       except requests.RequestException as e:
-           raise Exception(f"LMStudio API request failed: {str(e)}")
-       except json.JSONDecodeError as e:
+       except StructuredOutputError as e:
            raise Exception(f"Failed to parse indicators JSON: {str(e)}")
        except Exception as e:
            raise Exception(f"Indicators extraction failed: {str(e)}")
   
-   def add_normal_ranges(self, indicators_json):
+   def _evaluate_indicators(self, indicators_json, report_content=None):
+       """
+       Reference range evaluation of each indicator that matches a metric
+
+       Units stated on the report's lab lines are converted to the unit of
+       the reference range, and sex and age from the report header select
+       specific ranges where medical_metrics.json has them.
+       """
+       engine = load_reference_ranges(self.metrics_file)
+       units, patient = {}, {}
+       if report_content:
+           parse_indicators(report_content, build_name_index(self.metrics_file), units)
+           patient = parse_patient(report_content)
+       
+       evaluations = {}
+       for indicator_name, actual_value in indicators_json.items():
+           if isinstance(actual_value, bool) or not isinstance(actual_value, (int, float)):
+               continue
+           metric, _ = engine.resolve(indicator_name)
+           if metric is None:
+               print(f"No reference range for indicator: {indicator_name}")
+               continue
+           if metric not in evaluations:
+               evaluations[metric] = engine.evaluate(metric, actual_value, units.get(metric), **patient)
+       return evaluations
+
+   def add_normal_ranges(self, indicators_json, report_content=None):
        """
        Check if extracted indicators are in medical_metrics.json and add normal ranges
        
        Args:
            indicators_json: Dictionary of extracted indicators and their values
+           report_content: Optional report text, used for units, sex and age
            
        Returns:
            dict: Dictionary with indicators and their values plus normal ranges
        """
        try:
-           # Load medical metrics reference data
-           with open(self.metrics_file, 'r') as f:
-               reference_metrics = json.load(f)
-           
-           # Initialize result dictionary
-           result = {}
-           
-           # For each extracted indicator, check if it's in the reference data
-           for indicator_name, actual_value in indicators_json.items():
-               # Check if indicator exists in reference data (case insensitive)
-               for ref_name, ref_range in reference_metrics.items():
-                   if indicator_name.lower() == ref_name.lower():
-                       # Add indicator with actual value and normal range
-                       result[ref_name] = [actual_value, ref_range[0], ref_range[1]]
-                       print(f"Added normal range for {ref_name}: {ref_range}")
-                       break
-           return result
+           return {
+               metric: [evaluation["value"], evaluation["low"], evaluation["high"]]
+               for metric, evaluation in self._evaluate_indicators(indicators_json, report_content).items()
+           }
            
        except Exception as e:
            print(f"Error adding normal ranges: {str(e)}")
            # Return original indicators if anything goes wrong
            return indicators_json
   
+   def _translation_messages(self, text, target_language):
+       """Chat messages asking for a translation of text into target_language"""
+       prompt = f"""
+       Translate the following text into {target_language}.
+       Maintain the meaning, tone, and style of the original text.
+       If there are any medical terms, ensure they are translated accurately.
+      
+       Text to translate:
+       {text}
+       """
+      
+       return [
+           {"role": "system", "content": f"You are a professional translator specializing in medical terminology. Translate the given text to {target_language} accurately."},
+           {"role": "user", "content": prompt}
+       ]
+
+   def _segment_translation_messages(self, numbered, target_language):
+       """Chat messages asking for a translation of numbered segments, one "[n] ..." line each"""
+       lines = "\n".join(f"[{number}] {segment}" for number, segment in numbered)
+       prompt = f"""
+       Translate each numbered line below into {target_language}.
+       Maintain the meaning, tone, and style of the original text.
+       If there are any medical terms, ensure they are translated accurately.
+       
+       Return exactly one line per input line, starting with the same number in brackets, e.g. "[1] ...".
+       Do not merge, split or skip lines and do not add any other text.
+      
+       Lines to translate:
+       {lines}
+       """
+      
+       return [
+           {"role": "system", "content": f"You are a professional translator specializing in medical terminology. Translate the given text to {target_language} accurately."},
+           {"role": "user", "content": prompt}
+       ]
+
+   async def _translate_with_memory(self, text, target_language):
+       """
+       Translate text segment by segment, reusing stored segment translations
+
+       Only segments missing from the translation memory go to the LLM,
+       batched into one prompt. Translated text is yielded in the original
+       order as soon as every segment before it is available.
+       """
+       pairs = split_segments(text)
+       stored = self.memory.lookup(
+           [segment for segment, _ in pairs if needs_translation(segment)], target_language
+       )
+       
+       translations = {}
+       # Identical segments are translated once, under the number of their first occurrence
+       duplicates = {}
+       first_numbers = {}
+       for number, (segment, _) in enumerate(pairs):
+           if not needs_translation(segment):
+               translations[number] = segment
+               continue
+           key = segment_key(segment, target_language)
+           if key in stored:
+               translations[number] = stored[key]
+           elif key in first_numbers:
+               duplicates[first_numbers[key]].append(number)
+           else:
+               first_numbers[key] = number
+               duplicates[number] = [number]
+       
+       emitted = 0
+       
+       def ready():
+           """Translated text that can be passed on, in order"""
+           nonlocal emitted
+           parts = []
+           while emitted < len(pairs) and emitted in translations:
+               parts.append(translations[emitted] + pairs[emitted][1])
+               emitted += 1
+           return "".join(parts)
+       
+       def resolve(number, translation, learned):
+           for duplicate in duplicates[number]:
+               translations[duplicate] = translation
+           learned.append((pairs[number][0], translation))
+       
+       chunk = ready()
+       if chunk:
+           yield chunk
+       
+       missing = [(number, pairs[number][0]) for number in duplicates]
+       for batch in batch_segments(missing, config.TRANSLATION_BATCH_TOKENS):
+           learned = []
+           # A batch is asked twice at most, the second time for the lines the model skipped or merged
+           for _ in range(2):
+               parser = MarkerLineParser([number for number, _ in batch])
+               answered = []
+               deltas = self.client.stream_chat(
+                   self._segment_translation_messages(batch, target_language), task="translate"
+               )
+               try:
+                   async for delta in deltas:
+                       for number, translation in parser.feed(delta):
+                           resolve(number, translation, answered)
+                       chunk = ready()
+                       if chunk:
+                           yield chunk
+               finally:
+                   await deltas.aclose()
+               for number, translation in parser.close():
+                   resolve(number, translation, answered)
+               # Lines of an answer with skipped, repeated or shifted markers are used but not remembered
+               if parser.complete():
+                   learned.extend(answered)
+               batch = [(number, segment) for number, segment in batch if number not in parser.translations]
+               if not batch:
+                   break
+           
+           # Whatever is still missing is translated on its own
+           for number, segment in batch:
+               translation = await self.client.chat(
+                   self._translation_messages(segment, target_language), task="translate"
+               )
+               resolve(number, translation.strip(), learned)
+           
+           self.memory.store(learned, target_language)
+           chunk = ready()
+           if chunk:
+               yield chunk
+
    async def translate_text(self, text, target_language="Chinese"):
        """Translate text to the specified target language using LMStudio API"""
        try:
-           prompt = f"""
-           Translate the following text into {target_language}.
-           Maintain the meaning, tone, and style of the original text.
-           If there are any medical terms, ensure they are translated accurately.
-          
-           Text to translate:
-           {text}
-           """
-          
-           payload = {
-               "model": "local-model", # Model name used by LMStudio
-               "messages": [
-                   {"role": "system", "content": f"You are a professional translator specializing in medical terminology. Translate the given text to {target_language} accurately."},
-                   {"role": "user", "content": prompt}
-               ],
-               "temperature": 0.1,
-               "max_tokens": 2000
-           }
-          
-           response = requests.post(self.api_url, headers=self.headers, data=json.dumps(payload))
+           if self.memory is not None:
+               return "".join([part async for part in self._translate_with_memory(text, target_language)])
+           
+           messages = self._translation_messages(text, target_language)
           
-           if response.status_code == 200:
-               result = response.json()
-               return result['choices'][0]['message']['content']
-           else:
-               raise Exception(f"Translation API call failed, status code: {response.status_code}")
+           return await self.client.chat(messages, task="translate")
       
-       except requests.RequestException as e:
-           raise Exception(f"LMStudio API request failed: {str(e)}")
        except Exception as e:
            raise Exception(f"Translation failed: {str(e)}")
+
+   def stream_translation(self, text, target_language="Chinese"):
+       """Stream a translation as it is generated"""
+       if self.memory is not None:
+           return self._translate_with_memory(text, target_language)
+       
+       messages = self._translation_messages(text, target_language)
+       return self.client.stream_chat(messages, task="translate")
           
+   def _question_messages(self, report_content, question):
+       """Chat messages asking a doctor-style answer to a question about the report"""
+       # Create a prompt that emphasizes responding in the same language as the question
+       prompt = f"""
+       You are a professional doctor answering questions about a medical report. The user has provided their medical report and has a question about it.
+      
+       Medical report content:
+       {report_content}
+      
+       User's question:
+       {question}
+      
+       IMPORTANT: You must respond in the same language that the user asked the question in.
+       For example, if they asked in English, respond in English. If they asked in Chinese, respond in Chinese.
+      
+       Please provide a clear, accurate, and helpful response based on the medical report.
+       Focus on answering the specific question while providing relevant context from the report.
+       Use simple language that a non-medical professional would understand.
+       If the question cannot be answered based on the report, explain what information is missing.
+       """
+      
+       return [
+           {"role": "system", "content": "You are a professional doctor specializing in explaining medical reports and answering health-related questions in a way that's easy to understand. Always respond in the same language as the user's question."},
+           {"role": "user", "content": prompt}
+       ]
+
    async def answer_medical_question(self, report_content, question):
        """Answer medical questions based on report content using LMStudio API"""
        try:
-           # Create a prompt that emphasizes responding in the same language as the question
-           prompt = f"""
-           You are a professional doctor answering questions about a medical report. The user has provided their medical report and has a question about it.
-          
-           Medical report content:
-           {report_content}
+           build_messages = lambda report: self._question_messages(report, question)
+           report_content = await self._fit_report(build_messages, report_content, "answer")
+           messages = build_messages(report_content)
           
-           User's question:
-           {question}
-          
-           IMPORTANT: You must respond in the same language that the user asked the question in.
-           For example, if they asked in English, respond in English. If they asked in Chinese, respond in Chinese.
-          
-           Please provide a clear, accurate, and helpful response based on the medical report.
-           Focus on answering the specific question while providing relevant context from the report.
-           Use simple language that a non-medical professional would understand.
-           If the question cannot be answered based on the report, explain what information is missing.
-           """
-          
-           payload = {
-               "model": "local-model", # Model name used by LMStudio
-               "messages": [
-                   {"role": "system", "content": "You are a professional doctor specializing in explaining medical reports and answering health-related questions in a way that's easy to understand. Always respond in the same language as the user's question."},
-                   {"role": "user", "content": prompt}
-               ],
-               "temperature": 0.3,
-               "max_tokens": 2000
-           }
-          
-           response = requests.post(self.api_url, headers=self.headers, data=json.dumps(payload))
-          
-           if response.status_code == 200:
-               result = response.json()
-               return result['choices'][0]['message']['content']
-           else:
-               raise Exception(f"Q&A API call failed, status code: {response.status_code}")
+           return await self.client.chat(messages, task="answer")
       
-       except requests.RequestException as e:
-           raise Exception(f"LMStudio API request failed: {str(e)}")
        except Exception as e:
-           raise Exception(f"Question answering failed: {str(e)}")
\ No newline at end of file
+           raise Exception(f"Question answering failed: {str(e)}")
+
+   def stream_medical_answer(self, report_content, question):
+       """Stream the answer to a question about the report as it is generated"""
+       build_messages = lambda report: self._question_messages(report, question)
+       return self._stream_fitted(build_messages, report_content, "answer")
+
+   def _report_digest(self, report_content):
+       """Compact list of the recognized lab values with their reference ranges, abnormal ones marked with *"""
+       indicators, _ = parse_indicators(report_content, build_name_index(self.metrics_file))
+       lines = []
+       for metric, evaluation in self._evaluate_indicators(indicators, report_content).items():
+           marker = "*" if evaluation["status"] != "normal" else ""
+           lines.append(
+               f"- {marker}{metric}: {evaluation['value']} {evaluation['unit'] or ''} "
+               f"(reference {evaluation['low']}-{evaluation['high']}, {evaluation['status']})"
+           )
+       return "\n".join(lines) or "No lab values were recognized automatically."
+
+   def _session_messages(self, session, question):
+       """
+       Chat messages for a question in a report session
+
+       The system prompt, report and digest come first and never change
+       during the session, followed by the conversation, so the backend can
+       reuse its prompt cache for the whole prefix and only prefill the
+       new turns.
+       """
+       context = f"""
+       Medical report digest (recognized lab values, * marks results outside the reference range):
+       {session["digest"]}
+      
+       Medical report content:
+       {session["report"]}
+       """
+      
+       messages = [
+           {"role": "system", "content": "You are a professional doctor answering questions about a patient's medical report in a way that's easy to understand. Base your answers on the report, give relevant context from it and use simple language that a non-medical professional would understand. If a question cannot be answered from the report, explain what information is missing. Always respond in the same language as the user's question."},
+           {"role": "user", "content": context},
+           {"role": "assistant", "content": "I have read your medical report. What would you like to know?"}
+       ]
+       if session["summary"]:
+           messages += [
+               {"role": "user", "content": f"Summary of our conversation so far:\n{session['summary']}"},
+               {"role": "assistant", "content": "Understood, I will keep that in mind."}
+           ]
+       return messages + session["history"] + [{"role": "user", "content": question}]
+
+   async def prepare_session(self, report_content):
+       """
+       Report text and digest for a new report session
+
+       The report is condensed once, leaving room in the context for
+       everything later turns add next to the answer: the conversation
+       history (SESSION_HISTORY_TOKENS), the running summary with its
+       wrapper turns and the new question.
+
+       Returns:
+           tuple: (report, digest)
+       """
+       try:
+           digest = self._report_digest(report_content)
+           settings = self.client.tasks.settings("answer")
+           # A non-empty summary so the template includes the summary wrapper turns
+           template_session = {"digest": digest, "summary": " ", "history": []}
+           build_messages = lambda report: self._session_messages({**template_session, "report": report}, "")
+           reserved = (
+               settings["max_tokens"] + config.SESSION_HISTORY_TOKENS
+               + self.client.tasks.settings("compact")["max_tokens"] + SESSION_QUESTION_TOKENS
+           )
+           budget = prompt_budget(build_messages, reserved, settings["model"])
+           return await self.condenser.fit(report_content, budget), digest
+      
+       except Exception as e:
+           raise Exception(f"Session creation failed: {str(e)}")
+
+   def _compaction_messages(self, summary, turns):
+       """Chat messages folding older turns of a session into its running summary"""
+       transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+       prompt = f"""
+       Update the summary of a conversation between a patient and a doctor about the patient's medical report.
+       Keep the questions asked, the facts and advice given and anything the patient said about themselves.
+       Write at most 150 words.
+      
+       Current summary:
+       {summary or "(none)"}
+      
+       New conversation turns:
+       {transcript}
+       """
+      
+       return [
+           {"role": "system", "content": "You summarize medical conversations accurately and concisely."},
+           {"role": "user", "content": prompt}
+       ]
+
+   async def _compact_history(self, session, keep_tokens=None):
+       """
+       Fold older turns into the session summary once the history exceeds SESSION_HISTORY_TOKENS
+
+       The latest turns filling half the budget (or keep_tokens) are kept
+       verbatim, so the prompt prefix then stays unchanged for several
+       turns until the next compaction.
+       """
+       history = session["history"]
+       if keep_tokens is None:
+           if count_message_tokens(history) <= config.SESSION_HISTORY_TOKENS:
+               return
+           keep_tokens = config.SESSION_HISTORY_TOKENS // 2
+       if not history:
+           return
+       kept = 0
+       while kept < len(history) and count_message_tokens(history[-kept - 2:]) <= keep_tokens:
+           kept += 2
+       session["summary"] = (await self.client.chat(
+           self._compaction_messages(session["summary"], history[:len(history) - kept]), task="compact"
+       )).strip()
+       session["history"] = history[len(history) - kept:]
+       session["compactions"] += 1
+
+   async def _session_prompt(self, session, question):
+       """
+       Messages for a session question, checked against the answer model's context
+
+       When the prompt would not fit, for instance after a very long
+       question, the whole history is folded into the summary first.
+       """
+       await self._compact_history(session)
+       settings = self.client.tasks.settings("answer")
+       overflow = lambda: prompt_budget(
+           lambda _: self._session_messages(session, question), settings["max_tokens"], settings["model"]
+       ) < 0
+       if overflow():
+           await self._compact_history(session, keep_tokens=0)
+           if overflow():
+               raise Exception("The question does not fit in the context window next to the report")
+       return self._session_messages(session, question)
+
+   def _record_turn(self, session, question, answer):
+       session["history"] += [
+           {"role": "user", "content": question},
+           {"role": "assistant", "content": answer}
+       ]
+       session["turns"] += 1
+
+   async def answer_session_question(self, session, question):
+       """Answer a follow-up question in a report session"""
+       try:
+           async with session["lock"]:
+               answer = await self.client.chat(await self._session_prompt(session, question), task="answer")
+               self._record_turn(session, question, answer)
+               return answer
+      
+       except Exception as e:
+           raise Exception(f"Question answering failed: {str(e)}")
+
+   async def stream_session_answer(self, session, question):
+       """Stream the answer to a follow-up question, recording the turn once it is complete"""
+       async with session["lock"]:
+           parts = []
+           deltas = self.client.stream_chat(await self._session_prompt(session, question), task="answer")
+           try:
+               async for delta in deltas:
+                   parts.append(delta)
+                   yield delta
+           finally:
+               await deltas.aclose()
+           self._record_turn(session, question, "".join(parts))
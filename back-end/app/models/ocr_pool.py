@@ -0,0 +1,322 @@
+# app/models/ocr_pool.py
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import cv2
+import easyocr
+import numpy as np
+import torch
+from PIL import Image
+
+from app import config
+from app.models.preprocessing import preprocess_image, format_stats
+from app.models.layout import reconstruct_layout
+from app.models.pdf import render_pdf_page
+
+# EasyOCR still references Image.ANTIALIAS, which was removed in Pillow 10
+if not hasattr(Image, 'ANTIALIAS'):
+    Image.ANTIALIAS = Image.LANCZOS
+
+
+def configure_torch_threads(processes=1):
+    """
+    Set the intra-op thread count for CPU inference in this process
+
+    OCR_TORCH_THREADS wins when set, otherwise the cores are split evenly
+    between the processes running OCR so they do not oversubscribe the CPU.
+    """
+    threads = config.OCR_TORCH_THREADS or max(1, (os.cpu_count() or 1) // max(1, processes))
+    torch.set_num_threads(threads)
+    return threads
+
+
+class OCRReaderPool:
+    def __init__(self, size=None, languages=None, gpu=None, timeout=None, quantize=None):
+        """
+        Pool of pre-loaded EasyOCR readers shared by the whole process
+
+        Loading an easyocr.Reader reads the detector and recognizer weights
+        from disk, so readers are created once and then checked out and
+        returned for every OCR call.
+
+        Args:
+            size: Maximum number of readers kept in the pool
+            languages: Languages passed to easyocr.Reader
+            gpu: Whether the readers should run on the GPU
+            timeout: Seconds to wait for a free reader before giving up
+            quantize: Load CPU readers with int8 dynamically quantized models
+        """
+        self.size = max(1, size if size is not None else config.OCR_POOL_SIZE)
+        self.languages = languages or config.OCR_LANGUAGES
+        self.gpu = config.OCR_GPU if gpu is None else gpu
+        self.timeout = config.OCR_POOL_TIMEOUT if timeout is None else timeout
+        self.quantize = config.OCR_QUANTIZE if quantize is None else quantize
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _create_reader(self):
+        """Load a new reader, this is the expensive part"""
+        start_time = time.time()
+        # EasyOCR applies torch dynamic quantization to the recognizer and the detector itself
+        # on CPU readers, quantize=False keeps both in float32
+        reader = easyocr.Reader(self.languages, gpu=self.gpu, quantize=self.quantize)
+        print(f"Loaded {'int8' if self.quantize and not self.gpu else 'float32'} OCR reader "
+              f"in {time.time() - start_time:.2f} seconds")
+        return reader
+
+    def checkout(self, timeout=None):
+        """
+        Take a reader out of the pool
+
+        A new reader is only loaded while the pool is below its size,
+        otherwise the caller waits for another request to return one.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            try:
+                return self._create_reader()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        wait = self.timeout if timeout is None else timeout
+        try:
+            return self._idle.get(timeout=wait)
+        except queue.Empty:
+            raise Exception(f"No OCR reader became available within {wait} seconds")
+
+    def checkin(self, reader):
+        """Return a reader to the pool"""
+        self._idle.put(reader)
+
+    @contextmanager
+    def reader(self, timeout=None):
+        """Check out a reader for the duration of a with block"""
+        reader = self.checkout(timeout)
+        try:
+            yield reader
+        finally:
+            self.checkin(reader)
+
+    def readtext(self, image, **kwargs):
+        """Run reader.readtext on a pooled reader"""
+        with self.reader() as reader:
+            return reader.readtext(image, **kwargs)
+
+    def warmup(self):
+        """Load every reader up front and run one tiny inference on each"""
+        readers = []
+        try:
+            while len(readers) < self.size:
+                readers.append(self.checkout())
+            blank = np.full((64, 256), 255, dtype=np.uint8)
+            for reader in readers:
+                reader.readtext(blank, detail=0)
+        finally:
+            for reader in readers:
+                self.checkin(reader)
+        print(f"OCR reader pool warmed up with {len(readers)} reader(s)")
+
+    def stats(self):
+        """Current pool occupancy"""
+        return {
+            "size": self.size,
+            "created": self._created,
+            "idle": self._idle.qsize(),
+        }
+
+
+# Create a singleton instance so every request shares the loaded readers
+ocr_pool = OCRReaderPool()
+
+
+def _prepare_image(gray):
+    """Shrink, crop and straighten the page so detection only sees useful pixels"""
+    if config.OCR_PREPROCESS:
+        gray, stats = preprocess_image(gray)
+        print(f"OCR preprocessing: {format_stats(stats)}")
+    return gray
+
+
+def _readtext_options():
+    """readtext arguments for the configured output layout"""
+    if config.OCR_LAYOUT == "table":
+        # Boxes are needed to rebuild lab table rows as "name | value | unit | range"
+        return {"detail": 1, "paragraph": False}
+    return {"detail": 0, "paragraph": True}
+
+
+def _format_results(results):
+    """Turn readtext output into report text"""
+    if config.OCR_LAYOUT == "table":
+        return reconstruct_layout(results)
+    return "\n".join(results)
+
+
+def recognize_text(gray):
+    """
+    Preprocess a grayscale page and run OCR on it with the process-wide reader pool
+
+    Args:
+        gray: Grayscale page image as a numpy array
+
+    Returns:
+        str: Extracted text, one table row or paragraph per line
+    """
+    gray = _prepare_image(gray)
+    results = ocr_pool.readtext(gray, **_readtext_options())
+    return _format_results(results)
+
+
+def group_by_size(shapes, max_overhead=None):
+    """
+    Group pages of similar size for batched recognition
+
+    A batch is padded to its largest page, so pages are sorted by size and
+    a group is closed once padding would add more than max_overhead of
+    extra pixels over the pages' own area.
+
+    Args:
+        shapes: (height, width) of each page
+        max_overhead: Extra padded area accepted, as a fraction of the pages' area
+
+    Returns:
+        list: Groups of page indices
+    """
+    max_overhead = config.OCR_BATCH_MAX_PADDING if max_overhead is None else max_overhead
+    groups, current = [], []
+    for index in sorted(range(len(shapes)), key=lambda i: shapes[i]):
+        candidate = current + [index]
+        height = max(shapes[i][0] for i in candidate)
+        width = max(shapes[i][1] for i in candidate)
+        area = sum(shapes[i][0] * shapes[i][1] for i in candidate)
+        if current and height * width * len(candidate) > area * (1 + max_overhead):
+            groups.append(current)
+            candidate = [index]
+        current = candidate
+    if current:
+        groups.append(current)
+    return groups
+
+
+def recognize_texts_batched(grays):
+    """
+    Run OCR on several pages in batched EasyOCR calls
+
+    Pages are grouped by size, padded with white to a common size within
+    each group, since the batched detector stacks its inputs, then
+    recognised with readtext_batched so the model runs over the whole
+    group at once.
+
+    Args:
+        grays: Grayscale page images
+
+    Returns:
+        list: Extracted text per page, in input order
+    """
+    grays = [_prepare_image(gray) for gray in grays]
+    texts = [None] * len(grays)
+    for group in group_by_size([gray.shape[:2] for gray in grays]):
+        if len(group) == 1:
+            texts[group[0]] = _format_results(ocr_pool.readtext(grays[group[0]], **_readtext_options()))
+            continue
+
+        height = max(grays[index].shape[0] for index in group)
+        width = max(grays[index].shape[1] for index in group)
+        padded = [
+            cv2.copyMakeBorder(
+                grays[index], 0, height - grays[index].shape[0], 0, width - grays[index].shape[1],
+                cv2.BORDER_CONSTANT, value=255
+            )
+            for index in group
+        ]
+        with ocr_pool.reader() as reader:
+            batch = reader.readtext_batched(padded, batch_size=len(padded), **_readtext_options())
+        for index, results in zip(group, batch):
+            texts[index] = _format_results(results)
+    return texts
+
+
+def _read_gray(image_path):
+    image = cv2.imread(str(image_path))
+    if image is None:
+        raise Exception(f"Could not read image: {image_path}")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def extract_text(image_path):
+    """
+    Run OCR on a medical report image
+
+    This is a plain synchronous function so it can run in a worker thread
+    or in an OCR worker process.
+
+    Args:
+        image_path: Path of the image on disk
+
+    Returns:
+        str: Extracted text, one table row or paragraph per line
+    """
+    text = recognize_text(_read_gray(image_path))
+
+    print(f"OCR extracted {len(text)} characters from the image")
+    return text
+
+
+def extract_pdf_page_text(pdf_path, page_index):
+    """
+    Rasterize a single PDF page and run OCR on it
+
+    Only the requested page is decoded, so a worker never holds more than
+    one page bitmap in memory.
+
+    Args:
+        pdf_path: Path of the PDF on disk
+        page_index: Zero based page number
+
+    Returns:
+        str: Extracted text of the page
+    """
+    gray = render_pdf_page(pdf_path, page_index)
+    text = recognize_text(gray)
+
+    print(f"OCR extracted {len(text)} characters from page {page_index + 1} of {pdf_path}")
+    return text
+
+
+def extract_texts_batched(image_paths):
+    """
+    Run OCR on several report images in one batch
+
+    Args:
+        image_paths: Paths of the images on disk
+
+    Returns:
+        list: Extracted text per image, in input order
+    """
+    texts = recognize_texts_batched([_read_gray(image_path) for image_path in image_paths])
+    print(f"OCR extracted {sum(len(text) for text in texts)} characters from a batch of {len(texts)} images")
+    return texts
+
+
+def init_worker(warmup=True, processes=1):
+    """Initializer for OCR worker processes, each process keeps a single reader"""
+    configure_torch_threads(processes)
+    ocr_pool.size = 1
+    if warmup:
+        ocr_pool.warmup()
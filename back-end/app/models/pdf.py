@@ -0,0 +1,43 @@
+# app/models/pdf.py
+import numpy as np
+
+from app import config
+
+
+def _open_document(pdf_path):
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        raise Exception("PDF support requires pypdfium2, install it with: pip install pypdfium2")
+    return pdfium.PdfDocument(str(pdf_path))
+
+
+def count_pdf_pages(pdf_path):
+    """Number of pages in a PDF, without rendering any of them"""
+    document = _open_document(pdf_path)
+    try:
+        return len(document)
+    finally:
+        document.close()
+
+
+def render_pdf_page(pdf_path, page_index, dpi=None):
+    """
+    Rasterize one PDF page to a grayscale image
+
+    Args:
+        pdf_path: Path of the PDF on disk
+        page_index: Zero based page number
+        dpi: Render resolution, defaults to PDF_RENDER_DPI
+
+    Returns:
+        numpy.ndarray: Grayscale page image
+    """
+    dpi = dpi or config.PDF_RENDER_DPI
+    document = _open_document(pdf_path)
+    try:
+        page = document[page_index]
+        bitmap = page.render(scale=dpi / 72, grayscale=True)
+        return np.asarray(bitmap.to_pil().convert("L"))
+    finally:
+        document.close()
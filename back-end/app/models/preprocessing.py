@@ -0,0 +1,204 @@
+# app/models/preprocessing.py
+import time
+
+import cv2
+import numpy as np
+
+from app import config
+
+# Long side of the thumbnail used to analyse the page layout
+ANALYSIS_SIDE = 1000
+
+# Skew angles outside this range are treated as detection noise
+MIN_SKEW_ANGLE = 0.3
+MAX_SKEW_ANGLE = 15.0
+
+
+def _foreground_mask(gray):
+    """Binary mask of ink pixels (text, lines) on a light page"""
+    blurred = cv2.GaussianBlur(gray, (3, 3), 0)
+    _, mask = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return mask
+
+
+def _thumbnail(gray):
+    """Downscaled copy used for layout analysis and its scale factor"""
+    scale = min(1.0, ANALYSIS_SIDE / max(gray.shape[:2]))
+    if scale >= 1.0:
+        return gray, 1.0
+    thumb = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return thumb, scale
+
+
+def estimate_text_height(gray):
+    """
+    Estimate the median height of text characters in pixels
+
+    Connected components of the ink mask are filtered to character-like
+    shapes, and the median of their heights is returned.
+
+    Returns:
+        float: Median character height, or None if no text was found
+    """
+    thumb, scale = _thumbnail(gray)
+    mask = _foreground_mask(thumb)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+
+    # Keep glyph-sized blobs, drop specks, table rules and photos
+    keep = (heights >= 4) & (heights <= thumb.shape[0] * 0.1) & (widths <= heights * 4) & (areas >= 8)
+    if not np.any(keep):
+        return None
+    return float(np.median(heights[keep])) / scale
+
+
+def resize_to_text_height(gray, target_height=None, max_side=None):
+    """Downscale so the median text height matches the target, never upscale"""
+    target_height = target_height or config.OCR_TARGET_TEXT_HEIGHT
+    max_side = max_side or config.OCR_MAX_IMAGE_SIDE
+
+    scale = 1.0
+    text_height = estimate_text_height(gray)
+    if text_height:
+        scale = min(scale, target_height / text_height)
+    scale = min(scale, max_side / max(gray.shape[:2]))
+
+    if scale >= 0.95:
+        return gray
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def crop_to_document(gray, margin=0.02):
+    """Crop away empty borders around the printed content"""
+    thumb, scale = _thumbnail(gray)
+    mask = _foreground_mask(thumb)
+
+    # Merge characters into blocks so isolated specks do not extend the crop
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+    mask = cv2.dilate(mask, np.ones((5, 15), np.uint8))
+
+    points = cv2.findNonZero(mask)
+    if points is None:
+        return gray
+
+    x, y, w, h = cv2.boundingRect(points)
+    height, width = gray.shape[:2]
+    pad_x = int(width * margin)
+    pad_y = int(height * margin)
+    left = max(0, int(x / scale) - pad_x)
+    top = max(0, int(y / scale) - pad_y)
+    right = min(width, int((x + w) / scale) + pad_x)
+    bottom = min(height, int((y + h) / scale) + pad_y)
+
+    if (right - left) * (bottom - top) >= width * height * 0.95:
+        return gray
+    return gray[top:bottom, left:right]
+
+
+def estimate_skew_angle(gray):
+    """
+    Estimate page rotation in degrees from the orientation of text lines
+
+    Returns:
+        float: Angle to rotate by to straighten the text
+    """
+    thumb, _ = _thumbnail(gray)
+    mask = _foreground_mask(thumb)
+
+    # Smear characters horizontally into line blobs
+    lines = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((1, 25), np.uint8))
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    angles = []
+    weights = []
+    for contour in contours:
+        (_, _), (w, h), angle = cv2.minAreaRect(contour)
+        if w < h:
+            w, h = h, w
+            angle -= 90
+        # Only long, thin blobs are reliable text lines
+        if w < 50 or w < h * 5:
+            continue
+        if angle > 45:
+            angle -= 90
+        elif angle < -45:
+            angle += 90
+        angles.append(angle)
+        weights.append(w)
+
+    if not angles:
+        return 0.0
+    order = np.argsort(angles)
+    cumulative = np.cumsum(np.array(weights)[order])
+    median_index = order[np.searchsorted(cumulative, cumulative[-1] / 2)]
+    return float(angles[median_index])
+
+
+def deskew(gray):
+    """Rotate the page so text lines are horizontal"""
+    angle = estimate_skew_angle(gray)
+    if abs(angle) < MIN_SKEW_ANGLE or abs(angle) > MAX_SKEW_ANGLE:
+        return gray
+
+    height, width = gray.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        gray, matrix, (width, height),
+        flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+def binarize(gray):
+    """Adaptive threshold to remove shading and uneven lighting"""
+    block_size = max(15, (min(gray.shape[:2]) // 40) | 1)
+    return cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block_size, 10
+    )
+
+
+# Stages in the order they are applied
+STAGES = {
+    "resize": resize_to_text_height,
+    "crop": crop_to_document,
+    "deskew": deskew,
+    "binarize": binarize,
+}
+
+
+def preprocess_image(gray, stages=None):
+    """
+    Run the configured preprocessing stages on a grayscale image
+
+    Args:
+        gray: Grayscale image as a numpy array
+        stages: Names of the stages to run, defaults to OCR_PREPROCESS_STAGES
+
+    Returns:
+        tuple: (processed image, list of per-stage stats)
+    """
+    stages = config.OCR_PREPROCESS_STAGES if stages is None else stages
+    stats = []
+    for name in STAGES:
+        if name not in stages:
+            continue
+        pixels_before = gray.shape[0] * gray.shape[1]
+        start_time = time.perf_counter()
+        gray = STAGES[name](gray)
+        stats.append({
+            "stage": name,
+            "time_ms": (time.perf_counter() - start_time) * 1000,
+            "pixels_before": pixels_before,
+            "pixels_after": gray.shape[0] * gray.shape[1],
+            "pixels_saved": pixels_before - gray.shape[0] * gray.shape[1],
+        })
+    return gray, stats
+
+
+def format_stats(stats):
+    """One line summary of preprocessing stats for logging"""
+    return ", ".join(
+        f"{s['stage']} {s['time_ms']:.1f}ms -{s['pixels_saved'] / 1e6:.2f}MP" for s in stats
+    )
@@ -0,0 +1,179 @@
+# app/models/prompt_budget.py
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+from app import config
+from app.models.llm_client import llm_client
+from app.models.tokenizer import count_tokens, count_message_tokens
+
+# Map-reduce rounds before falling back to truncation
+MAX_CONDENSE_ROUNDS = 3
+
+
+def context_window(model=None):
+    """Context length of a model in tokens"""
+    model = model or config.LLM_MODEL
+    return config.LLM_MODEL_CONTEXT.get(model, config.LLM_CONTEXT_TOKENS)
+
+
+def prompt_budget(build_messages, max_tokens, model=None):
+    """
+    Tokens left for the report in a prompt
+
+    Args:
+        build_messages: Function building the chat messages around a report text
+        max_tokens: Tokens reserved for the completion
+        model: Model name, defaults to LLM_MODEL
+
+    Returns:
+        int: Report tokens that fit next to the prompt template and the completion
+    """
+    window = int(context_window(model) * (1 - config.PROMPT_TOKEN_MARGIN))
+    return window - max_tokens - count_message_tokens(build_messages(""))
+
+
+def _split_long_line(line, max_tokens):
+    """Split a single line that exceeds max_tokens on word boundaries"""
+    pieces, current = [], []
+    for word in line.split(" "):
+        if current and count_tokens(" ".join(current + [word])) > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def split_into_chunks(text, max_tokens):
+    """
+    Split text into chunks of at most max_tokens
+
+    Chunks end on line boundaries so table rows ("name | value | unit |
+    range") are never cut in half.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for line in text.splitlines():
+        pieces = [line] if count_tokens(line) < max_tokens else _split_long_line(line, max_tokens - 1)
+        for piece in pieces:
+            tokens = count_tokens(piece) + 1
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Keep the leading whole lines of text that fit max_tokens"""
+    kept, used = [], 0
+    for line in text.splitlines():
+        tokens = count_tokens(line) + 1
+        if used + tokens > max_tokens:
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(kept)
+
+
+class ReportCondenser:
+    def __init__(self, client, chunk_tokens=None, cache_entries=None):
+        """
+        Fit report text into a prompt budget with map-reduce summarization
+
+        Reports over budget are split into chunks that are condensed in
+        parallel (map) and joined (reduce), repeating on the joined text
+        while it is still too long. Chunk summaries are shared by chunk
+        content, so the summarize, interpret and extract stages of one
+        report condense each chunk only once.
+
+        Args:
+            client: LLMClient used for the chunk summaries
+            chunk_tokens: Maximum tokens per chunk
+            cache_entries: Number of chunk summaries kept for reuse
+        """
+        self.client = client
+        self.chunk_tokens = chunk_tokens or config.REPORT_CHUNK_TOKENS
+        self.cache_entries = cache_entries or config.CHUNK_SUMMARY_CACHE_ENTRIES
+        self._summaries = OrderedDict()
+        self.metrics = {"condensed": 0, "chunks": 0, "reused_chunks": 0, "truncated": 0}
+
+    def _chunk_messages(self, chunk):
+        prompt = f"""
+        Condense this part of a medical report.
+
+        **Rules:**
+        - Keep every test name, value, unit and reference range exactly as written, one test per line.
+        - Keep patient details, dates and diagnoses.
+        - Shorten narrative text to its key facts.
+        - Do not add interpretation.
+
+        **Report part:**
+        {chunk}
+        """
+
+        return [
+            {"role": "system", "content": "Condense medical report text without losing any test result."},
+            {"role": "user", "content": prompt}
+        ]
+
+    async def _summarize_chunk(self, chunk):
+        """Condensed chunk, shared with concurrent and later requests for the same chunk"""
+        key = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+        task = self._summaries.get(key)
+        if task is not None and not (task.done() and (task.cancelled() or task.exception())):
+            self._summaries.move_to_end(key)
+            self.metrics["reused_chunks"] += 1
+        else:
+            task = asyncio.ensure_future(
+                self.client.chat(self._chunk_messages(chunk), task="condense")
+            )
+            self._summaries[key] = task
+            while len(self._summaries) > self.cache_entries:
+                self._summaries.popitem(last=False)
+            self.metrics["chunks"] += 1
+        # Shielded so one stage timing out does not cancel the summary for the others
+        return await asyncio.shield(task)
+
+    async def fit(self, text, budget):
+        """
+        Return text unchanged if it fits, otherwise a condensed version
+
+        Args:
+            text: Report text
+            budget: Maximum tokens the returned text may take
+
+        Returns:
+            str: Text of at most budget tokens
+        """
+        if count_tokens(text) <= budget:
+            return text
+
+        self.metrics["condensed"] += 1
+        for _ in range(MAX_CONDENSE_ROUNDS):
+            chunks = split_into_chunks(text, self.chunk_tokens)
+            summaries = await asyncio.gather(*(self._summarize_chunk(chunk) for chunk in chunks))
+            text = "\n\n".join(summary.strip() for summary in summaries)
+            if count_tokens(text) <= budget:
+                return text
+            if len(chunks) == 1:
+                break
+
+        # Summaries did not shrink enough, keep what fits
+        self.metrics["truncated"] += 1
+        return truncate_to_tokens(text, budget)
+
+    def fit_sync(self, text, budget):
+        """Blocking fit() for code running in a worker thread"""
+        return self.client.run_sync(self.fit(text, budget))
+
+    def stats(self):
+        return {**self.metrics, "cached_chunks": len(self._summaries)}
+
+
+# Create a singleton instance so all handlers share the chunk summaries
+report_condenser = ReportCondenser(llm_client)
@@ -1,22 +1,35 @@
 # app/models/rag_handler.py
 import re
 import json
-import requests
 from app.models.medrag.medrag import MedRAG
+from app import config
+from app.models.llm_client import llm_client
+from app.models.prompt_budget import report_condenser
+from app.models.structured_output import generate_json, extract_json_object, StructuredOutputError
+
+# Structured RAG answers, the answer text itself stays natural language
+ANSWER_SCHEMA = {
+    "type": "object",
+    "properties": {"answer": {"type": "string"}},
+    "required": ["answer"]
+}
 
 
 class RAGHandler:
-    def __init__(self, lmstudio_api_url="http://localhost:1234/v1/chat/completions"):
+    def __init__(self, lmstudio_api_url=None):
         """
         Initialize the RAG handler
         
         Args:
-            lmstudio_api_url: The URL for the LMStudio API
+            lmstudio_api_url: No longer supported, endpoints are configured with LLM_API_URLS
         """
-        self.lmstudio_api_url = lmstudio_api_url
-        self.headers = {
-            "Content-Type": "application/json"
-        }
+        # A client of its own would never be started or closed by the app lifespan,
+        # so the thread-side calls made by MedRAG would find no event loop to run on
+        if lmstudio_api_url:
+            raise Exception("RAGHandler(lmstudio_api_url=...) is no longer supported, list endpoints in LLM_API_URLS")
+        self.client = llm_client
+        self.lmstudio_api_url = self.client.api_url
+        self.condenser = report_condenser
         
         # Initialize MedRAG with medical textbooks corpus, disable corpus cache to save memory
         self.rag_system = MedRAG(
@@ -34,6 +47,9 @@ class RAGHandler:
         """
         Generate responses using the LMStudio API
         
+        MedRAG calls this synchronously from a worker thread, the request
+        itself runs on the shared async client.
+        
         Args:
             messages: List of messages
             kwargs: Additional parameters
@@ -42,28 +58,39 @@ class RAGHandler:
             str: The generated response
         """
         try:
-            payload = {
-                "model": "local-model",  # Model name used by LMStudio
-                "messages": messages,
-                "temperature": kwargs.get("temperature", 0.7),
-                "max_tokens": kwargs.get("max_tokens", 2000)
-            }
-            
-            response = requests.post(
-                self.lmstudio_api_url,
-                headers=self.headers,
-                data=json.dumps(payload)
+            if config.LLM_STRUCTURED_OUTPUT:
+                return self._generate_structured(messages, **kwargs)
+
+            return self.client.chat_sync(
+                messages,
+                task="rag",
+                temperature=kwargs.get("temperature"),
+                max_tokens=kwargs.get("max_tokens")
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content']
-            else:
-                raise Exception(f"LMStudio API call failed, status code: {response.status_code}")
         
         except Exception as e:
             raise Exception(f"Failed to generate response: {str(e)}")
     
+    def _generate_structured(self, messages, **kwargs):
+        """
+        Generate a {"answer": ...} object, asking once more if the answer field is missing or empty
+
+        Returns:
+            str: The object as JSON text, parsed by _extract_answer_from_response
+        """
+        settings = {"task": "rag", "temperature": kwargs.get("temperature"), "max_tokens": kwargs.get("max_tokens")}
+        result = self.client.run_sync(generate_json(self.client, messages, ANSWER_SCHEMA, "answer", **settings))
+
+        if not isinstance(result.get("answer"), str) or not result["answer"].strip():
+            retry_messages = messages + [
+                {"role": "user", "content": 'Reply with a JSON object {"answer": "..."} holding your full answer.'}
+            ]
+            result = self.client.run_sync(generate_json(self.client, retry_messages, ANSWER_SCHEMA, "answer", **settings))
+            if not isinstance(result.get("answer"), str) or not result["answer"].strip():
+                raise StructuredOutputError("Model answer has no answer field")
+
+        return json.dumps({"answer": result["answer"]}, ensure_ascii=False)
+
     def answer_medical_question(self, question, k=16):
         """
         Answer medical questions using RAG
@@ -111,6 +138,9 @@ class RAGHandler:
             dict: Contains the enhanced explanation and retrieved relevant texts
         """
         try:
+            # The report shares the prompt with k retrieved snippets, condense long reports
+            medical_text = self.condenser.fit_sync(medical_text, config.RAG_REPORT_TOKENS)
+
             if question is None:
                 # If no specific question, create a generic query to retrieve medical information
                 query = f"Please explain the key concepts and terminology mentioned in the following medical information: {medical_text}"
@@ -161,9 +191,8 @@ class RAGHandler:
         
         # Try to extract JSON from text that might contain other content
         try:
-            json_match = re.search(r'({.*})', response, re.DOTALL)
-            if json_match:
-                answer_dict = json.loads(json_match.group(1))
+            answer_dict = extract_json_object(response)
+            if answer_dict:
                 if "step_by_step_thinking" in answer_dict:
                     return answer_dict["step_by_step_thinking"]
                 if "answer" in answer_dict:
@@ -0,0 +1,348 @@
+# app/models/reference_ranges.py
+import json
+from collections import defaultdict
+from functools import lru_cache
+
+from app.models.indicator_parser import build_name_index, normalize_name, normalize_sex, name_candidates
+
+# Names shorter than this are only matched exactly, "na" and "k" are too short to guess
+FUZZY_MIN_LENGTH = 4
+# Typo-level edits accepted over the whole name: one up to this length, two beyond
+FUZZY_ONE_EDIT_LENGTH = 10
+# Words of a name that change the analyte, they never take part in a fuzzy match:
+# "Non-HDL", "Free Testosterone", "Urine Creatinine" and "Cholesterol HDL Ratio" are other tests
+QUALIFIER_TOKENS = {
+    "non", "v", "free", "total", "direct", "indirect", "ionized", "ionised", "urine", "urinary", "serum",
+    "plasma", "blood", "ratio", "index", "fraction", "calculated", "corrected", "postprandial", "fasting",
+    "random", "1h", "2h",
+}
+# Resolved names remembered before the memo is reset, extraction output names are open ended
+RESOLVED_MEMO_SIZE = 4096
+
+# Units of the ranges in medical_metrics.json
+CANONICAL_UNITS = {
+    "Body Temperature": "°C",
+    "Systolic Blood Pressure": "mmHg",
+    "Diastolic Blood Pressure": "mmHg",
+    "Heart Rate": "bpm",
+    "Respiratory Rate": "breaths/min",
+    "Oxygen Saturation": "%",
+    "Fasting Blood Glucose": "mmol/L",
+    "Postprandial Blood Glucose": "mmol/L",
+    "Total Cholesterol": "mmol/L",
+    "LDL Cholesterol": "mmol/L",
+    "HDL Cholesterol": "mmol/L",
+    "Triglycerides": "mmol/L",
+    "Hemoglobin": "g/dL",
+    "White Blood Cell Count": "10^9/L",
+    "Red Blood Cell Count": "10^12/L",
+    "Platelet Count": "10^9/L",
+    "Hematocrit": "%",
+    "Serum Creatinine": "mg/dL",
+    "Blood Urea Nitrogen": "mg/dL",
+    "Sodium": "mmol/L",
+    "Potassium": "mmol/L",
+    "Calcium": "mg/dL",
+    "Magnesium": "mg/dL",
+    "Phosphorus": "mg/dL",
+    "C-Reactive Protein": "mg/L",
+    "Erythrocyte Sedimentation Rate": "mm/h",
+    "Alkaline Phosphatase": "U/L",
+    "Aspartate Aminotransferase": "U/L",
+    "Alanine Aminotransferase": "U/L",
+    "Gamma-Glutamyl Transferase": "U/L",
+    "Bilirubin": "mg/dL",
+    "Albumin": "g/dL",
+    "Total Protein": "g/dL",
+    "Ferritin": "ng/mL",
+    "Vitamin D": "ng/mL",
+    "Vitamin B12": "pg/mL",
+    "Thyroid-Stimulating Hormone": "mIU/L",
+    "Free T4": "ng/dL",
+    "Free T3": "pg/mL",
+    "Parathyroid Hormone": "pg/mL",
+    "Cortisol": "ug/dL",
+    "Testosterone": "ng/dL",
+    "Progesterone": "ng/mL",
+    "Estradiol": "pg/mL",
+    "Prostate-Specific Antigen": "ng/mL",
+    "HbA1c": "%",
+    "Insulin": "uIU/mL",
+    "Lactic Acid": "mmol/L",
+    "Ammonia": "umol/L",
+    "D-Dimer": "ng/mL",
+}
+
+# Other units a metric is reported in, as (factor, offset) giving the canonical value
+UNIT_CONVERSIONS = {
+    "Fasting Blood Glucose": {"mg/dl": (1 / 18.016, 0)},
+    "Postprandial Blood Glucose": {"mg/dl": (1 / 18.016, 0)},
+    "Total Cholesterol": {"mg/dl": (1 / 38.67, 0)},
+    "LDL Cholesterol": {"mg/dl": (1 / 38.67, 0)},
+    "HDL Cholesterol": {"mg/dl": (1 / 38.67, 0)},
+    "Triglycerides": {"mg/dl": (1 / 88.57, 0)},
+    "Hemoglobin": {"g/l": (0.1, 0), "mmol/l": (1.611, 0)},
+    "White Blood Cell Count": {"10^3/ul": (1, 0), "/nl": (1, 0)},
+    "Red Blood Cell Count": {"10^6/ul": (1, 0), "/pl": (1, 0)},
+    "Platelet Count": {"10^3/ul": (1, 0), "/nl": (1, 0)},
+    "Hematocrit": {"l/l": (100, 0)},
+    "Serum Creatinine": {"umol/l": (1 / 88.4, 0)},
+    "Blood Urea Nitrogen": {"mmol/l": (2.801, 0)},
+    "Sodium": {"meq/l": (1, 0)},
+    "Potassium": {"meq/l": (1, 0)},
+    "Calcium": {"mmol/l": (4.008, 0)},
+    "Magnesium": {"mmol/l": (2.431, 0)},
+    "Phosphorus": {"mmol/l": (3.097, 0)},
+    "C-Reactive Protein": {"mg/dl": (10, 0)},
+    "Alkaline Phosphatase": {"iu/l": (1, 0)},
+    "Aspartate Aminotransferase": {"iu/l": (1, 0)},
+    "Alanine Aminotransferase": {"iu/l": (1, 0)},
+    "Gamma-Glutamyl Transferase": {"iu/l": (1, 0)},
+    "Bilirubin": {"umol/l": (1 / 17.1, 0)},
+    "Albumin": {"g/l": (0.1, 0)},
+    "Total Protein": {"g/l": (0.1, 0)},
+    "Ferritin": {"ug/l": (1, 0)},
+    "Vitamin D": {"nmol/l": (1 / 2.496, 0)},
+    "Vitamin B12": {"pmol/l": (1.355, 0)},
+    "Thyroid-Stimulating Hormone": {"uiu/ml": (1, 0)},
+    "Free T4": {"pmol/l": (1 / 12.87, 0)},
+    "Free T3": {"pmol/l": (1 / 1.536, 0)},
+    "Parathyroid Hormone": {"ng/l": (1, 0), "pmol/l": (9.43, 0)},
+    "Cortisol": {"nmol/l": (1 / 27.59, 0)},
+    "Testosterone": {"nmol/l": (28.84, 0)},
+    "Progesterone": {"nmol/l": (1 / 3.18, 0)},
+    "Estradiol": {"pmol/l": (1 / 3.671, 0)},
+    "Prostate-Specific Antigen": {"ug/l": (1, 0)},
+    # IFCC mmol/mol to NGSP %
+    "HbA1c": {"mmol/mol": (0.09148, 2.152)},
+    "Insulin": {"pmol/l": (1 / 6.945, 0), "mu/l": (1, 0)},
+    "Lactic Acid": {"mg/dl": (1 / 9.008, 0)},
+    "Ammonia": {"ug/dl": (0.587, 0)},
+    "D-Dimer": {"ug/l": (1, 0), "mg/l": (1000, 0)},
+}
+
+
+def normalize_unit(unit):
+    """Lower case unit without spaces, "µmol/L" and "umol/l" compare equal"""
+    unit = unit.lower().replace("µ", "u").replace("μ", "u").replace("mcg", "ug")
+    unit = unit.replace("×", "x").replace("*", "^").replace(" ", "")
+    # "x10^9/l" and "10^9/l" are the same unit
+    return unit[1:] if unit.startswith("x10") else unit
+
+
+def edit_distance(a, b, limit):
+    """
+    Edits (insert, delete, substitute, swap adjacent) turning a into b
+
+    Returns:
+        int: The distance, or limit + 1 as soon as it is known to exceed limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def typo_of(key, candidate):
+    """
+    Whether key is a misspelling of candidate rather than another analyte
+
+    The names must have the same words, each equal or a near spelling, and
+    short words, words with digits ("b6", "t3", "2h") and qualifiers
+    ("free", "non", "urine") must be identical, so "Vitamin A" is not
+    "Vitamin D" and "VLDL Cholesterol" is not "LDL Cholesterol".
+
+    Returns:
+        int or None: Edit distance of an accepted match
+    """
+    limit = 1 if len(candidate) <= FUZZY_ONE_EDIT_LENGTH else 2
+    words, candidate_words = key.split(), candidate.split()
+    if len(words) != len(candidate_words):
+        return None
+    for word, candidate_word in zip(words, candidate_words):
+        if word == candidate_word:
+            continue
+        if (
+            len(word) < FUZZY_MIN_LENGTH or len(candidate_word) < FUZZY_MIN_LENGTH
+            or not word.isalpha() or not candidate_word.isalpha()
+            or word in QUALIFIER_TOKENS or candidate_word in QUALIFIER_TOKENS
+        ):
+            return None
+    distance = edit_distance(key, candidate, limit)
+    return distance if distance <= limit else None
+
+
+def trigrams(key):
+    """Character trigrams of a normalized name, padded so word starts and ends count"""
+    padded = f"  {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class ReferenceRangeEngine:
+    def __init__(self, metrics_file):
+        """
+        Reference ranges of medical_metrics.json, indexed once
+
+        Names resolve through a hash index of normalized names and aliases,
+        then, for misspelled or OCR-garbled names, through trigram
+        signatures narrowing the names within one or two edits. Resolved
+        names are memoized, so repeated lookups are a single dict access.
+
+        Args:
+            metrics_file: Path of medical_metrics.json, whose entries are
+                [low, high] or {"range": [low, high], "sex": {...}, "age": [...]}
+        """
+        with open(metrics_file, "r") as f:
+            metrics = json.load(f)
+        self.ranges = {name: self._parse_spec(spec) for name, spec in metrics.items()}
+        self.index = dict(build_name_index(metrics_file))
+
+        # Trigram signature of every indexed name and the names holding each trigram
+        self._signatures = {key: trigrams(key) for key in self.index if len(key) >= FUZZY_MIN_LENGTH}
+        self._postings = defaultdict(list)
+        for key, signature in self._signatures.items():
+            for gram in signature:
+                self._postings[gram].append(key)
+
+        self._resolved = {}
+        self._units = {
+            name: {normalize_unit(unit): (1, 0)} for name, unit in CANONICAL_UNITS.items()
+        }
+        for name, conversions in UNIT_CONVERSIONS.items():
+            self._units.setdefault(name, {}).update(
+                {normalize_unit(unit): conversion for unit, conversion in conversions.items()}
+            )
+
+    @staticmethod
+    def _parse_spec(spec):
+        if isinstance(spec, dict):
+            return {
+                "range": tuple(spec["range"]),
+                "sex": {sex.lower(): tuple(bounds) for sex, bounds in spec.get("sex", {}).items()},
+                "age": [{**rule, "range": tuple(rule["range"])} for rule in spec.get("age", [])],
+            }
+        return {"range": tuple(spec), "sex": {}, "age": []}
+
+    def _fuzzy(self, key):
+        """Indexed name key is a typo of, None when there is none or the closest names disagree"""
+        # Names sharing no trigram with key cannot be within two edits of it
+        candidates = set()
+        for gram in trigrams(key):
+            candidates.update(self._postings.get(gram, ()))
+        matches = {}
+        for candidate in candidates:
+            distance = typo_of(key, candidate)
+            if distance is not None:
+                matches.setdefault(distance, set()).add(self.index[candidate])
+        if not matches:
+            return None
+        metrics = matches[min(matches)]
+        return next(iter(metrics)) if len(metrics) == 1 else None
+
+    def resolve(self, name):
+        """
+        Metric name of medical_metrics.json for an extracted indicator name
+
+        Returns:
+            tuple: (metric name, "exact" or "fuzzy"), or (None, None)
+        """
+        result = self._resolved.get(name)
+        if result is not None:
+            return result
+
+        key = normalize_name(name)
+        result = (None, None)
+        # "Hemoglobin (HGB)" may match on the full name, without the parentheses or on the abbreviation
+        for candidate in name_candidates(name):
+            if candidate in self.index:
+                result = (self.index[candidate], "exact")
+                break
+        else:
+            if len(key) >= FUZZY_MIN_LENGTH:
+                metric = self._fuzzy(key)
+                if metric is not None:
+                    result = (metric, "fuzzy")
+
+        if len(self._resolved) >= RESOLVED_MEMO_SIZE:
+            self._resolved.clear()
+        self._resolved[name] = result
+        return result
+
+    def convert(self, metric, value, unit):
+        """
+        Value in the unit of the metric's reference range
+
+        Returns:
+            float or None if the unit is not known for the metric
+        """
+        conversion = self._units.get(metric, {}).get(normalize_unit(unit))
+        if conversion is None:
+            return None
+        factor, offset = conversion
+        converted = value * factor + offset
+        return value if conversion == (1, 0) else round(converted, 3)
+
+    def range_for(self, metric, sex=None, age=None):
+        """(low, high) for a metric, using age and sex specific ranges when they apply"""
+        spec = self.ranges[metric]
+        sex = normalize_sex(sex)
+        if age is not None:
+            for rule in spec["age"]:
+                if rule.get("sex") not in (None, sex):
+                    continue
+                if rule.get("min", 0) <= age < rule.get("max", float("inf")):
+                    return rule["range"]
+        if sex in spec["sex"]:
+            return spec["sex"][sex]
+        return spec["range"]
+
+    def evaluate(self, name, value, unit=None, sex=None, age=None):
+        """
+        Resolve an indicator and compare it with its reference range
+
+        Args:
+            name: Indicator name as extracted
+            value: Numeric value
+            unit: Unit of value, None when it is already in the reference unit
+            sex: "male" or "female" ("M", "F", "女" are accepted), if known
+            age: Age in years, if known
+
+        Returns:
+            dict or None if the name does not match any metric
+        """
+        metric, match = self.resolve(name)
+        if metric is None:
+            return None
+        if unit:
+            converted = self.convert(metric, value, unit)
+            if converted is None:
+                # Unknown unit, the value is kept as reported
+                print(f"Unknown unit {unit!r} for {metric}, comparing the value as reported")
+            else:
+                value = converted
+        low, high = self.range_for(metric, sex, age)
+        status = "low" if value < low else "high" if value > high else "normal"
+        return {
+            "metric": metric,
+            "value": value,
+            "unit": CANONICAL_UNITS.get(metric),
+            "low": low,
+            "high": high,
+            "status": status,
+            "match": match,
+        }
+
+
+@lru_cache(maxsize=None)
+def load_reference_ranges(metrics_file):
+    """ReferenceRangeEngine for a metrics file, built once per process"""
+    return ReferenceRangeEngine(metrics_file)
@@ -0,0 +1,142 @@
+# app/models/single_flight.py
+import asyncio
+
+
+class _Flight:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Coalesce concurrent identical calls into one
+
+        Callers with the same key while a call is in flight await that call
+        instead of starting their own. The shared call is cancelled only when
+        every caller waiting on it has gone away.
+        """
+        self._flights = {}
+        self.coalesced = 0
+
+    async def do(self, key, factory):
+        """
+        Run factory() once per key at a time and share its result
+
+        Args:
+            key: Fingerprint identifying identical calls
+            factory: Zero argument coroutine function doing the actual work
+
+        Returns:
+            The result of the shared call
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # Shielded so one caller giving up does not cancel the call for the others
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def in_flight(self):
+        return len(self._flights)
+
+
+class _StreamFlight:
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        # Wake everyone waiting on the current event and start a new one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def run(self, source):
+        try:
+            async for part in source:
+                self.parts.append(part)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self):
+        index = 0
+        while True:
+            while index < len(self.parts):
+                yield self.parts[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class StreamSingleFlight:
+    def __init__(self):
+        """
+        Share one upstream token stream between concurrent identical requests
+
+        Late joiners first get the parts already produced, then follow the
+        live stream. The upstream stream is closed when the last subscriber
+        leaves before it has finished.
+        """
+        self._flights = {}
+        self.coalesced = 0
+
+    async def stream(self, key, factory):
+        """
+        Yield the parts of the shared stream for key
+
+        Args:
+            key: Fingerprint identifying identical requests
+            factory: Zero argument function returning the async iterator to share
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _StreamFlight()
+            flight.task = asyncio.ensure_future(flight.run(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.subscribers += 1
+        try:
+            async for part in flight.subscribe():
+                yield part
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def in_flight(self):
+        return len(self._flights)
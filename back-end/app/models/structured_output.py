@@ -0,0 +1,195 @@
+# app/models/structured_output.py
+import json
+import re
+import time
+
+from app import config
+
+# Complete "key": value members of a JSON object, and a trailing unterminated string member
+MEMBER_PATTERN = re.compile(
+    r'"((?:[^"\\]|\\.)*)"\s*:\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?|"(?:[^"\\]|\\.)*"|true|false|null)'
+)
+TRAILING_STRING_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*"((?:[^"\\]|\\.)*)$', re.DOTALL)
+
+# Set when the backend rejects response_format, requests rely on the prompt alone until then
+_response_format_disabled_until = 0.0
+# Words of an error body saying the backend does not understand response_format
+RESPONSE_FORMAT_ERROR = re.compile(r"response_format|json_schema", re.IGNORECASE)
+
+
+class StructuredOutputError(Exception):
+    """The model answer did not contain a usable JSON object"""
+
+
+class JSONObjectScanner:
+    """
+    Find the first complete top-level JSON object in text fed piece by piece
+
+    Braces inside strings are ignored, so feed() can tell as soon as the
+    object closes while a response is still streaming.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+        self.start = None
+        self.end = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text):
+        """Add text, return True once the object is complete"""
+        if self.end is not None:
+            return True
+        offset = self._length
+        self._parts.append(text)
+        self._length += len(text)
+        for index, char in enumerate(text, offset):
+            if self.start is None:
+                if char == "{":
+                    self.start = index
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.end = index + 1
+                    return True
+        return False
+
+    def text(self):
+        return "".join(self._parts)
+
+    def object_text(self):
+        """The complete object, or None"""
+        return self.text()[self.start:self.end] if self.end is not None else None
+
+    def partial_text(self):
+        """Everything from the opening brace on"""
+        return self.text()[self.start:] if self.start is not None else ""
+
+
+def extract_json_object(text):
+    """
+    First JSON object embedded in text
+
+    Unlike a greedy {.*} match this stops at the brace closing the object,
+    and skips braces in surrounding prose that do not start valid JSON.
+
+    Raises:
+        StructuredOutputError: If text holds no valid JSON object
+    """
+    position = text.find("{")
+    while position != -1:
+        scanner = JSONObjectScanner()
+        if scanner.feed(text[position:]):
+            try:
+                value = json.loads(scanner.object_text())
+                if isinstance(value, dict):
+                    return value
+            except json.JSONDecodeError:
+                pass
+        position = text.find("{", position + 1)
+    raise StructuredOutputError("No JSON object found in the model answer")
+
+
+def _decode_string(raw):
+    try:
+        return json.loads(f'"{raw.rstrip(chr(92))}"')
+    except json.JSONDecodeError:
+        return raw
+
+
+def salvage_members(text):
+    """
+    Members of a truncated or malformed object that are complete
+
+    A string member cut off by max_tokens is kept with the text generated so far.
+    """
+    members = {}
+    for key, raw in MEMBER_PATTERN.findall(text):
+        try:
+            members[_decode_string(key)] = json.loads(raw)
+        except json.JSONDecodeError:
+            continue
+    trailing = TRAILING_STRING_PATTERN.search(text)
+    if trailing is not None:
+        members.setdefault(_decode_string(trailing.group(1)), _decode_string(trailing.group(2)))
+    return members
+
+
+def response_format(name, schema):
+    """OpenAI-style response_format constraining the answer to a JSON schema"""
+    return {"type": "json_schema", "json_schema": {"name": name, "schema": schema}}
+
+
+async def generate_json(client, messages, schema, name, **kwargs):
+    """
+    Generate a JSON object constrained by schema
+
+    The answer is streamed and scanned as it arrives, generation stops as
+    soon as the object closes. When the answer is cut off or malformed the
+    complete members are returned, so callers can re-ask only what is
+    missing or invalid.
+
+    Args:
+        client: LLMClient
+        messages: Chat messages
+        schema: JSON schema of the expected object
+        name: Schema name sent to the backend
+        kwargs: Further stream_chat arguments (task, max_tokens, ...)
+
+    Returns:
+        dict: The parsed object
+    """
+    global _response_format_disabled_until
+    extra = {}
+    if config.LLM_STRUCTURED_OUTPUT and time.monotonic() >= _response_format_disabled_until:
+        extra["response_format"] = response_format(name, schema)
+
+    scanner = JSONObjectScanner()
+    try:
+        deltas = client.stream_chat(messages, stop_when=JSONObjectScanner, **kwargs, **extra)
+        try:
+            # stream_chat stops the generation once the object closes, reading the stream
+            # to its end lets it cache the answer
+            async for delta in deltas:
+                scanner.feed(delta)
+        finally:
+            await deltas.aclose()
+    except Exception as e:
+        if (
+            extra
+            and getattr(e, "status_code", None) in (400, 422)
+            and RESPONSE_FORMAT_ERROR.search(str(e))
+            and not scanner.text()
+        ):
+            # The backend does not support response_format, prompt only for a while
+            retry = config.LLM_STRUCTURED_OUTPUT_RETRY
+            print(f"Backend rejected response_format, continuing without schemas for {retry:.0f}s: {str(e)}")
+            _response_format_disabled_until = time.monotonic() + retry
+            return await generate_json(client, messages, schema, name, **kwargs)
+        raise
+
+    object_text = scanner.object_text()
+    if object_text is not None:
+        try:
+            return json.loads(object_text)
+        except json.JSONDecodeError:
+            pass
+    members = salvage_members(scanner.partial_text())
+    if members:
+        return members
+    raise StructuredOutputError(f"Model answer is not a JSON object: {scanner.text()[:200]}")
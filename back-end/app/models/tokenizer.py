@@ -0,0 +1,34 @@
+# app/models/tokenizer.py
+from app import config
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once, None if tiktoken cannot be used"""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(config.TOKENIZER_ENCODING)
+        except Exception as e:
+            # tiktoken is missing or its encoding file could not be downloaded
+            print(f"tiktoken unavailable, estimating token counts: {str(e)}")
+            _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text):
+    """Number of tokens in text"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Rough estimate: about four ASCII characters per token, one token per other character
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def count_message_tokens(messages):
+    """Number of prompt tokens of chat messages, including the chat template overhead"""
+    return sum(count_tokens(message["content"]) + 4 for message in messages) + 2
@@ -0,0 +1,271 @@
+# app/models/translation_memory.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from app import config
+from app.models.tokenizer import count_tokens
+
+# Candidate sentence ends: Latin punctuation followed by a space, or CJK punctuation
+SENTENCE_END = re.compile(r"(?<=[.!?])[ \t]+(?=\S)|(?<=[。！？])(?=\S)")
+# Words ending in a period that do not end the sentence
+ABBREVIATIONS = {
+    "dr.", "mr.", "mrs.", "ms.", "prof.", "st.", "vs.", "e.g.", "i.e.", "approx.", "ca.", "cf.", "etc.",
+    "fig.", "incl.", "no.", "resp.",
+}
+# Characters a new sentence may open with before its first letter: quotes and brackets
+SENTENCE_OPENERS = "\"'“‘([«"
+# "[3] translated sentence" lines of a batched translation answer
+MARKER_LINE = re.compile(r"^\s*\[(\d+)\]\s?(.*)$")
+
+
+def _is_cjk(char):
+    return "\u3040" <= char <= "\u30ff" or "\u3400" <= char <= "\u9fff" or "\uac00" <= char <= "\ud7af"
+
+
+def _is_sentence_break(line, match):
+    """
+    Whether a candidate sentence end really ends a sentence
+
+    Latin sentences must be followed by an upper case or CJK start, and
+    abbreviations ("Dr.", "e.g.") and initials ("J.") never end one, so
+    fragments such as "Dr." are not translated and stored on their own.
+    """
+    before = line[:match.start()]
+    if before.endswith(("。", "！", "？")):
+        return True
+    word = before.rsplit(None, 1)[-1].lower() if before.strip() else ""
+    if word in ABBREVIATIONS or re.fullmatch(r"[^\W\d_]\.", word):
+        return False
+    following = line[match.end():].lstrip(SENTENCE_OPENERS)
+    return bool(following) and (following[0].isupper() or _is_cjk(following[0]))
+
+
+def split_segments(text):
+    """
+    Split text into translatable segments and the separators between them
+
+    Lines are split into sentences at sentence-final ".!?" (and "。！？"),
+    never at ":" or ";", so segments carry their own context. Separators
+    keep the original line breaks and spacing so the translation can be stitched back in the
+    same layout.
+
+    Returns:
+        list: (segment, separator) pairs, joining them gives back text
+    """
+    pairs = []
+    lines = text.split("\n")
+    for line_number, line in enumerate(lines):
+        newline = "\n" if line_number < len(lines) - 1 else ""
+        # Leading markup ("- ", "1. ", "## ") and indentation are kept out of the segment
+        prefix = re.match(r"^\s*(?:[-*•#>]+\s+|\d{1,2}[.)]\s+)?", line).group(0)
+        if prefix:
+            pairs.append(("", prefix))
+        position = len(prefix)
+        for match in SENTENCE_END.finditer(line, position):
+            if not _is_sentence_break(line, match):
+                continue
+            pairs.append((line[position:match.start()], match.group(0)))
+            position = match.end()
+        rest = line[position:]
+        trailing = rest[len(rest.rstrip()):]
+        pairs.append((rest.rstrip(), trailing + newline))
+    return [(segment, separator) for segment, separator in pairs if segment or separator]
+
+
+def needs_translation(segment):
+    """Segments without letters (numbers, units, punctuation) are kept as they are"""
+    return re.search(r"[^\W\d_]", segment) is not None
+
+
+def segment_key(segment, target_language):
+    """Hash of a segment and the language it is translated into"""
+    normalized = " ".join(segment.split())
+    return hashlib.sha256(f"{target_language.strip().lower()}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+def batch_segments(segments, max_tokens):
+    """Group (number, segment) pairs into batches of at most max_tokens source tokens"""
+    batches, current, used = [], [], 0
+    for number, segment in segments:
+        tokens = count_tokens(segment) + 4
+        if current and used + tokens > max_tokens:
+            batches.append(current)
+            current, used = [], 0
+        current.append((number, segment))
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class MarkerLineParser:
+    """
+    Parse "[n] text" lines of a streamed batch translation
+
+    feed() returns the segments whose line is complete, so translated
+    segments can be passed on while the rest of the batch is generated.
+    """
+
+    def __init__(self, numbers):
+        self.numbers = set(numbers)
+        self._buffer = ""
+        self.translations = {}
+        # How often each marker appeared, requested or not
+        self.markers = {}
+
+    def _parse(self, line):
+        match = MARKER_LINE.match(line)
+        if match is None:
+            return None
+        number = int(match.group(1))
+        self.markers[number] = self.markers.get(number, 0) + 1
+        if number not in self.numbers or number in self.translations or not match.group(2).strip():
+            return None
+        self.translations[number] = match.group(2).strip()
+        return number, self.translations[number]
+
+    def feed(self, text):
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        return [parsed for parsed in map(self._parse, lines) if parsed is not None]
+
+    def close(self):
+        lines, self._buffer = [self._buffer], ""
+        return [parsed for parsed in map(self._parse, lines) if parsed is not None]
+
+    def complete(self):
+        """
+        Whether every requested marker came back exactly once with a text
+
+        A skipped, repeated or unexpected marker means the model shifted the
+        numbering, so the lines may be paired with the wrong sources.
+        """
+        return (
+            set(self.markers) == self.numbers
+            and all(count == 1 for count in self.markers.values())
+            and set(self.translations) == self.numbers
+        )
+
+
+class TranslationMemory:
+    def __init__(self, db_path=None, max_entries=None):
+        """
+        Store of translated segments keyed by segment hash and target language
+
+        Explanations repeat many sentences (lifestyle advice, reassurance)
+        across reports, so those are translated once and looked up
+        afterwards. The least recently used segments are evicted once the
+        store holds more than max_entries.
+
+        Args:
+            db_path: Path of the SQLite database file
+            max_entries: Maximum number of stored segment translations
+        """
+        db_path = db_path or config.TRANSLATION_MEMORY_PATH
+        self.max_entries = config.TRANSLATION_MEMORY_MAX_ENTRIES if max_entries is None else max_entries
+        self._lock = threading.Lock()
+        self.metrics = {"segments": 0, "hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS segments (
+                key TEXT PRIMARY KEY,
+                language TEXT NOT NULL,
+                source TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_segments_last_access ON segments (last_access)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+    def lookup(self, segments, target_language):
+        """
+        Stored translations of segments
+
+        Args:
+            segments: Segment texts
+            target_language: Language of the translations
+
+        Returns:
+            dict: Segment key to translation, for the segments that are stored
+        """
+        keys = list({segment_key(segment, target_language) for segment in segments})
+        found = {}
+        with self._lock:
+            # Stay under SQLite's limit of bound parameters per statement
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                found.update(self._conn.execute(
+                    f"SELECT key, translation FROM segments WHERE key IN ({placeholders})", part
+                ).fetchall())
+            if found:
+                self._conn.executemany(
+                    "UPDATE segments SET last_access = ? WHERE key = ?", [(time.time(), key) for key in found]
+                )
+                self._conn.commit()
+            self.metrics["segments"] += len(segments)
+            hits = sum(1 for segment in segments if segment_key(segment, target_language) in found)
+            self.metrics["hits"] += hits
+            self.metrics["misses"] += len(segments) - hits
+        return found
+
+    def store(self, translations, target_language):
+        """Store (segment, translation) pairs"""
+        # A translation identical to its source is usually the model echoing the input,
+        # storing it would serve the untranslated text for good
+        rows = [
+            (segment_key(segment, target_language), target_language, segment, translation, time.time())
+            for segment, translation in translations
+            if " ".join(translation.split()) != " ".join(segment.split())
+        ]
+        if not rows:
+            return
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO segments (key, language, source, translation, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._entries += self._conn.total_changes - before
+            self._evict()
+            self._conn.commit()
+            self.metrics["stores"] += len(rows)
+
+    def _evict(self):
+        """Drop least recently used segments until under the entry cap"""
+        excess = self._entries - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM segments WHERE key IN (SELECT key FROM segments ORDER BY last_access LIMIT ?)", (excess,)
+        )
+        self._entries -= excess
+        self.metrics["evictions"] += excess
+
+    def stats(self):
+        with self._lock:
+            lookups = self.metrics["hits"] + self.metrics["misses"]
+            return {
+                **self.metrics,
+                "hit_rate": self.metrics["hits"] / lookups if lookups else 0.0,
+                "entries": self._entries,
+                "max_entries": self.max_entries,
+            }
+
+
+# Create a singleton instance so every request shares the stored segments
+translation_memory = TranslationMemory() if config.TRANSLATION_MEMORY_ENABLED else None
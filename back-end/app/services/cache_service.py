@@ -0,0 +1,115 @@
+# app/services/cache_service.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app import config
+
+
+class ResultCache:
+    def __init__(self, db_path=None, ttl=None, max_entries=None, max_bytes=None):
+        """
+        Persistent cache of report results keyed by the SHA-256 of the uploaded image
+
+        Entries expire after a TTL, and the least recently used entries are
+        evicted once the entry count or total payload size exceeds its cap.
+
+        Args:
+            db_path: Path of the SQLite database file
+            ttl: Seconds an entry stays valid, 0 disables expiry
+            max_entries: Maximum number of cached results
+            max_bytes: Maximum total size of the cached payloads
+        """
+        db_path = db_path or config.RESULT_CACHE_PATH
+        self.ttl = config.RESULT_CACHE_TTL if ttl is None else ttl
+        self.max_entries = config.RESULT_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_bytes = config.RESULT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                content_hash TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access)")
+        self._conn.commit()
+
+    def get(self, content_hash):
+        """Return the cached result for an image hash, or None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM results WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            payload, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM results WHERE content_hash = ?", (content_hash,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute(
+                "UPDATE results SET last_access = ? WHERE content_hash = ?", (now, content_hash)
+            )
+            self._conn.commit()
+        return json.loads(payload)
+
+    def put(self, content_hash, result):
+        """Store the result for an image hash and evict old entries if needed"""
+        payload = json.dumps(result)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (content_hash, payload, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (content_hash, payload, len(payload), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Drop expired entries, then least recently used ones until within the caps"""
+        if self.ttl:
+            self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl,))
+
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT content_hash, size FROM results ORDER BY last_access").fetchall()
+        stale = []
+        for content_hash, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            stale.append((content_hash,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM results WHERE content_hash = ?", stale)
+
+    def stats(self):
+        """Number of entries and total payload size"""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        return {"entries": count, "bytes": total, "max_entries": self.max_entries, "max_bytes": self.max_bytes}
+
+
+# Create a singleton instance shared by the upload endpoint and the job workers
+result_cache = ResultCache()
@@ -0,0 +1,174 @@
+# app/services/file_service.py
+import hashlib
+import os
+import uuid
+from pathlib import Path
+
+import aiofiles
+
+from app import config
+from app.models.pdf import count_pdf_pages
+
+# Read size used when hashing files on disk
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Leading bytes identifying the accepted file types
+FILE_SIGNATURES = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"%PDF-", ".pdf"),
+    (b"II*\x00", ".tif"),
+    (b"MM\x00*", ".tif"),
+    (b"BM", ".bmp"),
+]
+
+
+class UploadError(Exception):
+    """Upload rejected by validation, carries the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def sniff_extension(head):
+    """Return the file extension matching the leading bytes, or None"""
+    for signature, extension in FILE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def hash_file(file_path, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Compute the SHA-256 of a file without loading it into memory
+
+    Args:
+        file_path: Path of the file
+        chunk_size: Number of bytes read at a time
+
+    Returns:
+        str: Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_content_addressed(file_path, content_hash, directory, extension=None):
+    """
+    Move a file to <directory>/<content_hash><ext> so identical uploads share one copy
+
+    Args:
+        file_path: Path of the freshly written file
+        content_hash: SHA-256 hex digest of the file content
+        directory: Directory holding content-addressed files
+        extension: Extension of the stored file, defaults to the current suffix
+
+    Returns:
+        Path: Final path of the file
+    """
+    file_path = Path(file_path)
+    extension = extension or file_path.suffix.lower()
+    target = Path(directory) / f"{content_hash}{extension}"
+
+    if target.exists():
+        # Same content is already stored, drop the duplicate
+        file_path.unlink()
+    else:
+        os.replace(file_path, target)
+
+    return target
+
+
+async def save_upload_stream(file, directory, allowed_extensions=None, max_bytes=None, chunk_size=None):
+    """
+    Stream an upload to disk in fixed-size chunks
+
+    The SHA-256 and the file type are computed while copying, the copy is
+    aborted as soon as the size limit is exceeded, and the data is written
+    to a temporary file that is only renamed into the upload directory
+    once complete.
+
+    Args:
+        file: FastAPI UploadFile
+        directory: Directory holding content-addressed uploads
+        allowed_extensions: Accepted file types, e.g. {".jpg", ".png"}
+        max_bytes: Maximum upload size
+        chunk_size: Number of bytes read and written at a time
+
+    Returns:
+        tuple: (final path, content hash, size in bytes)
+    """
+    max_bytes = max_bytes or config.MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or config.UPLOAD_CHUNK_SIZE
+
+    os.makedirs(config.UPLOAD_TMP_DIR, exist_ok=True)
+    temp_path = Path(config.UPLOAD_TMP_DIR) / f"{uuid.uuid4()}.part"
+
+    digest = hashlib.sha256()
+    size = 0
+    extension = None
+    try:
+        async with aiofiles.open(temp_path, "wb") as out_file:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+
+                if extension is None:
+                    extension = sniff_extension(chunk)
+                    if extension is None or (allowed_extensions and extension not in allowed_extensions):
+                        raise UploadError(f"Unsupported file type: {file.filename}", status_code=415)
+
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadError(
+                        f"File {file.filename} exceeds the upload limit of {max_bytes} bytes",
+                        status_code=413
+                    )
+
+                digest.update(chunk)
+                await out_file.write(chunk)
+
+        if size == 0:
+            raise UploadError(f"File {file.filename} is empty")
+
+        content_hash = digest.hexdigest()
+        file_path = store_content_addressed(temp_path, content_hash, directory, extension)
+        return file_path, content_hash, size
+    finally:
+        # Nothing is left behind when the copy was aborted
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+def iter_report_pages(file_paths, max_pages=None):
+    """
+    Lazily list the pages of an uploaded report
+
+    Images are one page each, PDFs yield one entry per page without
+    rendering anything, so pages can be decoded one at a time later.
+
+    Args:
+        file_paths: Paths of the uploaded files in page order
+        max_pages: Maximum number of pages accepted
+
+    Yields:
+        tuple: (path, page_index), page_index is None for images
+    """
+    max_pages = max_pages or config.MAX_UPLOAD_PAGES
+    count = 0
+    for file_path in file_paths:
+        if Path(file_path).suffix.lower() == ".pdf":
+            indices = range(count_pdf_pages(file_path))
+        else:
+            indices = [None]
+
+        for page_index in indices:
+            count += 1
+            if count > max_pages:
+                raise Exception(f"Report has more than {max_pages} pages")
+            yield file_path, page_index
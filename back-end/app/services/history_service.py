@@ -0,0 +1,250 @@
+# app/services/history_service.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from app import config
+from app.models.indicator_parser import parse_report_date
+
+# Patient id of reports uploaded without one
+DEFAULT_PATIENT = "default"
+
+
+def _encode_cursor(taken_at, report_id):
+    return f"{taken_at!r}:{report_id}"
+
+
+def _decode_cursor(cursor):
+    taken_at, report_id = cursor.split(":", 1)
+    return float(taken_at), report_id
+
+
+class HistoryStore:
+    def __init__(self, db_path=None):
+        """
+        SQLite store of processed reports and their indicator time series
+
+        Each report keeps its OCR text and LLM outputs, and every indicator
+        value is also written to a narrow (patient, metric, taken_at, value)
+        table clustered on that key, so trends are read with one index range
+        scan and never require reprocessing an image.
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        db_path = db_path or config.HISTORY_DB_PATH
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reports (
+                id TEXT PRIMARY KEY,
+                patient_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                filename TEXT,
+                taken_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                ocr_text TEXT,
+                summary TEXT,
+                explanation TEXT,
+                indicators TEXT,
+                errors TEXT,
+                indicator_count INTEGER NOT NULL,
+                abnormal_count INTEGER NOT NULL,
+                UNIQUE (patient_id, content_hash)
+            )
+            """
+        )
+        # Listing a patient's reports newest first, with (taken_at, id) as the page cursor
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_reports_patient_taken ON reports (patient_id, taken_at DESC, id DESC)"
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS indicator_values (
+                patient_id TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                taken_at REAL NOT NULL,
+                report_id TEXT NOT NULL,
+                value REAL NOT NULL,
+                low REAL,
+                high REAL,
+                PRIMARY KEY (patient_id, metric, taken_at, report_id)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_indicator_values_report ON indicator_values (report_id)")
+        self._conn.commit()
+
+    def record(self, report, content_hash, filename=None, patient_id=None, taken_at=None):
+        """
+        Store a processed report, once per patient and content hash
+
+        Args:
+            report: Result of analyze_report_text / process_report
+            content_hash: Hash of the uploaded image or pages
+            filename: Stored upload name
+            patient_id: Patient the report belongs to
+            taken_at: Timestamp of the report, defaults to now
+
+        Returns:
+            str: Id of the stored report, the existing one for a repeated upload
+        """
+        patient_id = patient_id or DEFAULT_PATIENT
+        now = time.time()
+        taken_at = taken_at or now
+
+        values = []
+        for metric, entry in (report.get("indicators") or {}).items():
+            # Indicators are [value, low, high] once reference ranges were added, else bare values
+            value, low, high = entry if isinstance(entry, (list, tuple)) and len(entry) == 3 else (entry, None, None)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            values.append((metric, value, low, high))
+        abnormal = sum(
+            1 for _, value, low, high in values
+            if (low is not None and value < low) or (high is not None and value > high)
+        )
+
+        report_id = uuid.uuid4().hex
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO reports (id, patient_id, content_hash, filename, taken_at, created_at, "
+                "ocr_text, summary, explanation, indicators, errors, indicator_count, abnormal_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    report_id, patient_id, content_hash, filename, taken_at, now,
+                    report.get("ocr_text"), report.get("summary"), report.get("explanation"),
+                    json.dumps(report.get("indicators") or {}), json.dumps(report.get("errors") or {}),
+                    len(values), abnormal,
+                ),
+            )
+            if cursor.rowcount == 0:
+                # Already stored for this patient
+                row = self._conn.execute(
+                    "SELECT id FROM reports WHERE patient_id = ? AND content_hash = ?", (patient_id, content_hash)
+                ).fetchone()
+                return row["id"]
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO indicator_values (patient_id, metric, taken_at, report_id, value, low, high) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(patient_id, metric, taken_at, report_id, value, low, high) for metric, value, low, high in values],
+            )
+            self._conn.commit()
+        return report_id
+
+    def list_reports(self, patient_id=None, limit=20, cursor=None):
+        """
+        A page of a patient's reports, newest first
+
+        Args:
+            patient_id: Patient whose reports are listed
+            limit: Page size
+            cursor: next_cursor of the previous page
+
+        Returns:
+            dict: "reports" without their texts, and "next_cursor" (None on the last page)
+        """
+        patient_id = patient_id or DEFAULT_PATIENT
+        query = (
+            "SELECT id, filename, taken_at, created_at, indicator_count, abnormal_count "
+            "FROM reports WHERE patient_id = ?"
+        )
+        params = [patient_id]
+        if cursor:
+            # Keyset pagination: continue after the last row instead of skipping an OFFSET
+            taken_at, report_id = _decode_cursor(cursor)
+            query += " AND (taken_at < ? OR (taken_at = ? AND id < ?))"
+            params += [taken_at, taken_at, report_id]
+        query += " ORDER BY taken_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        reports = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = reports[-1]
+            next_cursor = _encode_cursor(last["taken_at"], last["id"])
+        return {"reports": reports, "next_cursor": next_cursor}
+
+    def get_report(self, report_id):
+        """Return a stored report with its texts and indicators, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM reports WHERE id = ?", (report_id,)).fetchone()
+        if row is None:
+            return None
+        report = dict(row)
+        report["indicators"] = json.loads(report["indicators"]) if report["indicators"] else {}
+        report["errors"] = json.loads(report["errors"]) if report["errors"] else {}
+        return report
+
+    def delete_report(self, report_id):
+        """Delete a report and its indicator values, return whether it existed"""
+        with self._lock:
+            self._conn.execute("DELETE FROM indicator_values WHERE report_id = ?", (report_id,))
+            deleted = self._conn.execute("DELETE FROM reports WHERE id = ?", (report_id,)).rowcount
+            self._conn.commit()
+        return deleted > 0
+
+    def trends(self, metrics, patient_id=None, since=None, until=None):
+        """
+        Time series of metrics for a patient
+
+        Args:
+            metrics: Metric names
+            patient_id: Patient whose values are returned
+            since: Earliest timestamp included
+            until: Latest timestamp included
+
+        Returns:
+            dict: Metric name to points ordered by time
+        """
+        patient_id = patient_id or DEFAULT_PATIENT
+        since = since if since is not None else float("-inf")
+        until = until if until is not None else float("inf")
+        series = {}
+        with self._lock:
+            for metric in metrics:
+                # Served by the primary key: one range scan per metric
+                rows = self._conn.execute(
+                    "SELECT taken_at, value, low, high, report_id FROM indicator_values "
+                    "WHERE patient_id = ? AND metric = ? AND taken_at BETWEEN ? AND ? ORDER BY taken_at",
+                    (patient_id, metric, since, until),
+                ).fetchall()
+                series[metric] = [dict(row) for row in rows]
+        return series
+
+    def metrics(self, patient_id=None):
+        """Metrics recorded for a patient with their value count and latest timestamp"""
+        patient_id = patient_id or DEFAULT_PATIENT
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT metric, COUNT(*) AS count, MIN(taken_at) AS first_taken_at, MAX(taken_at) AS last_taken_at "
+                "FROM indicator_values WHERE patient_id = ? GROUP BY metric ORDER BY metric",
+                (patient_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def safe_record(self, report, content_hash, filename=None, patient_id=None):
+        """record() for the upload paths: a history failure must not fail the upload"""
+        try:
+            return self.record(report, content_hash, filename, patient_id, parse_report_date(report.get("ocr_text")))
+        except Exception as e:
+            print(f"Recording report history failed: {str(e)}")
+            return None
+
+
+# Create a singleton instance so all requests share the connection
+history_store = HistoryStore() if config.HISTORY_ENABLED else None
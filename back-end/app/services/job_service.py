@@ -0,0 +1,193 @@
+# app/services/job_service.py
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+from app import config
+from app.models.llm_scheduler import PRIORITY_BULK, set_llm_priority, find_overload
+from app.services.report_service import process_report, format_report_result, is_complete
+from app.services.cache_service import result_cache
+from app.services.history_service import history_store
+
+
+class JobStore:
+    def __init__(self, db_path):
+        """
+        SQLite backed store for report processing jobs
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                content_hash TEXT,
+                patient_id TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        # Databases created before jobs carried a content hash or a patient id
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column in ("content_hash", "patient_id"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        self._conn.commit()
+
+    def create(self, file_path, filename, content_hash=None, patient_id=None):
+        """Insert a new queued job and return its id"""
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, stage, file_path, filename, content_hash, patient_id, created_at, "
+                "updated_at) VALUES (?, 'queued', 'queued', ?, ?, ?, ?, ?, ?)",
+                (job_id, str(file_path), filename, content_hash, patient_id, now, now),
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id, **fields):
+        """Update columns of a job"""
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def get(self, job_id):
+        """Return a job as a dict, or None if it does not exist"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def requeue_unfinished(self):
+        """Put jobs interrupted by a restart back in the queue and return all queued ids"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', stage = 'queued', updated_at = ? WHERE status = 'running'",
+                (time.time(),),
+            )
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+
+class JobService:
+    def __init__(self, db_path=None, workers=None):
+        """
+        Background processing of uploaded reports
+
+        Jobs are persisted in SQLite, so queued and interrupted work is picked
+        up again after a restart.
+
+        Args:
+            db_path: Path of the SQLite job database
+            workers: Number of jobs processed concurrently
+        """
+        self.store = JobStore(db_path or config.JOB_DB_PATH)
+        self.workers = max(1, workers if workers is not None else config.JOB_WORKERS)
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        """Reload pending jobs and start the worker tasks"""
+        self._queue = asyncio.Queue()
+        for job_id in self.store.requeue_unfinished():
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the worker tasks, running jobs are resumed on next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, file_path, filename, content_hash=None, patient_id=None):
+        """Queue a saved upload for processing and return the job id"""
+        job_id = self.store.create(file_path, filename, content_hash, patient_id)
+        # Before start() the job only waits in the database, start() queues every pending job
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+        return job_id
+
+    def get(self, job_id):
+        """Return the current state of a job"""
+        return self.store.get(job_id)
+
+    async def _worker(self):
+        # Background jobs queue behind interactive LLM requests
+        set_llm_priority(PRIORITY_BULK)
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or job["status"] != "queued":
+            return
+
+        async def on_stage(stage):
+            self.store.update(job_id, status="running", stage=stage)
+
+        self.store.update(job_id, status="running", stage="started")
+        try:
+            report = await process_report(job["file_path"], on_stage)
+            if job["content_hash"] and is_complete(report):
+                result_cache.put(job["content_hash"], report)
+                if history_store is not None:
+                    history_store.safe_record(report, job["content_hash"], job["filename"], job["patient_id"])
+            self.store.update(
+                job_id,
+                status="completed",
+                stage="done",
+                result=format_report_result(report, job["filename"]),
+            )
+        except Exception as e:
+            overload = find_overload(e)
+            if overload is not None:
+                # The LLM backend is saturated, retry the job later instead of failing it
+                print(f"Job {job_id} deferred for {overload.retry_after}s: {overload}")
+                self.store.update(job_id, status="queued", stage="queued")
+                asyncio.get_running_loop().call_later(overload.retry_after, self._queue.put_nowait, job_id)
+                return
+            print(f"Job {job_id} failed: {traceback.format_exc()}")
+            self.store.update(job_id, status="failed", error=str(e))
+
+
+# Create a singleton instance so the queue is shared by all requests
+job_service = JobService()
@@ -0,0 +1,259 @@
+# app/services/ocr_service.py
+import asyncio
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app import config
+from app.models.ocr_pool import (
+    ocr_pool, extract_text, extract_texts_batched, extract_pdf_page_text, init_worker, configure_torch_threads
+)
+
+
+class OCRBatcher:
+    def __init__(self, run, window_ms=None, max_size=None):
+        """
+        Collect OCR requests that arrive close together into one batched call
+
+        The first queued image opens a window, images arriving within it are
+        added until the batch is full, then the whole batch is recognised in
+        one readtext_batched call and each caller gets its own result.
+
+        Args:
+            run: Coroutine function running (func, *args) on the OCR pool
+            window_ms: How long to wait for more images after the first one
+            max_size: Maximum number of images per batch
+        """
+        self.run = run
+        self.window = (config.OCR_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_size = max(1, config.OCR_BATCH_MAX_SIZE if max_size is None else max_size)
+
+        self._queue = None
+        self._task = None
+        self._batches = set()
+
+        self.batch_count = 0
+        self.item_count = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_batch_size = 0
+
+    async def submit(self, image_path):
+        """Queue an image and wait for its text"""
+        if self._task is None or self._task.done():
+            # Created lazily so the queue belongs to the running event loop
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._collect())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((str(image_path), future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Dispatch and keep collecting, batches run in parallel on the OCR workers
+            task = asyncio.create_task(self._dispatch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _dispatch(self, batch):
+        now = time.perf_counter()
+        waits = [now - queued_at for _, _, queued_at in batch]
+        self.batch_count += 1
+        self.item_count += len(batch)
+        self.total_wait += sum(waits)
+        self.max_wait = max(self.max_wait, *waits)
+        self.last_batch_size = len(batch)
+
+        paths = [path for path, _, _ in batch]
+        try:
+            texts = await self.run(extract_texts_batched, paths)
+        except Exception as e:
+            if len(batch) == 1:
+                # The caller gets the EasyOCR or image decoding error itself
+                texts = [e]
+            else:
+                # One unreadable image must not fail the others, retry them one by one
+                texts = await asyncio.gather(
+                    *[self.run(extract_text, path) for path in paths], return_exceptions=True
+                )
+
+        for index, (_, future, _) in enumerate(batch):
+            if future.done():
+                continue
+            if isinstance(texts[index], Exception):
+                future.set_exception(texts[index])
+            else:
+                future.set_result(texts[index])
+
+    def stop(self):
+        """Stop collecting, batches already dispatched are left to finish"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        """Queue depth, batch size and wait time figures for tuning"""
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_size,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches_in_flight": len(self._batches),
+            "batches": self.batch_count,
+            "images": self.item_count,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": self.item_count / self.batch_count if self.batch_count else 0.0,
+            "avg_wait_ms": self.total_wait / self.item_count * 1000 if self.item_count else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+class OCRService:
+    def __init__(self, workers=None):
+        """
+        Run OCR off the event loop
+
+        EasyOCR and OpenCV are CPU bound, so OCR runs in a bounded pool of
+        worker processes, each holding its own warm reader. With zero
+        workers OCR falls back to a thread using the in-process reader pool.
+
+        Args:
+            workers: Number of OCR worker processes
+        """
+        self.workers = config.OCR_PROCESS_WORKERS if workers is None else workers
+        self._executor = None
+        self.batcher = OCRBatcher(self._run) if config.OCR_BATCHING else None
+
+    def start(self):
+        """Create the worker processes and warm up their readers"""
+        if self.workers <= 0:
+            configure_torch_threads()
+            if config.OCR_WARMUP:
+                ocr_pool.warmup()
+            return
+
+        if self._executor is None:
+            main_spec = getattr(sys.modules["__main__"], "__spec__", None)
+            if main_spec is not None and main_spec.name == "app.main":
+                print("OCR workers will re-import app.main and build the whole application, "
+                      "launch with \"python -m app\" or \"uvicorn app.main:app\" instead")
+            # spawn avoids forking a parent that already initialised torch threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(config.OCR_WARMUP, self.workers),
+            )
+            # Workers are started lazily, submit one no-op each to bring them up now
+            futures = [self._executor.submit(int) for _ in range(self.workers)]
+            for future in futures:
+                future.result()
+
+    def stats(self):
+        """OCR pool and batching figures"""
+        stats = {"workers": self.workers, "batching": self.batcher is not None}
+        if self.workers <= 0:
+            stats["reader_pool"] = ocr_pool.stats()
+        if self.batcher is not None:
+            stats["batcher"] = self.batcher.stats()
+        return stats
+
+    def shutdown(self):
+        """Stop the batcher and the worker processes"""
+        if self.batcher is not None:
+            self.batcher.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, func, *args):
+        """Run an OCR function in the worker pool, or in a thread without workers"""
+        if self.workers <= 0:
+            return await asyncio.to_thread(func, *args)
+
+        if self._executor is None:
+            await asyncio.to_thread(self.start)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def extract_text(self, image_path):
+        """
+        Extract text from a report image without blocking the event loop
+
+        Args:
+            image_path: Path of the image on disk
+
+        Returns:
+            str: Extracted text
+        """
+        if self.batcher is not None:
+            return await self.batcher.submit(image_path)
+        return await self._run(extract_text, str(image_path))
+
+    async def extract_page_text(self, page):
+        """
+        Extract text from one page of a report
+
+        Args:
+            page: (path, page_index) tuple, page_index is None for images
+
+        Returns:
+            str: Extracted text
+        """
+        path, page_index = page
+        if page_index is None:
+            return await self.extract_text(path)
+        return await self._run(extract_pdf_page_text, str(path), page_index)
+
+    async def iter_page_texts(self, pages, max_in_flight=None):
+        """
+        OCR pages in parallel and yield them as they finish
+
+        Pages are pulled from the iterable only when a slot frees up, so at
+        most max_in_flight pages are being decoded at any time.
+
+        Args:
+            pages: Iterable of (path, page_index) tuples
+            max_in_flight: Maximum pages processed concurrently
+
+        Yields:
+            tuple: (page_number, text) in completion order, page_number is zero based
+        """
+        limit = max_in_flight or max(1, self.workers)
+        pending = iter(enumerate(pages))
+        in_flight = {}
+
+        try:
+            while True:
+                while len(in_flight) < limit:
+                    item = next(pending, None)
+                    if item is None:
+                        break
+                    number, page = item
+                    in_flight[asyncio.ensure_future(self.extract_page_text(page))] = number
+
+                if not in_flight:
+                    return
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    number = in_flight.pop(task)
+                    yield number, task.result()
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+
+# Create a singleton instance so all requests share the worker processes
+ocr_service = OCRService()
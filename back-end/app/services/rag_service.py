@@ -1,5 +1,7 @@
 # app/services/rag_service.py
+import asyncio
 from app.models.rag_handler import RAGHandler
+from app.models.llm_scheduler import find_overload
 
 class RAGService:
     def __init__(self):
@@ -18,7 +20,9 @@ class RAGService:
             dict: Contains enhanced explanation and references
         """
         try:
-            result = self.rag_handler.enhance_explanation(
+            # Retrieval and generation are blocking, run them in a worker thread
+            result = await asyncio.to_thread(
+                self.rag_handler.enhance_explanation,
                 medical_text=medical_report,
                 question=question,
                 k=8
@@ -30,6 +34,9 @@ class RAGService:
                 "references": result["references"][:5]  # Return only the top 5 most relevant references
             }
         except Exception as e:
+            # Let the endpoint answer with Retry-After when the LLM is saturated
+            if find_overload(e) is not None:
+                raise
             return {
                 "success": False,
                 "message": f"RAG processing failed: {str(e)}"
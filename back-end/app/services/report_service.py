@@ -1,30 +1,117 @@
 # app/services/report_service.py
+import asyncio
+import time
+from app import config
 from app.models.lm_handler import LMStudioHandler
+from app.services.ocr_service import ocr_service
 from pathlib import Path
 
 
-async def process_report(file_path: Path):
+async def _notify(on_stage, stage):
+   """Report pipeline progress to an optional callback"""
+   if on_stage is not None:
+       await on_stage(stage)
+
+
+async def _run_stage(name, coro, timeout, timings):
+   """Await one pipeline stage with a timeout and record how long it took"""
+   start_time = time.perf_counter()
+   try:
+       return await asyncio.wait_for(coro, timeout)
+   except asyncio.TimeoutError:
+       raise Exception(f"{name} stage timed out after {timeout} seconds")
+   finally:
+       timings[name] = round(time.perf_counter() - start_time, 3)
+
+
+async def analyze_report_text(original_content, on_stage=None, timings=None):
+   """
+   Generate summary, explanation and indicators for already extracted report text
+
+   The three LLM stages only depend on the OCR text, so they are issued
+   concurrently and the report takes as long as the slowest one (given a
+   backend with parallel decoding slots). The explanation is required;
+   if the summary or indicator stage fails or times out the report is
+   returned without it ("summary" is None) and the failure is listed
+   under "errors". Stage durations are returned under "timings".
+   """
+   # Initialize LMStudio handler
+   lm_handler = LMStudioHandler()
+   timings = {} if timings is None else timings
+   timeout = config.REPORT_STAGE_TIMEOUT
+
+   await _notify(on_stage, "analyze")
+   summary, explanation, raw_indicators = await asyncio.gather(
+       _run_stage("summarize", lm_handler.summarize_medical_report(original_content), timeout, timings),
+       _run_stage("interpret", lm_handler.interpret_medical_report(original_content), timeout, timings),
+       _run_stage("extract", lm_handler.extract_medical_indicators(original_content), timeout, timings),
+       return_exceptions=True
+   )
+
+   # The patient facing explanation is the one stage we cannot do without
+   if isinstance(explanation, Exception):
+       raise explanation
+
+   errors = {}
+   if isinstance(summary, Exception):
+       # No summary rather than the raw OCR text, callers needing context use "ocr_text"
+       errors["summarize"] = str(summary)
+       summary = None
+   if isinstance(raw_indicators, Exception):
+       errors["extract"] = str(raw_indicators)
+       raw_indicators = {}
+
+   # Get indicators with normal ranges
+   indicators_with_ranges = lm_handler.add_normal_ranges(raw_indicators, original_content)
+
+   return {
+       "ocr_text": original_content,
+       "summary": summary,
+       "explanation": explanation,
+       "indicators": indicators_with_ranges,
+       "timings": timings,
+       "errors": errors
+   }
+
+
+async def process_report(file_path: Path, on_stage=None):
    """Process medical report, extract content, generate explanation, and extract indicators"""
    try:
-       # Initialize LMStudio handler
-       lm_handler = LMStudioHandler()
-      
-       # Use LMStudio API to analyze image and extract content
-       original_content = await lm_handler.process_medical_image(file_path)
-       
-       # Generate summary of the medical report
-       summary = await lm_handler.summarize_medical_report(original_content)
-      
-       # Use LMStudio API to interpret content
-       explanation = await lm_handler.interpret_medical_report(original_content)
-       
-       # Extract medical indicators and their values (now includes normal ranges)
-       raw_indicators = await lm_handler.extract_medical_indicators(original_content)
-       
-       # Get indicators with normal ranges
-       indicators_with_ranges = lm_handler.add_normal_ranges(raw_indicators)
-      
-       return summary, explanation, indicators_with_ranges
-   
+       # Run OCR in the OCR worker pool to extract the report content
+       await _notify(on_stage, "ocr")
+       timings = {}
+       start_time = time.perf_counter()
+       original_content = await ocr_service.extract_text(file_path)
+       timings["ocr"] = round(time.perf_counter() - start_time, 3)
+
+       return await analyze_report_text(original_content, on_stage, timings)
+
    except Exception as e:
        raise Exception(f"Report processing failed: {str(e)}")
+
+
+def merge_page_texts(page_texts):
+   """Merge per-page OCR text into one report, pages in upload order"""
+   if len(page_texts) == 1:
+       return page_texts[0]
+   return "\n\n".join(
+       f"--- Page {number + 1} ---\n{text}" for number, text in enumerate(page_texts)
+   )
+
+
+def format_report_result(report, filename):
+   """Shape a processed report into the /upload response fields"""
+   return {
+       "original_content": report["summary"],
+       "explanation": report["explanation"],
+       "indicators": report["indicators"],
+       "ocr_text": report["ocr_text"],
+       "timings": report.get("timings", {}),
+       "errors": report.get("errors", {}),
+       "filename": filename
+   }
+
+
+def is_complete(report):
+   """Whether every pipeline stage succeeded, partial reports are not cached"""
+   return not report.get("errors")
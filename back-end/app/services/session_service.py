@@ -0,0 +1,97 @@
+# app/services/session_service.py
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+
+from app import config
+
+
+class SessionStore:
+    def __init__(self, ttl=None, max_sessions=None):
+        """
+        In-memory store of report chat sessions
+
+        A session holds the report text and its digest, registered once,
+        plus the conversation so far, so follow-up questions only send the
+        session id. Sessions expire after ttl seconds without use, and the
+        least recently used are evicted beyond max_sessions.
+
+        Args:
+            ttl: Seconds a session stays alive after its last use
+            max_sessions: Maximum number of sessions kept
+        """
+        self.ttl = config.SESSION_TTL if ttl is None else ttl
+        self.max_sessions = config.SESSION_MAX_SESSIONS if max_sessions is None else max_sessions
+        self._sessions = OrderedDict()
+        self.metrics = {"created": 0, "expired": 0, "evicted": 0}
+
+    def create(self, report, digest):
+        """Register a report and return the new session"""
+        self._expire()
+        now = time.time()
+        session = {
+            "id": uuid.uuid4().hex,
+            "report": report,
+            "digest": digest,
+            # Older turns folded into a summary once the history exceeds its budget
+            "summary": "",
+            "history": [],
+            "turns": 0,
+            "compactions": 0,
+            "created_at": now,
+            "last_access": now,
+            # Turns of one session run one at a time so the history stays in order
+            "lock": asyncio.Lock(),
+        }
+        self._sessions[session["id"]] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.metrics["evicted"] += 1
+        self.metrics["created"] += 1
+        return session
+
+    def get(self, session_id):
+        """Return a live session and mark it used, or None"""
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        session["last_access"] = time.time()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id):
+        """Drop a session, return whether it existed"""
+        return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        """Drop sessions unused for longer than the TTL, oldest first"""
+        if not self.ttl:
+            return
+        deadline = time.time() - self.ttl
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session["last_access"] > deadline:
+                break
+            self._sessions.popitem(last=False)
+            self.metrics["expired"] += 1
+
+    def describe(self, session):
+        """Public view of a session"""
+        return {
+            "session_id": session["id"],
+            "digest": session["digest"],
+            "turns": session["turns"],
+            "compactions": session["compactions"],
+            "created_at": session["created_at"],
+            "expires_at": session["last_access"] + self.ttl if self.ttl else None,
+        }
+
+    def stats(self):
+        self._expire()
+        return {**self.metrics, "active": len(self._sessions), "max_sessions": self.max_sessions, "ttl": self.ttl}
+
+
+# Create a singleton instance so all requests share the sessions
+session_store = SessionStore()
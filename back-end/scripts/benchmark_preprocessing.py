@@ -0,0 +1,89 @@
+# scripts/benchmark_preprocessing.py
+import sys
+import os
+import argparse
+import difflib
+import glob
+import time
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+
+from app.models.ocr_pool import ocr_pool
+from app.models.preprocessing import preprocess_image, format_stats
+
+
+def normalize(text):
+    """Collapse whitespace and case so only recognised characters are compared"""
+    return " ".join(text.lower().split())
+
+
+def run_ocr(gray):
+    start_time = time.perf_counter()
+    results = ocr_pool.readtext(gray, detail=0, paragraph=True)
+    return "\n".join(results), time.perf_counter() - start_time
+
+
+def benchmark(image_dir, limit=None, stages=None):
+    paths = sorted(glob.glob(os.path.join(image_dir, "*.jpg")) + glob.glob(os.path.join(image_dir, "*.png")))
+    if limit:
+        paths = paths[:limit]
+    if not paths:
+        print(f"No images found in {image_dir}")
+        return
+
+    # Load the reader before timing anything
+    ocr_pool.size = 1
+    ocr_pool.warmup()
+
+    total_raw = 0.0
+    total_pre = 0.0
+    total_prep = 0.0
+    similarities = []
+
+    print(f"{'image':<40} {'raw s':>7} {'pre s':>7} {'prep ms':>8} {'raw chars':>9} {'pre chars':>9} {'parity':>7}")
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        raw_text, raw_time = run_ocr(gray)
+
+        start_time = time.perf_counter()
+        processed, stats = preprocess_image(gray, stages)
+        prep_time = time.perf_counter() - start_time
+        pre_text, pre_time = run_ocr(processed)
+
+        similarity = difflib.SequenceMatcher(None, normalize(raw_text), normalize(pre_text)).ratio()
+        similarities.append(similarity)
+        total_raw += raw_time
+        total_pre += pre_time
+        total_prep += prep_time
+
+        print(
+            f"{os.path.basename(path)[:40]:<40} {raw_time:>7.2f} {pre_time:>7.2f} {prep_time * 1000:>8.1f} "
+            f"{len(raw_text):>9} {len(pre_text):>9} {similarity:>7.3f}"
+        )
+        print(f"    {format_stats(stats)}")
+
+    count = len(similarities)
+    print()
+    print(f"Images:                {count}")
+    print(f"OCR time without:      {total_raw:.2f}s ({total_raw / count:.2f}s per image)")
+    print(f"OCR time with:         {total_pre + total_prep:.2f}s "
+          f"({(total_pre + total_prep) / count:.2f}s per image, {total_prep:.2f}s of it preprocessing)")
+    print(f"Speedup:               {total_raw / max(total_pre + total_prep, 1e-9):.2f}x")
+    print(f"Mean character parity: {sum(similarities) / count:.3f} (min {min(similarities):.3f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare OCR time and output with and without preprocessing")
+    parser.add_argument("--dir", default="uploads", help="Directory with sample report images")
+    parser.add_argument("--limit", type=int, default=None, help="Only benchmark the first N images")
+    parser.add_argument("--stages", default=None, help="Comma separated stages, e.g. resize,crop,deskew")
+    args = parser.parse_args()
+
+    benchmark(args.dir, args.limit, args.stages.split(",") if args.stages else None)
@@ -0,0 +1,87 @@
+# scripts/benchmark_quantization.py
+import sys
+import os
+import argparse
+import difflib
+import glob
+import time
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+
+from app.models.ocr_pool import OCRReaderPool, configure_torch_threads
+from app.models.preprocessing import preprocess_image
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+def timed_readtext(pool, gray):
+    start_time = time.perf_counter()
+    results = pool.readtext(gray, detail=0, paragraph=True)
+    return "\n".join(results), time.perf_counter() - start_time
+
+
+def benchmark(image_dir, limit=None, threshold=0.98):
+    paths = sorted(glob.glob(os.path.join(image_dir, "*.jpg")) + glob.glob(os.path.join(image_dir, "*.png")))
+    if limit:
+        paths = paths[:limit]
+    if not paths:
+        print(f"No images found in {image_dir}")
+        return
+
+    threads = configure_torch_threads()
+    print(f"torch intra-op threads: {threads}")
+
+    float_pool = OCRReaderPool(size=1, gpu=False, quantize=False)
+    int8_pool = OCRReaderPool(size=1, gpu=False, quantize=True)
+    float_pool.warmup()
+    int8_pool.warmup()
+
+    float_total = 0.0
+    int8_total = 0.0
+    similarities = []
+
+    print(f"{'image':<40} {'fp32 s':>7} {'int8 s':>7} {'fp32 chars':>10} {'int8 chars':>10} {'parity':>7}")
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        gray, _ = preprocess_image(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+
+        float_text, float_time = timed_readtext(float_pool, gray)
+        int8_text, int8_time = timed_readtext(int8_pool, gray)
+
+        similarity = difflib.SequenceMatcher(None, normalize(float_text), normalize(int8_text)).ratio()
+        similarities.append(similarity)
+        float_total += float_time
+        int8_total += int8_time
+
+        print(
+            f"{os.path.basename(path)[:40]:<40} {float_time:>7.2f} {int8_time:>7.2f} "
+            f"{len(float_text):>10} {len(int8_text):>10} {similarity:>7.3f}"
+        )
+
+    count = len(similarities)
+    mean_similarity = sum(similarities) / count
+    print()
+    print(f"Images:           {count}")
+    print(f"float32 OCR time: {float_total:.2f}s ({float_total / count:.2f}s per image)")
+    print(f"int8 OCR time:    {int8_total:.2f}s ({int8_total / count:.2f}s per image)")
+    print(f"Speedup:          {float_total / max(int8_total, 1e-9):.2f}x")
+    print(f"Mean parity:      {mean_similarity:.3f} (min {min(similarities):.3f})")
+    verdict = "keep true" if mean_similarity >= threshold else "set to false"
+    print(f"OCR_QUANTIZE:     {verdict} (parity threshold {threshold})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare float32 and int8 quantized OCR accuracy and latency")
+    parser.add_argument("--dir", default="uploads", help="Directory with sample report images")
+    parser.add_argument("--limit", type=int, default=None, help="Only benchmark the first N images")
+    parser.add_argument("--threshold", type=float, default=0.98, help="Minimum mean parity to keep int8")
+    args = parser.parse_args()
+
+    benchmark(args.dir, args.limit, args.threshold)
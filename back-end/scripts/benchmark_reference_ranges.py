@@ -0,0 +1,115 @@
+# scripts/benchmark_reference_ranges.py
+import sys
+import os
+import argparse
+import json
+import random
+import time
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.indicator_parser import INDICATOR_ALIASES
+from app.models.reference_ranges import ReferenceRangeEngine
+
+METRICS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "models",
+                            "medical_metrics.json")
+
+
+def legacy_add_normal_ranges(indicators_json, metrics_file):
+    """The previous implementation: reload the file, exact case-insensitive scan over every metric"""
+    with open(metrics_file, "r") as f:
+        reference_metrics = json.load(f)
+    result = {}
+    for indicator_name, actual_value in indicators_json.items():
+        for ref_name, ref_range in reference_metrics.items():
+            if indicator_name.lower() == ref_name.lower():
+                result[ref_name] = [actual_value, ref_range]
+                break
+    return result
+
+
+def misspell(name, rng):
+    """Drop or swap one letter, as OCR and the LLM sometimes do"""
+    if len(name) < 8:
+        return name
+    position = rng.randrange(1, len(name) - 2)
+    if rng.random() < 0.5:
+        return name[:position] + name[position + 1:]
+    return name[:position] + name[position + 1] + name[position] + name[position + 2:]
+
+
+def make_reports(count, indicators_per_report, seed):
+    """Indicator dicts named like extraction output: canonical names, aliases and misspellings"""
+    rng = random.Random(seed)
+    with open(METRICS_FILE, "r") as f:
+        names = list(json.load(f))
+    reports = []
+    for _ in range(count):
+        report = {}
+        for name in rng.sample(names, min(indicators_per_report, len(names))):
+            choice = rng.random()
+            if choice < 0.4:
+                label = name
+            elif choice < 0.8 and INDICATOR_ALIASES.get(name):
+                label = rng.choice(INDICATOR_ALIASES[name]).upper()
+            else:
+                label = misspell(name, rng)
+            report[label] = round(rng.uniform(0.5, 200), 1)
+        reports.append(report)
+    return reports
+
+
+def benchmark(count, indicators_per_report, repeat, seed):
+    reports = make_reports(count, indicators_per_report, seed)
+    total_indicators = sum(len(report) for report in reports)
+
+    start_time = time.perf_counter()
+    engine = ReferenceRangeEngine(METRICS_FILE)
+    build_time = time.perf_counter() - start_time
+
+    legacy_matched = sum(len(legacy_add_normal_ranges(report, METRICS_FILE)) for report in reports)
+    engine_matched = sum(
+        1 for report in reports for name, value in report.items() if engine.evaluate(name, value) is not None
+    )
+
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for report in reports:
+            legacy_add_normal_ranges(report, METRICS_FILE)
+    legacy_time = (time.perf_counter() - start_time) / repeat
+
+    # First pass fills the memo of resolved names, later passes show the steady state
+    cold_engine = ReferenceRangeEngine(METRICS_FILE)
+    start_time = time.perf_counter()
+    for report in reports:
+        for name, value in report.items():
+            cold_engine.evaluate(name, value)
+    cold_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for report in reports:
+            for name, value in report.items():
+                engine.evaluate(name, value, unit="mg/dL" if "Glucose" in name else None, sex="female", age=40)
+    engine_time = (time.perf_counter() - start_time) / repeat
+
+    print(f"Reports:               {count} x {indicators_per_report} indicators ({total_indicators} total)")
+    print(f"Engine build:          {build_time * 1000:.2f} ms (once per process)")
+    print(f"Matched (legacy):      {legacy_matched}/{total_indicators}")
+    print(f"Matched (engine):      {engine_matched}/{total_indicators}")
+    print(f"Legacy per report:     {legacy_time / count * 1e6:.1f} us")
+    print(f"Engine per report:     {cold_time / count * 1e6:.1f} us cold, {engine_time / count * 1e6:.1f} us warm")
+    print(f"Engine per indicator:  {engine_time / total_indicators * 1e6:.2f} us warm")
+    print(f"Speedup:               {legacy_time / max(engine_time, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the reference range engine with the previous per-call scan")
+    parser.add_argument("--reports", type=int, default=500, help="Number of synthetic reports")
+    parser.add_argument("--indicators", type=int, default=20, help="Indicators per report")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed passes over all reports")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for the synthetic names")
+    args = parser.parse_args()
+
+    benchmark(args.reports, args.indicators, args.repeat, args.seed)
@@ -0,0 +1,129 @@
+# scripts/stub_llm_server.py
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible server for exercising the LLM router locally"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _unhealthy(self):
+        return self.server.down_after is not None and time.monotonic() - self.server.started > self.server.down_after
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            if self._unhealthy():
+                self._send_json(503, {"error": "down"})
+            else:
+                self._send_json(200, {"object": "list", "data": [{"id": self.server.name, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        with self.server.lock:
+            self.server.requests += 1
+            number = self.server.requests
+
+        if self._unhealthy() or random.random() < self.server.fail_rate:
+            self._send_json(500, {"error": "stub failure"})
+            return
+
+        # Occasional slow requests give the router a latency tail to hedge against
+        delay = self.server.delay
+        if random.random() < self.server.slow_rate:
+            delay *= self.server.slow_factor
+        time.sleep(delay)
+
+        prompt = payload.get("messages", [{}])[-1].get("content", "")
+        content = f"[{self.server.name} #{number}] {len(prompt)} prompt characters"
+
+        if not payload.get("stream"):
+            self._send_json(200, {
+                "id": f"stub-{number}",
+                "object": "chat.completion",
+                "model": payload.get("model", self.server.name),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in content.split(" "):
+            chunk = {"choices": [{"index": 0, "delta": {"content": word + " "}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def serve(port, name, delay, slow_rate, slow_factor, fail_rate, down_after, token_delay, verbose):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubLLMHandler)
+    server.name = name
+    server.delay = delay
+    server.slow_rate = slow_rate
+    server.slow_factor = slow_factor
+    server.fail_rate = fail_rate
+    server.down_after = down_after
+    server.token_delay = token_delay
+    server.verbose = verbose
+    server.requests = 0
+    server.lock = threading.Lock()
+    server.started = time.monotonic()
+    print(f"{name} listening on http://127.0.0.1:{port}/v1/chat/completions")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run stub OpenAI-compatible LLM servers for testing the LLM router")
+    parser.add_argument("--ports", default="1234", help="Comma separated ports, one stub server per port")
+    parser.add_argument("--delay", type=float, default=0.2, help="Seconds each completion takes")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests that are slow")
+    parser.add_argument("--slow-factor", type=float, default=10.0, help="How much slower the slow requests are")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument("--down-after", type=float, default=None,
+                        help="Seconds after which the first server fails every request and health check")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between streamed tokens")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    ports = [int(port) for port in args.ports.split(",")]
+    threads = []
+    for index, port in enumerate(ports):
+        thread = threading.Thread(
+            target=serve,
+            args=(port, f"stub-{port}", args.delay, args.slow_rate, args.slow_factor, args.fail_rate,
+                  args.down_after if index == 0 else None, args.token_delay, args.verbose),
+            daemon=True,
+        )
+        thread.start()
+        threads.append(thread)
+
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        pass
@@ -69,10 +69,11 @@ document.addEventListener('DOMContentLoaded', function() {
             if (result.success) {
                 // Store content for later use
                 explanationText = result.explanation;
-                reportContentText = result.original_content;
+                // Without a summary the questions are asked about the OCR text
+                reportContentText = result.original_content || result.ocr_text;
               
                 // Display results
-                originalContent.textContent = result.original_content;
+                originalContent.textContent = result.original_content || '';
                 explanationContent.textContent = result.explanation;
                 // Ensure explanation content is visible initially
                 explanationContent.classList.add('active-content');
@@ -0,0 +1,63 @@
+# tests/test_bulk_evaluation.py
+import sys
+import os
+
+import pytest
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.bulk_evaluation import BulkEvaluator
+from app.models.reference_ranges import ReferenceRangeEngine
+
+METRICS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "models",
+                            "medical_metrics.json")
+
+INDICATORS = {
+    "Hemoglobin": 13.0,
+    "Hematocrit": 45.5,
+    "Serum Creatinine": 1.2,
+    "ESR": 25,
+    "Glucose": 5.8,
+    "Potassium": 5.4,
+}
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return ReferenceRangeEngine(METRICS_FILE)
+
+
+@pytest.mark.parametrize("sex", [None, "male", "female", "Male", "F", "f", "M", "女", "男", " female ", "unknown"])
+@pytest.mark.parametrize("age", [None, 30, 65])
+def test_bulk_matches_scalar_evaluation(engine, sex, age):
+    report = {"id": "r1", "indicators": INDICATORS, "sex": sex, "age": age}
+    result, = BulkEvaluator(engine).evaluate_block([report])
+    assert result["id"] == "r1"
+    assert result["unmatched"] == []
+    for name, value in INDICATORS.items():
+        expected = engine.evaluate(name, value, sex=sex, age=age)
+        evaluated = result["indicators"][expected["metric"]]
+        assert (evaluated["low"], evaluated["high"]) == pytest.approx((expected["low"], expected["high"]))
+        assert evaluated["flag"] == expected["status"]
+
+
+@pytest.mark.parametrize("sex, low", [("F", 12.0), ("女", 12.0), ("M", 13.5), ("x", 13.5)])
+def test_sex_spellings_select_the_same_range(engine, sex, low):
+    result, = BulkEvaluator(engine).evaluate_block([{"indicators": {"Hemoglobin": 13.0}, "sex": sex}])
+    assert result["indicators"]["Hemoglobin"]["low"] == low
+    assert engine.evaluate("Hemoglobin", 13.0, sex=sex)["low"] == low
+
+
+def test_reports_in_a_block_get_their_own_ranges(engine):
+    reports = [
+        {"indicators": {"Hemoglobin": 13.0}, "sex": "female"},
+        {"indicators": {"Hemoglobin": 13.0}, "sex": "male"},
+        {"Hemoglobin": [13.0, 13.5, 17.5], "Unknown Marker": 1.0},
+    ]
+    female, male, plain = BulkEvaluator(engine).evaluate_block(reports)
+    assert female["indicators"]["Hemoglobin"]["flag"] == "normal"
+    assert male["indicators"]["Hemoglobin"]["flag"] == "low"
+    assert male["abnormal"] == ["Hemoglobin"]
+    assert plain["indicators"]["Hemoglobin"]["flag"] == "low"
+    assert plain["unmatched"] == ["Unknown Marker"]
@@ -0,0 +1,102 @@
+# tests/test_indicator_parser.py
+import sys
+import os
+
+import pytest
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.indicator_parser import build_name_index, parse_indicators, parse_number, parse_patient, parse_value
+
+METRICS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "models",
+                            "medical_metrics.json")
+
+
+@pytest.fixture(scope="module")
+def index():
+    return build_name_index(METRICS_FILE)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("14.2", 14.2),
+    ("14,2", 14.2),
+    ("0,123", 0.123),
+    ("12,3456", 12.3456),
+    ("250,000", 250000),
+    ("4,500", 4500),
+    ("1,250,000", 1250000),
+    ("7", 7),
+])
+def test_parse_number(text, expected):
+    assert parse_number(text) == expected
+
+
+@pytest.mark.parametrize("text", ["0,123,456", "1,2,3"])
+def test_parse_number_rejects_invalid_groupings(text):
+    with pytest.raises(ValueError):
+        parse_number(text)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("5.2 mmol/L", 5.2),
+    ("5,2 mmol/L", 5.2),
+    ("0,125 mg/L", 0.125),
+    ("250,000 /uL", 250000),
+    ("1,250,000", 1250000),
+    ("<0.5", 0.5),
+    ("< 5", 5),
+    (">=60 mL/min", 60),
+    ("≤ 0,3", 0.3),
+    ("3.5-5.5", 4.5),
+    ("3,5 – 5,0", 4.25),
+    ("10 to 20", 15),
+    ("<5-10", 5),
+    ("25-OH", None),
+    ("3x10", None),
+    ("0,123,456", None),
+    ("high", None),
+])
+def test_parse_value(text, expected):
+    assert parse_value(text) == expected
+
+
+@pytest.mark.parametrize("line, name, value", [
+    ("Hemoglobin 13,5 g/dL", "Hemoglobin", 13.5),
+    ("HGB: 135 g/L", "Hemoglobin", 135),
+    ("Platelets 250,000 /uL", "Platelet Count", 250000),
+    ("WBC 4,500 /uL", "White Blood Cell Count", 4500),
+    ("CRP <0,5 mg/L", "C-Reactive Protein", 0.5),
+    ("Creatinine (Serum) 0,95 mg/dL", "Serum Creatinine", 0.95),
+    ("- LDL-C 3.1-3.3 mmol/L", "LDL Cholesterol", 3.2),
+    ("空腹血糖 5.6 mmol/L", "Fasting Blood Glucose", 5.6),
+    ("Potassium | 4,1 | mmol/L | 3.5-5.1", "Potassium", 4.1),
+])
+def test_parse_indicators_reads_values_and_aliases(index, line, name, value):
+    units = {}
+    indicators, unresolved = parse_indicators(line, index, units)
+    assert indicators == {name: value}
+    assert unresolved == []
+    assert name in units
+
+
+def test_parse_indicators_leaves_unreadable_lines_to_the_llm(index):
+    text = "Patient ID 12345\nFerritin 0,123,456 ng/mL\nSodium 140 mmol/L\nUnknown marker 7.1"
+    indicators, unresolved = parse_indicators(text, index)
+    assert indicators == {"Sodium": 140}
+    assert unresolved == ["Ferritin 0,123,456 ng/mL", "Unknown marker 7.1"]
+
+
+def test_blood_pressure_gives_two_indicators(index):
+    indicators, _ = parse_indicators("BP 120/80 mmHg", index)
+    assert indicators == {"Systolic Blood Pressure": 120, "Diastolic Blood Pressure": 80}
+
+
+@pytest.mark.parametrize("text, patient", [
+    ("Name: Jane Doe  Sex: F  Age: 45", {"sex": "female", "age": 45}),
+    ("Gender: male", {"sex": "male"}),
+    ("性别：女 年龄：62", {"sex": "female", "age": 62}),
+    ("Hemoglobin 13.5 g/dL", {}),
+])
+def test_parse_patient(text, patient):
+    assert parse_patient(text) == patient
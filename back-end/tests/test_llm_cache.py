@@ -0,0 +1,77 @@
+# tests/test_llm_cache.py
+import sys
+import os
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.llm_cache import LLMResponseCache, request_fingerprint
+
+PAYLOAD = {
+    "model": "local-model",
+    "messages": [{"role": "user", "content": "Summarize the report"}],
+    "temperature": 0,
+    "max_tokens": 500,
+}
+
+
+def make_cache(tmp_path, **kwargs):
+    options = {"memory_entries": 8, "max_bytes": 1024 * 1024, "max_temperature": 0.2, **kwargs}
+    return LLMResponseCache(db_path=str(tmp_path / "llm_cache.db"), **options)
+
+
+def test_fingerprint_ignores_stream_and_key_order():
+    reordered = dict(reversed(list(PAYLOAD.items())))
+    assert request_fingerprint(PAYLOAD) == request_fingerprint({**PAYLOAD, "stream": True})
+    assert request_fingerprint(PAYLOAD) == request_fingerprint(reordered)
+
+
+def test_fingerprint_changes_with_generation_settings():
+    fingerprint = request_fingerprint(PAYLOAD)
+    assert fingerprint != request_fingerprint({**PAYLOAD, "temperature": 0.1})
+    assert fingerprint != request_fingerprint({**PAYLOAD, "max_tokens": 501})
+    assert fingerprint != request_fingerprint({**PAYLOAD, "model": "other-model"})
+
+
+def test_only_low_temperature_requests_are_cacheable(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.cacheable(PAYLOAD)
+    assert not cache.cacheable({**PAYLOAD, "temperature": 0.7})
+    assert cache.stats()["skipped"] == 1
+
+
+def test_entries_are_served_from_memory_then_disk(tmp_path):
+    cache = make_cache(tmp_path)
+    fingerprint = request_fingerprint(PAYLOAD)
+    assert cache.get(fingerprint) is None
+    cache.put(fingerprint, "Everything is within range.")
+    assert cache.get(fingerprint) == "Everything is within range."
+
+    # A new process only has the SQLite tier
+    reopened = make_cache(tmp_path)
+    assert reopened.get(fingerprint) == "Everything is within range."
+    assert reopened.get(fingerprint) == "Everything is within range."
+    assert reopened.stats()["disk_hits"] == 1
+    assert reopened.stats()["memory_hits"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_over_the_size_cap(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=250)
+    for key in ("a", "b", "c"):
+        cache.put(key, key * 100)
+    # Two entries fit, the oldest one is dropped from both tiers
+    assert cache.get("a") is None
+    assert cache.get("b") == "b" * 100
+    assert cache.get("c") == "c" * 100
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["disk_bytes"] == 200
+
+
+def test_memory_tier_is_bounded(tmp_path):
+    cache = make_cache(tmp_path, memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key)
+    assert cache.stats()["memory_entries"] == 2
+    # Still served, from disk
+    assert cache.get("a") == "a"
+    assert cache.stats()["disk_hits"] == 1
@@ -0,0 +1,136 @@
+# tests/test_llm_router.py
+import sys
+import os
+import asyncio
+
+import pytest
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.llm_router import LLMRouter
+from app.models.llm_scheduler import LLMScheduler
+
+URLS = ["http://a/v1/chat/completions", "http://b/v1/chat/completions"]
+
+
+class EndpointError(Exception):
+    def __init__(self, status_code=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def make_router(**options):
+    settings = {"failure_threshold": 2, "ejection_time": 60, "health_interval": 0, "hedging": False,
+                "hedge_min_delay": 0.01, "hedge_min_samples": 1, "latency_window": 10}
+    settings.update(options)
+    return LLMRouter(URLS, **settings)
+
+
+def test_an_empty_pool_is_rejected():
+    with pytest.raises(ValueError):
+        LLMRouter([])
+
+
+def test_requests_go_to_the_endpoint_with_fewest_outstanding():
+    router = make_router()
+    seen = []
+
+    async def call(url):
+        seen.append(url)
+        await asyncio.sleep(0.01)
+        return url
+
+    async def scenario():
+        return await asyncio.gather(*(router.request(call) for _ in range(4)))
+
+    asyncio.run(scenario())
+    assert sorted(seen) == sorted(URLS * 2)
+
+
+def test_endpoint_failures_fail_over_and_eject():
+    router = make_router()
+
+    async def call(url):
+        if url == URLS[0]:
+            raise EndpointError(503)
+        return url
+
+    async def scenario():
+        return [await router.request(call) for _ in range(4)]
+
+    assert asyncio.run(scenario()) == [URLS[1]] * 4
+    first = router.stats()["endpoints"][0]
+    assert not first["healthy"]
+    assert first["ejections"] == 1
+    # Once ejected the failing endpoint is no longer tried
+    assert first["requests"] == 2
+    assert router.stats()["failovers"] == 2
+
+
+def test_request_errors_are_not_retried():
+    router = make_router()
+    calls = []
+
+    async def call(url):
+        calls.append(url)
+        raise EndpointError(400)
+
+    with pytest.raises(EndpointError):
+        asyncio.run(router.request(call))
+    assert len(calls) == 1
+    assert all(endpoint["healthy"] for endpoint in router.stats()["endpoints"])
+
+
+def test_every_endpoint_down_raises_the_last_error():
+    router = make_router()
+
+    async def call(url):
+        raise ConnectionError(url)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(router.request(call))
+
+
+def slow_first_endpoint(router):
+    for endpoint in router.endpoints:
+        endpoint.latencies.append(0.01)
+
+    async def call(url):
+        await asyncio.sleep(1 if url == URLS[0] else 0.01)
+        return url
+
+    return call
+
+
+def test_slow_requests_are_hedged_on_another_endpoint():
+    router = make_router(hedging=True)
+    router.endpoints[1].last_used = 1.0
+    call = slow_first_endpoint(router)
+    assert asyncio.run(router.request(call)) == URLS[1]
+    assert router.stats()["hedged"] == 1
+    assert router.stats()["hedge_wins"] == 1
+    # The cancelled request on the slow endpoint is no longer counted
+    assert [endpoint.outstanding for endpoint in router.endpoints] == [0, 0]
+
+
+def test_hedges_take_a_scheduler_slot_and_are_skipped_without_one():
+    async def scenario(max_concurrency):
+        scheduler = LLMScheduler(max_concurrency=max_concurrency)
+        router = make_router(hedging=True, scheduler=scheduler)
+        router.endpoints[1].last_used = 1.0
+        call = slow_first_endpoint(router)
+        async with scheduler.slot():
+            result = await router.request(call)
+        # The hedge gave its slot back
+        assert scheduler.stats()["active"] == 0
+        return result, router.stats()
+
+    result, stats = asyncio.run(scenario(2))
+    assert result == URLS[1]
+    assert stats["hedged"] == 1
+
+    result, stats = asyncio.run(scenario(1))
+    assert result == URLS[0]
+    assert stats["hedged"] == 0
+    assert stats["hedges_skipped"] == 1
@@ -0,0 +1,122 @@
+# tests/test_llm_scheduler.py
+import sys
+import os
+import asyncio
+
+import pytest
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.llm_scheduler import (
+    LLMScheduler, LLMOverloaded, find_overload, set_llm_priority,
+    PRIORITY_INTERACTIVE, PRIORITY_DEFAULT, PRIORITY_BULK
+)
+
+SLOS = {PRIORITY_INTERACTIVE: 100, PRIORITY_DEFAULT: 100, PRIORITY_BULK: 100}
+
+
+def test_waiting_requests_are_served_by_priority_then_arrival():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, slos=SLOS, max_queue=10)
+        order = []
+
+        async def request(name, priority):
+            async with scheduler.slot(priority):
+                order.append(name)
+
+        await scheduler.acquire(PRIORITY_DEFAULT)
+        tasks = []
+        for name, priority in [("bulk", PRIORITY_BULK), ("default", PRIORITY_DEFAULT),
+                               ("interactive 1", PRIORITY_INTERACTIVE), ("interactive 2", PRIORITY_INTERACTIVE)]:
+            tasks.append(asyncio.ensure_future(request(name, priority)))
+            await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["interactive 1", "interactive 2", "default", "bulk"]
+    assert stats["active"] == 0
+    assert stats["admitted"] == 5
+
+
+def test_full_class_queue_is_shed_with_429():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, slos=SLOS, max_queue=1)
+        await scheduler.acquire(PRIORITY_BULK)
+        waiting = asyncio.ensure_future(scheduler.acquire(PRIORITY_BULK))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloaded) as shed:
+            await scheduler.acquire(PRIORITY_BULK)
+        # Other classes have their own queue
+        interactive = asyncio.ensure_future(scheduler.acquire(PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        interactive.cancel()
+        return shed.value, scheduler.stats()
+
+    error, stats = asyncio.run(scenario())
+    assert error.status_code == 429
+    assert error.retry_after >= 1
+    assert stats["shed_queue_full"] == 1
+
+
+def test_request_over_its_slo_estimate_is_shed_with_503():
+    async def scenario():
+        slos = {**SLOS, PRIORITY_INTERACTIVE: 1}
+        scheduler = LLMScheduler(max_concurrency=1, slos=slos, max_queue=10)
+        # Every request is expected to hold the slot for 5s
+        await scheduler.acquire(PRIORITY_BULK)
+        with pytest.raises(LLMOverloaded) as shed:
+            await scheduler.acquire(PRIORITY_INTERACTIVE)
+        return shed.value, scheduler.stats()
+
+    error, stats = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert stats["shed_slo"] == 1
+    assert stats["queued"][PRIORITY_INTERACTIVE] == 0
+
+
+def test_queued_request_expires_at_its_slo_and_frees_its_place():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, slos=SLOS, max_queue=10)
+        scheduler._service_time = 0.01
+        scheduler.slos = {**SLOS, PRIORITY_DEFAULT: 0.05}
+        await scheduler.acquire(PRIORITY_BULK)
+        with pytest.raises(LLMOverloaded):
+            await scheduler.acquire(PRIORITY_DEFAULT)
+        # The expired entry is skipped, the slot goes back to being free
+        scheduler.release()
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["expired"] == 1
+    assert stats["active"] == 0
+    assert stats["queued"][PRIORITY_DEFAULT] == 0
+
+
+def test_find_overload_follows_the_exception_chain():
+    overload = LLMOverloaded("busy", retry_after=3)
+    try:
+        try:
+            raise overload
+        except LLMOverloaded as e:
+            raise Exception(f"Report processing failed: {str(e)}") from e
+    except Exception as wrapped:
+        assert find_overload(wrapped) is overload
+    try:
+        try:
+            raise overload
+        except LLMOverloaded:
+            # Implicit chaining, as in "except ...: raise Exception(...)"
+            raise Exception("Summarization failed")
+    except Exception as wrapped:
+        assert find_overload(wrapped) is overload
+    assert find_overload(ValueError("unrelated")) is None
+    assert find_overload(None) is None
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        set_llm_priority("urgent")
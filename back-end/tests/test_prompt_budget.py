@@ -0,0 +1,91 @@
+# tests/test_prompt_budget.py
+import sys
+import os
+import asyncio
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.prompt_budget import ReportCondenser, split_into_chunks, truncate_to_tokens
+from app.models.tokenizer import count_tokens
+
+REPORT = "\n".join(f"Test {number} | {number}.5 | mmol/L | 1.0-{number + 2}.0" for number in range(60))
+
+
+class FakeClient:
+    """Condenses a chunk to its first line, or returns a fixed answer"""
+
+    def __init__(self, answer=None):
+        self.answer = answer
+        self.calls = 0
+
+    async def chat(self, messages, task=None):
+        self.calls += 1
+        await asyncio.sleep(0)
+        if self.answer is not None:
+            return self.answer
+        chunk = messages[-1]["content"].split("**Report part:**", 1)[1].strip()
+        return chunk.splitlines()[0]
+
+
+def test_chunks_respect_the_limit_and_keep_table_rows_whole():
+    chunks = split_into_chunks(REPORT, 60)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 60 for chunk in chunks)
+    # Joining the chunks gives back every row unchanged
+    assert "\n".join(chunks).splitlines() == REPORT.splitlines()
+
+
+def test_a_line_longer_than_the_limit_is_split_on_words():
+    line = " ".join(f"word{number}" for number in range(200))
+    chunks = split_into_chunks(line, 30)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 30 for chunk in chunks)
+    assert " ".join(chunks).split() == line.split()
+
+
+def test_truncation_keeps_leading_whole_lines():
+    truncated = truncate_to_tokens(REPORT, 50)
+    assert count_tokens(truncated) <= 50
+    assert REPORT.startswith(truncated)
+    assert truncated.splitlines() == REPORT.splitlines()[:len(truncated.splitlines())]
+
+
+def test_text_within_budget_is_returned_unchanged():
+    client = FakeClient()
+    condenser = ReportCondenser(client, chunk_tokens=60, cache_entries=32)
+    assert asyncio.run(condenser.fit("Hemoglobin 13.5 g/dL", 100)) == "Hemoglobin 13.5 g/dL"
+    assert client.calls == 0
+
+
+def test_long_text_is_condensed_chunk_by_chunk():
+    client = FakeClient()
+    condenser = ReportCondenser(client, chunk_tokens=60, cache_entries=32)
+    condensed = asyncio.run(condenser.fit(REPORT, 200))
+    assert count_tokens(condensed) <= 200
+    assert condensed.startswith("Test 0 |")
+    assert client.calls == len(split_into_chunks(REPORT, 60))
+    assert condenser.stats()["truncated"] == 0
+
+
+def test_chunk_summaries_are_reused_across_stages():
+    client = FakeClient()
+    condenser = ReportCondenser(client, chunk_tokens=60, cache_entries=32)
+
+    async def three_stages():
+        return await asyncio.gather(*(condenser.fit(REPORT, 200) for _ in range(3)))
+
+    first, second, third = asyncio.run(three_stages())
+    assert first == second == third
+    chunks = len(split_into_chunks(REPORT, 60))
+    assert client.calls == chunks
+    assert condenser.stats()["reused_chunks"] == 2 * chunks
+
+
+def test_summaries_that_do_not_shrink_fall_back_to_truncation():
+    # The model answers with more text than it was given
+    client = FakeClient(answer="\n".join(["Every value is listed again here."] * 40))
+    condenser = ReportCondenser(client, chunk_tokens=60, cache_entries=32)
+    condensed = asyncio.run(condenser.fit(REPORT, 100))
+    assert count_tokens(condensed) <= 100
+    assert condenser.stats()["truncated"] == 1
@@ -0,0 +1,68 @@
+# tests/test_reference_ranges.py
+import sys
+import os
+
+import pytest
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.indicator_parser import build_name_index, parse_indicators
+from app.models.reference_ranges import ReferenceRangeEngine
+
+METRICS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "models",
+                            "medical_metrics.json")
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return ReferenceRangeEngine(METRICS_FILE)
+
+
+@pytest.mark.parametrize("name", [
+    # Other analytes whose names are close to a known metric
+    "Non-HDL Cholesterol",
+    "VLDL Cholesterol",
+    "Free Testosterone",
+    "Urine Creatinine",
+    "Vitamin A",
+    "Vitamin B6",
+    "Platelet Crit",
+    "2h Glucose",
+    "Cholesterol HDL Ratio",
+    # Parenthesized specimen qualifiers
+    "Glucose (urine)",
+    "White Blood Cells (Urine)",
+    "Protein (24h urine)",
+])
+def test_other_analytes_are_not_resolved(engine, name):
+    assert engine.resolve(name) == (None, None)
+    assert engine.evaluate(name, 5.0) is None
+
+
+@pytest.mark.parametrize("name, metric", [
+    ("Hemoglobn", "Hemoglobin"),
+    ("Trigylcerides", "Triglycerides"),
+    ("Platelet Cuont", "Platelet Count"),
+    ("Alanine Aminotransferse", "Alanine Aminotransferase"),
+    ("Vitamn D", "Vitamin D"),
+    ("Potasium", "Potassium"),
+])
+def test_typos_resolve_fuzzily(engine, name, metric):
+    assert engine.resolve(name) == (metric, "fuzzy")
+
+
+@pytest.mark.parametrize("name, metric", [
+    ("Hemoglobin (HGB)", "Hemoglobin"),
+    ("Creatinine (Serum)", "Serum Creatinine"),
+    ("Vitamin B12", "Vitamin B12"),
+    ("HDL-C", "HDL Cholesterol"),
+])
+def test_names_and_aliases_resolve_exactly(engine, name, metric):
+    assert engine.resolve(name) == (metric, "exact")
+
+
+def test_parser_keeps_specimen_qualified_lines_out():
+    indicators, _ = parse_indicators("Glucose (urine) 5.5 mmol/L\nGlucose (GLU) 5.2 mmol/L",
+                                     build_name_index(METRICS_FILE))
+    assert indicators == {"Fasting Blood Glucose": 5.2}
@@ -0,0 +1,171 @@
+# tests/test_single_flight.py
+import sys
+import os
+import asyncio
+
+import pytest
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.single_flight import SingleFlight, StreamSingleFlight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*[flights.do("key", work) for _ in range(5)])
+        return results, calls, flights
+
+    results, calls, flights = asyncio.run(scenario())
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    assert flights.coalesced == 4
+    assert flights.in_flight() == 0
+
+
+def test_different_keys_and_later_calls_run_again():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0)
+            return len(calls)
+
+        await asyncio.gather(flights.do("a", work), flights.do("b", work))
+        await flights.do("a", work)
+        return calls
+
+    assert len(asyncio.run(scenario())) == 3
+
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("backend down")
+
+        return await asyncio.gather(*[flights.do("key", work) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_one_caller_giving_up_does_not_cancel_the_others():
+    async def scenario():
+        flights = SingleFlight()
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        impatient = asyncio.ensure_future(flights.do("key", work))
+        patient = asyncio.ensure_future(flights.do("key", work))
+        await started.wait()
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(scenario()) == "answer"
+
+
+def test_call_is_cancelled_when_every_caller_left():
+    async def scenario():
+        flights = SingleFlight()
+        cancelled = asyncio.Event()
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.ensure_future(flights.do("key", work))
+        await started.wait()
+        caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return flights.in_flight()
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_stream_late_joiner_gets_the_whole_stream_once():
+    async def scenario():
+        flights = StreamSingleFlight()
+        upstream_calls = []
+        first_part = asyncio.Event()
+
+        async def source():
+            upstream_calls.append(1)
+            for part in ["Hemo", "globin ", "is ", "normal"]:
+                yield part
+                first_part.set()
+                await asyncio.sleep(0.005)
+
+        async def consume():
+            return [part async for part in flights.stream("key", source)]
+
+        early = asyncio.ensure_future(consume())
+        await first_part.wait()
+        late = asyncio.ensure_future(consume())
+        return await early, await late, upstream_calls, flights
+
+    early, late, upstream_calls, flights = asyncio.run(scenario())
+    assert early == late == ["Hemo", "globin ", "is ", "normal"]
+    assert len(upstream_calls) == 1
+    assert flights.coalesced == 1
+    assert flights.in_flight() == 0
+
+
+def test_stream_errors_reach_subscribers():
+    async def scenario():
+        flights = StreamSingleFlight()
+
+        async def source():
+            yield "partial"
+            raise ConnectionError("stream dropped")
+
+        parts = []
+        with pytest.raises(ConnectionError):
+            async for part in flights.stream("key", source):
+                parts.append(part)
+        return parts
+
+    assert asyncio.run(scenario()) == ["partial"]
+
+
+def test_stream_upstream_is_closed_when_the_last_subscriber_leaves():
+    async def scenario():
+        flights = StreamSingleFlight()
+        closed = asyncio.Event()
+
+        async def source():
+            try:
+                for number in range(100):
+                    yield str(number)
+                    await asyncio.sleep(0.001)
+            finally:
+                closed.set()
+
+        stream = flights.stream("key", source)
+        assert await stream.__anext__() == "0"
+        await stream.aclose()
+        await asyncio.wait_for(closed.wait(), 1)
+        return flights.in_flight()
+
+    assert asyncio.run(scenario()) == 0
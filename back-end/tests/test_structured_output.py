@@ -0,0 +1,110 @@
+# tests/test_structured_output.py
+import sys
+import os
+import asyncio
+
+import pytest
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import structured_output
+from app.models.llm_cache import LLMResponseCache
+from app.models.llm_client import LLMAPIError, LLMClient
+from app.models.llm_scheduler import LLMScheduler
+from app.models.structured_output import StructuredOutputError, generate_json
+
+SCHEMA = {"type": "object", "properties": {"answer": {"type": "string"}}}
+MESSAGES = [{"role": "user", "content": "Is the hemoglobin normal?"}]
+
+
+class FakeBackend:
+    """Streams a JSON answer followed by text the model should not get to generate"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.payloads = []
+        self.sent = 0
+
+    async def stream(self, payload):
+        self.payloads.append(payload)
+        if self.error is not None and "response_format" in payload:
+            raise LLMAPIError(self.error, status_code=400)
+        for delta in ['Sure. {"answer": ', '"yes, it is', ' normal"}', " Anything else?", " Bye."]:
+            self.sent += 1
+            yield delta
+
+
+@pytest.fixture(autouse=True)
+def response_format_enabled(monkeypatch):
+    monkeypatch.setattr(structured_output, "_response_format_disabled_until", 0.0)
+
+
+def make_client(tmp_path, backend):
+    cache = LLMResponseCache(db_path=str(tmp_path / "llm_cache.db"), memory_entries=8, max_bytes=1024 * 1024,
+                             max_temperature=0.2)
+    client = LLMClient(api_url="http://llm.test/v1/chat/completions", cache=cache, coalesce=False,
+                       scheduler=LLMScheduler(max_concurrency=2))
+    client._stream = backend.stream
+    return client
+
+
+def test_generation_stops_when_the_object_closes_and_is_cached(tmp_path):
+    backend = FakeBackend()
+    client = make_client(tmp_path, backend)
+
+    async def scenario():
+        first = await generate_json(client, MESSAGES, SCHEMA, "answer", temperature=0)
+        second = await generate_json(client, MESSAGES, SCHEMA, "answer", temperature=0)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second == {"answer": "yes, it is normal"}
+    # The stream is closed right after the closing brace
+    assert backend.sent == 3
+    # The second identical call is answered by the cache
+    assert len(backend.payloads) == 1
+    assert client.cache.stats()["memory_hits"] == 1
+
+
+def test_a_rejected_response_format_falls_back_to_prompting(tmp_path):
+    backend = FakeBackend(error="Unsupported parameter: response_format.json_schema")
+    client = make_client(tmp_path, backend)
+
+    async def scenario():
+        first = await generate_json(client, MESSAGES, SCHEMA, "answer", cache=False)
+        second = await generate_json(client, MESSAGES, SCHEMA, "answer", cache=False)
+        return first, second
+
+    assert asyncio.run(scenario()) == ({"answer": "yes, it is normal"}, {"answer": "yes, it is normal"})
+    assert ["response_format" in payload for payload in backend.payloads] == [True, False, False]
+
+
+def test_other_request_errors_keep_response_format(tmp_path):
+    backend = FakeBackend(error="Context length exceeded")
+    client = make_client(tmp_path, backend)
+    with pytest.raises(LLMAPIError):
+        asyncio.run(generate_json(client, MESSAGES, SCHEMA, "answer", cache=False))
+    assert structured_output._response_format_disabled_until == 0.0
+
+
+def test_a_truncated_answer_keeps_its_complete_members(tmp_path):
+    client = make_client(tmp_path, FakeBackend())
+
+    async def truncated(payload):
+        yield '{"answer": "yes", "confidence": 0.9, "sources": ["gu'
+
+    client._stream = truncated
+    result = asyncio.run(generate_json(client, MESSAGES, SCHEMA, "answer", cache=False))
+    assert result == {"answer": "yes", "confidence": 0.9}
+
+
+def test_an_answer_without_json_raises(tmp_path):
+    client = make_client(tmp_path, FakeBackend())
+
+    async def prose(payload):
+        yield "I cannot answer that."
+
+    client._stream = prose
+    with pytest.raises(StructuredOutputError):
+        asyncio.run(generate_json(client, MESSAGES, SCHEMA, "answer", cache=False))
@@ -0,0 +1,108 @@
+# tests/test_translation_memory.py
+import sys
+import os
+
+import pytest
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.translation_memory import MarkerLineParser, TranslationMemory, split_segments
+
+
+def segments_of(text):
+    return [segment for segment, _ in split_segments(text)]
+
+
+@pytest.mark.parametrize("text", [
+    "Your cholesterol is high. Eat less fat!\n\n- Walk daily.  Sleep well.\n1. Note: see Dr. Smith.",
+    "  indented line \nlast line without newline",
+    "血糖偏高。请复查！注意饮食。",
+    "",
+])
+def test_segments_join_back_to_the_text(text):
+    assert "".join(segment + separator for segment, separator in split_segments(text)) == text
+
+
+def test_sentences_are_split_at_sentence_ends():
+    assert segments_of("Your cholesterol is high. Eat less fat! Is it bad? Yes.") == [
+        "Your cholesterol is high.", "Eat less fat!", "Is it bad?", "Yes.",
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "Please see Dr. Smith about it.",
+    "Eat vegetables, e.g. Broccoli and spinach.",
+    "Reviewed by J. Smith today.",
+    "The dose is 2.5 mg daily.",
+    "Glucose is high. and keep checking it.",
+])
+def test_abbreviations_initials_and_lower_case_starts_do_not_split(text):
+    assert segments_of(text) == [text]
+
+
+def test_colons_and_semicolons_do_not_split():
+    text = "Note: your LDL is high; diet and exercise help."
+    assert segments_of(text) == [text]
+
+
+def test_cjk_sentences_split_without_spaces():
+    assert segments_of("血糖偏高。请复查！注意饮食？") == ["血糖偏高。", "请复查！", "注意饮食？"]
+
+
+def test_list_markup_stays_out_of_the_segment():
+    pairs = split_segments("- Walk daily.\n2. Sleep well.")
+    assert pairs == [("", "- "), ("Walk daily.", "\n"), ("", "2. "), ("Sleep well.", "")]
+
+
+def test_marker_lines_are_returned_once_complete():
+    parser = MarkerLineParser([1, 2, 3])
+    assert parser.feed("[1] Hola") == []
+    assert parser.feed(" mundo\n[2] Adi") == [(1, "Hola mundo")]
+    assert parser.feed("ós\n[3] Gracias") == [(2, "Adiós")]
+    assert parser.close() == [(3, "Gracias")]
+    assert parser.complete()
+
+
+@pytest.mark.parametrize("answer", [
+    # A marker is missing
+    "[1] Uno\n[3] Tres",
+    # A marker is repeated, the numbering shifted
+    "[1] Uno\n[2] Dos\n[2] Tres\n[3] Cuatro",
+    # A marker that was not requested
+    "[1] Uno\n[2] Dos\n[3] Tres\n[4] Cuatro",
+    # A marker without text
+    "[1] Uno\n[2]\n[3] Tres",
+])
+def test_shifted_or_missing_markers_are_incomplete(answer):
+    parser = MarkerLineParser([1, 2, 3])
+    parser.feed(answer)
+    parser.close()
+    assert not parser.complete()
+
+
+def test_memory_returns_stored_translations(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"), max_entries=10)
+    memory.store([("Drink water.", "Bebe agua."), ("Sleep well.", "Duerme bien.")], "Spanish")
+    found = memory.lookup(["Drink  water.", "Sleep well.", "Walk daily."], "spanish")
+    assert sorted(found.values()) == ["Bebe agua.", "Duerme bien."]
+    assert memory.lookup(["Drink water."], "French") == {}
+    assert memory.stats()["hits"] == 2
+
+
+def test_memory_skips_translations_identical_to_the_source(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"), max_entries=10)
+    memory.store([("LDL 3.2 mmol/L", "LDL 3.2  mmol/L")], "Spanish")
+    assert memory.stats()["entries"] == 0
+    assert memory.lookup(["LDL 3.2 mmol/L"], "Spanish") == {}
+
+
+def test_memory_evicts_least_recently_used_segments(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"), max_entries=2)
+    memory.store([("One.", "Uno.")], "Spanish")
+    memory.store([("Two.", "Dos.")], "Spanish")
+    memory.lookup(["One."], "Spanish")
+    memory.store([("Three.", "Tres.")], "Spanish")
+    assert memory.stats()["entries"] == 2
+    assert memory.stats()["evictions"] == 1
+    assert sorted(memory.lookup(["One.", "Two.", "Three."], "Spanish").values()) == ["Tres.", "Uno."]
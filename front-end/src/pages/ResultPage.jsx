@@ -96,7 +96,7 @@ const ResultPage = () => {
 
     try {
       const response = await askQuestion(
-        result?.original_content || "",
+        result?.original_content || result?.ocr_text || "",
         question
       );
       if (response.success) {
@@ -220,7 +220,7 @@ const ResultPage = () => {
           </div>
         </Card>
 
-        <Chatbot reportContent={result.original_content} />
+        <Chatbot reportContent={result.original_content || result.ocr_text} />
       </div>
     </div>
   );